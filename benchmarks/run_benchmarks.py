@@ -0,0 +1,225 @@
+"""
+Benchmarks for the pysie hot paths on reproducible synthetic data.
+
+    python benchmarks/run_benchmarks.py --scales tiny,small,medium --output results.json
+
+Every result records the wall time of the repeated runs, and the peak traced memory and the net number of allocated
+memory blocks of one extra traced run. The JSON output carries the versions and the seed so that runs can be compared
+over time.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pysie
+from benchmarks.synthetic import SCALES, SyntheticData
+from pysie.dsl.one_group import ProportionTesting
+from pysie.dsl.set import TernarySearchTrie
+from pysie.dsl.variable_independence_testing import Anova, ChiSquare, ContingencyTable
+from pysie.stats.distributions import ProportionSamplingDistribution, ProportionDiffSamplingDistribution
+from pysie.stats.samples import ColumnarSample, Sample, SampleDistribution
+
+SIMULATION_REPLICATES = 100000
+
+
+def list_sample_construction(data):
+    return lambda: data.list_sample(data.rows)
+
+
+def columnar_sample_construction(data):
+    return lambda: data.append_numerics(ColumnarSample(), data.rows)
+
+
+def bulk_sample_construction(data):
+    group_ids = np.array(data.group_ids, dtype=object)[data.group_codes]
+    return lambda: Sample.from_arrays(x=data.xs, group_id=group_ids)
+
+
+def numerical_sample_distribution(data):
+    sample = data.numerical_sample()
+    return lambda: SampleDistribution(sample)
+
+
+def categorical_sample_distribution(data):
+    sample = data.categorical_sample()
+    return lambda: SampleDistribution(sample, categorical_value=data.labels[0])
+
+
+def split_by_group_id(data):
+    sample = data.numerical_sample()
+    return lambda: sample.split_by_group_id()
+
+
+def aggregate_by_group_id(data):
+    sample = data.numerical_sample()
+    return lambda: sample.aggregate_by_group_id()
+
+
+def anova(data):
+    sample = data.numerical_sample()
+    return lambda: Anova(sample=sample)
+
+
+def chi_square(data):
+    sample = data.categorical_sample()
+    return lambda: ChiSquare(sample=sample)
+
+
+def contingency_table_from_sample(data):
+    sample = data.categorical_sample()
+    return lambda: ContingencyTable.from_sample(sample)
+
+
+def contingency_table_set_cell(data):
+    cells = list(zip(data.label_codes.tolist(), data.group_codes.tolist()))
+
+    def run():
+        table = ContingencyTable()
+        for label_code, group_code in cells:
+            table.set_cell(data.labels[label_code], data.group_ids[group_code], 1)
+        return table
+    return run
+
+
+def proportion_simulation(data):
+    return lambda: ProportionSamplingDistribution(sample_proportion=5.0 / data.rows, sample_size=data.rows,
+                                                  replicates=SIMULATION_REPLICATES, random_state=0)
+
+
+def proportion_diff_simulation(data):
+    return lambda: ProportionDiffSamplingDistribution(grp1_sample_proportion=5.0 / data.rows,
+                                                      grp1_sample_size=data.rows,
+                                                      grp2_sample_proportion=3.0 / data.rows,
+                                                      grp2_sample_size=data.rows,
+                                                      replicates=SIMULATION_REPLICATES, random_state=0)
+
+
+def proportion_testing_simulation(data):
+    sampling_distribution = ProportionSamplingDistribution(sample_proportion=5.0 / data.rows, sample_size=data.rows,
+                                                           replicates=10, random_state=0)
+    return lambda: ProportionTesting(sampling_distribution, p_null=4.0 / data.rows, replicates=SIMULATION_REPLICATES,
+                                     random_state=0)
+
+
+def trie_keys(data):
+    group_ids = data.group_ids
+    return [group_ids[code] + '/' + str(i) for i, code in enumerate(data.group_codes.tolist())]
+
+
+def trie_put(data):
+    keys = trie_keys(data)
+
+    def run():
+        trie = TernarySearchTrie()
+        for i, key in enumerate(keys):
+            trie.put(key, i)
+        return trie
+    return run
+
+
+def trie_get(data):
+    keys = trie_keys(data)
+    trie = TernarySearchTrie()
+    for i, key in enumerate(keys):
+        trie.put(key, i)
+    return lambda: [trie.get(key) for key in keys]
+
+
+# case name -> (setup, largest number of rows the case runs on); the cases that loop over the rows in Python are
+# capped so that the larger scales finish
+CASES = [
+    ('list_sample_construction', list_sample_construction, 100000),
+    ('columnar_sample_construction', columnar_sample_construction, 1000000),
+    ('bulk_sample_construction', bulk_sample_construction, None),
+    ('numerical_sample_distribution', numerical_sample_distribution, None),
+    ('categorical_sample_distribution', categorical_sample_distribution, None),
+    ('split_by_group_id', split_by_group_id, 10000000),
+    ('aggregate_by_group_id', aggregate_by_group_id, None),
+    ('anova', anova, None),
+    ('chi_square', chi_square, None),
+    ('contingency_table_from_sample', contingency_table_from_sample, None),
+    ('contingency_table_set_cell', contingency_table_set_cell, 1000000),
+    ('proportion_simulation', proportion_simulation, None),
+    ('proportion_diff_simulation', proportion_diff_simulation, None),
+    ('proportion_testing_simulation', proportion_testing_simulation, None),
+    ('trie_put', trie_put, 1000000),
+    ('trie_get', trie_get, 1000000),
+]
+
+
+def measure(run, repeats):
+    wall_times = []
+    for i in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        wall_times.append(time.perf_counter() - start)
+
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    result = run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocated_blocks = sys.getallocatedblocks() - blocks
+    del result
+    return dict(wall_time_seconds=dict(min=min(wall_times), median=float(np.median(wall_times)),
+                                       runs=wall_times),
+                peak_memory_bytes=peak, net_allocated_blocks=allocated_blocks)
+
+
+def run_benchmarks(scales, case_names=None, repeats=3, seed=0):
+    results = []
+    for scale in scales:
+        parameters = SCALES[scale]
+        data = SyntheticData(seed=seed, **parameters)
+        for name, setup, max_rows in CASES:
+            if case_names is not None and name not in case_names:
+                continue
+            result = dict(case=name, scale=scale, repeats=repeats, **parameters)
+            if max_rows is not None and parameters['rows'] > max_rows:
+                result['skipped'] = 'more than ' + str(max_rows) + ' rows'
+            else:
+                result.update(measure(setup(data), repeats))
+            print(name + ' [' + scale + ']: ' + json.dumps(result.get('wall_time_seconds', result.get('skipped'))),
+                  file=sys.stderr)
+            results.append(result)
+        del data
+    return dict(pysie_version=pysie.__version__, python_version=platform.python_version(),
+                numpy_version=np.__version__, platform=platform.platform(), timestamp=time.time(), seed=seed,
+                results=results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pysie hot paths on synthetic data')
+    scale_names = sorted(SCALES, key=lambda scale: SCALES[scale]['rows'])
+    parser.add_argument('--scales', default='tiny,small,medium',
+                        help='comma-separated scales out of ' + ', '.join(scale_names))
+    parser.add_argument('--cases', default=None, help='comma-separated case names, all cases by default')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='JSON file to write, standard output by default')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.scales.split(','), None if args.cases is None else args.cases.split(','),
+                            args.repeats, args.seed)
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
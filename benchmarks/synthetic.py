@@ -0,0 +1,57 @@
+import numpy as np
+
+from pysie.stats.samples import Sample, ColumnarSample
+
+SCALES = {
+    'tiny': dict(rows=1000, groups=2, categories=2),
+    'small': dict(rows=10000, groups=10, categories=5),
+    'medium': dict(rows=100000, groups=100, categories=50),
+    'large': dict(rows=1000000, groups=1000, categories=500),
+    'xlarge': dict(rows=10000000, groups=10000, categories=5000),
+    'huge': dict(rows=100000000, groups=10000, categories=5000),
+}
+
+
+class SyntheticData(object):
+    # reproducible columns for one scale: heavy-tailed numerical values, group ids in a two-level 'region/segment'
+    # hierarchy and categorical labels, all drawn from a seeded generator
+    rows = None
+    groups = None
+    categories = None
+    xs = None
+    group_codes = None
+    group_ids = None
+    label_codes = None
+    labels = None
+
+    def __init__(self, rows, groups, categories, seed=0):
+        generator = np.random.default_rng(seed)
+        self.rows = rows
+        self.groups = groups
+        self.categories = categories
+        self.xs = generator.lognormal(0.0, 1.0, size=rows)
+        self.group_codes = generator.integers(0, groups, size=rows).astype(np.int32)
+        self.group_ids = ['region' + str(i % 10) + '/segment' + str(i) for i in range(groups)]
+        self.label_codes = generator.integers(0, categories, size=rows).astype(np.int32)
+        self.labels = ['label' + str(i) for i in range(categories)]
+
+    def numerical_sample(self):
+        return self.columnar_sample(with_labels=False)
+
+    def categorical_sample(self):
+        return self.columnar_sample(with_labels=True)
+
+    def columnar_sample(self, with_labels=False):
+        if with_labels:
+            return ColumnarSample.from_columns(label_codes=self.label_codes, labels=self.labels,
+                                               group_codes=self.group_codes, group_ids=self.group_ids)
+        return ColumnarSample.from_columns(xs=self.xs, group_codes=self.group_codes, group_ids=self.group_ids)
+
+    def append_numerics(self, sample, rows):
+        group_ids = self.group_ids
+        for x, code in zip(self.xs[:rows].tolist(), self.group_codes[:rows].tolist()):
+            sample.add_numeric(x, group_ids[code])
+        return sample
+
+    def list_sample(self, rows):
+        return self.append_numerics(Sample(), rows)
@@ -0,0 +1,62 @@
+from enum import Enum
+
+import numpy as np
+
+
+class CorrectionMethod(Enum):
+    bonferroni = 1
+    holm = 2
+    hochberg = 3
+    benjamini_hochberg = 4
+    benjamini_yekutieli = 5
+
+
+class MultipleComparisonCorrection(object):
+    p_values = None
+    method = None
+    adjusted_p_values = None
+    significance_level = None
+    reject_null = None
+
+    def __init__(self, p_values, method=CorrectionMethod.holm, significance_level=None):
+        self.p_values = np.asarray(p_values, dtype=np.float64)
+        self.method = method
+        if significance_level is not None:
+            self.significance_level = significance_level
+
+        self.adjusted_p_values = MultipleComparisonCorrection.adjust(self.p_values, method)
+
+        if significance_level is not None:
+            self.reject_null = self.will_reject(significance_level)
+
+    @staticmethod
+    def adjust(p_values, method):
+        m = len(p_values)
+        if m == 0:
+            return p_values.copy()
+        if method == CorrectionMethod.bonferroni:
+            return np.minimum(p_values * m, 1.0)
+
+        order = np.argsort(p_values, kind='stable')
+        sorted_p_values = p_values[order]
+        ranks = np.arange(1, m + 1, dtype=np.float64)
+        if method == CorrectionMethod.holm:
+            adjusted = np.maximum.accumulate((m - ranks + 1) * sorted_p_values)
+        elif method == CorrectionMethod.hochberg:
+            adjusted = np.minimum.accumulate(((m - ranks + 1) * sorted_p_values)[::-1])[::-1]
+        elif method in (CorrectionMethod.benjamini_hochberg, CorrectionMethod.benjamini_yekutieli):
+            adjusted = np.minimum.accumulate((m / ranks * sorted_p_values)[::-1])[::-1]
+            if method == CorrectionMethod.benjamini_yekutieli:
+                adjusted *= (1.0 / ranks).sum()
+        else:
+            raise ValueError('unknown correction method: ' + str(method))
+
+        result = np.empty(m, dtype=np.float64)
+        result[order] = np.minimum(adjusted, 1.0)
+        return result
+
+    def size(self):
+        return len(self.p_values)
+
+    def will_reject(self, significance_level):
+        return self.adjusted_p_values < significance_level
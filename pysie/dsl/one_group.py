@@ -1,8 +1,11 @@
 import math
-import random
 
-from pysie.stats.distributions import DistributionFamily
-from scipy.stats import norm, t
+import numpy as np
+
+from pysie.instrumentation import stage
+from pysie.stats.distributions import DistributionFamily, calculate_p_values, get_test_df
+from pysie.stats.simulation import DEFAULT_REPLICATES, PValueError, calculate_p_value_error, simulate_proportions
+from pysie.stats.critical_values import NORMAL, STUDENT_T, cdf
 
 
 class MeanTesting(object):
@@ -24,7 +27,7 @@ class MeanTesting(object):
             standard_error_null = sampling_distribution.standard_error
             Z = (sampling_distribution.point_estimate - mean_null) / standard_error_null
             self.test_statistic = Z
-            pf = norm.cdf(Z)
+            pf = cdf(NORMAL, Z)
             if Z < 0:
                 pf = 1 - pf
             self.p_value_one_tail = 1 - pf
@@ -33,7 +36,7 @@ class MeanTesting(object):
             standard_error_null = sampling_distribution.standard_error
             td_df = (sampling_distribution.point_estimate - mean_null) / standard_error_null
             self.test_statistic = td_df
-            pf = t.cdf(td_df, sampling_distribution.df)
+            pf = cdf(STUDENT_T, td_df, sampling_distribution.df)
             if td_df < 0:
                 pf = 1 - pf
             self.p_value_one_tail = 1 - pf
@@ -48,6 +51,45 @@ class MeanTesting(object):
         return self.p_value_one_tail < significance_level, self.p_value_two_tail < significance_level
 
 
+class BatchMeanTesting(object):
+    point_estimates = None
+    standard_errors = None
+    dfs = None
+    mean_nulls = None
+    test_statistics = None
+    p_values_one_tail = None
+    p_values_two_tail = None
+    significance_level = None
+    reject_mean_null = None
+
+    def __init__(self, point_estimates, standard_errors, mean_nulls=0.0, dfs=None, significance_level=None):
+        self.point_estimates = np.asarray(point_estimates, dtype=np.float64)
+        self.standard_errors = np.asarray(standard_errors, dtype=np.float64)
+        self.mean_nulls = mean_nulls
+        self.dfs = dfs
+        if significance_level is not None:
+            self.significance_level = significance_level
+
+        self.test_statistics = (self.point_estimates - mean_nulls) / self.standard_errors
+        self.p_values_one_tail, self.p_values_two_tail = calculate_p_values(self.test_statistics, dfs)
+
+        if significance_level is not None:
+            self.reject_mean_null = self.will_reject(significance_level)
+
+    @staticmethod
+    def from_sampling_distributions(sampling_distributions, mean_nulls=0.0, significance_level=None):
+        return BatchMeanTesting(point_estimates=[x.point_estimate for x in sampling_distributions],
+                                standard_errors=[x.standard_error for x in sampling_distributions],
+                                dfs=[get_test_df(x) for x in sampling_distributions],
+                                mean_nulls=mean_nulls, significance_level=significance_level)
+
+    def size(self):
+        return len(self.test_statistics)
+
+    def will_reject(self, significance_level):
+        return self.p_values_one_tail < significance_level, self.p_values_two_tail < significance_level
+
+
 class ProportionTesting(object):
     sampling_distribution = None
     p_value_one_tail = None
@@ -56,10 +98,22 @@ class ProportionTesting(object):
     test_statistic = None
     significance_level = None
     reject_mean_null = None
-
-    def __init__(self, sampling_distribution, p_null, significance_level=None):
+    replicates = DEFAULT_REPLICATES
+    random_state = None
+    precision = None
+    p_value_one_tail_error = None
+    p_value_two_tail_error = None
+
+    def __init__(self, sampling_distribution, p_null, significance_level=None, replicates=None, random_state=None,
+                 precision=None, processes=None, executor=None):
         self.sampling_distribution = sampling_distribution
         self.p_null = p_null
+        if replicates is not None:
+            self.replicates = replicates
+        if random_state is not None:
+            self.random_state = random_state
+        if precision is not None:
+            self.precision = precision
         if significance_level is not None:
             self.significance_level = significance_level
 
@@ -67,30 +121,37 @@ class ProportionTesting(object):
             standard_error_null = math.sqrt(p_null * (1 - p_null) / sampling_distribution.sample_size)
             Z = (sampling_distribution.point_estimate - p_null) / standard_error_null
             self.test_statistic = Z
-            pf = norm.cdf(Z)
+            with stage('proportion_testing', 'cdf'):
+                pf = cdf(NORMAL, Z)
             if Z < 0:
                 pf = 1 - pf
             self.p_value_one_tail = 1 - pf
             self.p_value_two_tail = self.p_value_one_tail * 2
         else:
-            simulated_proportions = self.simulate()
-
-            self.p_value_one_tail = sum(1.0 for x in simulated_proportions if x > sampling_distribution.point_estimate) / 1000.0
+            simulated_proportions = self.simulate(processes, executor)
+            extreme = np.count_nonzero(simulated_proportions > sampling_distribution.point_estimate)
+            self.p_value_one_tail = extreme / float(len(simulated_proportions))
             self.p_value_two_tail = self.p_value_one_tail
+            self.p_value_one_tail_error = calculate_p_value_error(extreme, len(simulated_proportions))
+            self.p_value_two_tail_error = self.p_value_one_tail_error
 
         if significance_level is not None:
             self.reject_mean_null = (self.p_value_one_tail < significance_level,
                                      self.p_value_two_tail < significance_level)
 
-    def simulate(self):
-        simulated_proportions = [0] * 1000
-        for i in range(1000):
-            count = 0
-            for trials in range(self.sampling_distribution.sample_size):
-                if random.random() <= self.p_null:
-                    count += 1
-            simulated_proportions[i] = float(count) / self.sampling_distribution.sample_size
-        return sorted(simulated_proportions)
+    def simulate(self, processes=None, executor=None):
+        # with a precision, the simulation stops once the Monte Carlo standard error of the p-value is within it
+        point_estimate = self.sampling_distribution.point_estimate
+        calculate_error = PValueError(lambda simulated_proportions:
+                                      np.count_nonzero(simulated_proportions > point_estimate))
+
+        with stage('proportion_testing', 'simulating',
+                   rows=self.sampling_distribution.sample_size) as simulating_stage:
+            simulated_proportions = simulate_proportions(self.p_null, self.sampling_distribution.sample_size,
+                                                         self.replicates, self.random_state, self.precision,
+                                                         processes, executor, calculate_error)
+            simulating_stage.replicates = len(simulated_proportions)
+        return simulated_proportions
 
     def will_reject(self, significance_level):
 
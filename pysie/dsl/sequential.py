@@ -0,0 +1,251 @@
+import math
+from abc import ABCMeta, abstractmethod
+
+from enum import Enum
+
+import numpy as np
+
+from pysie.stats.critical_values import NORMAL, cdf, compute_ppf
+from pysie.stats.samples import SampleSummary
+
+# a base class built by calling the metaclass parses on every Python version, unlike the metaclass keyword
+AbstractBase = ABCMeta('AbstractBase', (object,), {})
+
+
+class SequentialMethod(Enum):
+    msprt = 1
+    obrien_fleming = 2
+    pocock = 3
+
+
+def spend_alpha(method, significance_level, information_fraction):
+    # Lan-DeMets spending functions: the type I error that may have been spent once a fraction of the planned
+    # information has been observed
+    information_fraction = min(max(information_fraction, 0.0), 1.0)
+    if information_fraction == 0:
+        return 0.0
+    if method == SequentialMethod.obrien_fleming:
+        z = compute_ppf(NORMAL, 1 - significance_level / 2)
+        return float(2 - 2 * cdf(NORMAL, z / math.sqrt(information_fraction)))
+    if method == SequentialMethod.pocock:
+        return significance_level * math.log(1 + (math.e - 1) * information_fraction)
+    raise ValueError('unknown alpha spending method: ' + str(method))
+
+
+class GroupSequentialBoundaries(object):
+    method = SequentialMethod.obrien_fleming
+    significance_level = 0.05
+    grid_size = 401
+    information_fractions = None
+    critical_values = None
+    alpha_spent = 0.0
+    grid = None
+    density = None
+
+    def __init__(self, method=None, significance_level=None, grid_size=None):
+        if method is not None:
+            self.method = method
+        if significance_level is not None:
+            self.significance_level = significance_level
+        if grid_size is not None:
+            self.grid_size = grid_size
+        self.information_fractions = []
+        self.critical_values = []
+
+    def size(self):
+        return len(self.critical_values)
+
+    def add_look(self, information_fraction):
+        # the two-sided critical value of the next look, chosen so that the probability under the null of first
+        # crossing the boundaries at this look equals the alpha spent since the previous look; the sub-density of
+        # the score statistic on the continuation region is carried from look to look (Armitage, McPherson and Rowe),
+        # so a look costs the same however many observations or looks came before
+        previous_fraction = self.information_fractions[-1] if self.information_fractions else 0.0
+        if information_fraction <= previous_fraction:
+            raise ValueError('the information fraction must increase from look to look')
+        alpha_spent = spend_alpha(self.method, self.significance_level, information_fraction)
+        increment = max(alpha_spent - self.alpha_spent, 0.0)
+        if information_fraction >= 1:
+            increment = max(self.significance_level - self.alpha_spent, 0.0)
+
+        if self.density is None:
+            if increment > 0:
+                critical_value = compute_ppf(NORMAL, 1 - increment / 2)
+            else:
+                critical_value = np.inf
+            bound = min(critical_value, 10.0) * math.sqrt(information_fraction)
+            self.grid = np.linspace(-bound, bound, self.grid_size)
+            self.density = np.exp(-0.5 * np.square(self.grid) / information_fraction) / \
+                math.sqrt(2 * math.pi * information_fraction)
+        else:
+            sd = math.sqrt(information_fraction - previous_fraction)
+            step = np.full(self.grid_size, self.grid[1] - self.grid[0])
+            step[[0, -1]] *= 0.5
+            weights = self.density * step
+
+            def crossing_probability(b):
+                return float(np.dot(weights, cdf(NORMAL, (-b - self.grid) / sd) + cdf(NORMAL, (self.grid - b) / sd)))
+
+            reach = abs(self.grid[-1]) + 10.0 * sd
+            if increment <= 0 or crossing_probability(reach) >= increment:
+                bound = reach
+                critical_value = np.inf
+            else:
+                lower, upper = 0.0, reach
+                for i in range(100):
+                    middle = 0.5 * (lower + upper)
+                    if crossing_probability(middle) > increment:
+                        lower = middle
+                    else:
+                        upper = middle
+                bound = 0.5 * (lower + upper)
+                critical_value = bound / math.sqrt(information_fraction)
+            grid = np.linspace(-bound, bound, self.grid_size)
+            kernel = np.exp(-0.5 * np.square((grid[:, np.newaxis] - self.grid[np.newaxis, :]) / sd)) / \
+                (sd * math.sqrt(2 * math.pi))
+            self.density = kernel.dot(weights)
+            self.grid = grid
+
+        self.alpha_spent = max(self.alpha_spent, alpha_spent)
+        self.information_fractions.append(information_fraction)
+        self.critical_values.append(float(critical_value))
+        return float(critical_value)
+
+
+class SequentialDiffTesting(AbstractBase):
+    grp1_summary = None
+    grp2_summary = None
+    method = SequentialMethod.msprt
+    significance_level = 0.05
+    mixture_variance = 1.0
+    max_sample_size = None
+    boundaries = None
+
+    point_estimate = None
+    standard_error = None
+    test_statistic = None
+    log_likelihood_ratio = None
+    critical_value = None
+    p_value = 1.0
+    looks = 0
+    reject_same = False
+
+    def __init__(self, method=None, significance_level=None, mixture_variance=None, max_sample_size=None):
+        if method is not None:
+            self.method = method
+        if significance_level is not None:
+            self.significance_level = significance_level
+        if mixture_variance is not None:
+            self.mixture_variance = mixture_variance
+        if max_sample_size is not None:
+            self.max_sample_size = max_sample_size
+        if self.method != SequentialMethod.msprt:
+            if self.max_sample_size is None:
+                raise ValueError('group-sequential boundaries need the planned max_sample_size')
+            self.boundaries = GroupSequentialBoundaries(self.method, self.significance_level)
+        self.grp1_summary = SampleSummary(group_id='grp1')
+        self.grp2_summary = SampleSummary(group_id='grp2')
+
+    @abstractmethod
+    def calculate_estimates(self):
+        # returns the point estimate of the difference and its variance, or None while a group is too small
+        pass
+
+    def peek(self):
+        # reads the running summaries of the two groups, so a look costs the same however much data has arrived;
+        # once rejected, the test stays rejected
+        self.looks += 1
+        self.point_estimate, variance = self.calculate_estimates()
+        if variance is None or variance <= 0:
+            return self.reject_same
+        self.standard_error = math.sqrt(variance)
+        self.test_statistic = self.point_estimate / self.standard_error
+
+        if self.method == SequentialMethod.msprt:
+            self.peek_msprt(variance)
+        else:
+            self.peek_group_sequential()
+        return self.reject_same
+
+    def peek_msprt(self, variance):
+        # mixture sequential probability ratio test with a normal mixture over the difference: the always-valid
+        # p-value is the running minimum of the inverse likelihood ratio
+        total_variance = variance + self.mixture_variance
+        self.log_likelihood_ratio = 0.5 * math.log(variance / total_variance) + \
+            self.mixture_variance * self.point_estimate * self.point_estimate / (2 * variance * total_variance)
+        self.p_value = min(self.p_value, math.exp(min(-self.log_likelihood_ratio, 0.0)))
+        if self.p_value < self.significance_level:
+            self.reject_same = True
+
+    def peek_group_sequential(self):
+        information_fraction = min(float(self.size()) / self.max_sample_size, 1.0)
+        previous_fractions = self.boundaries.information_fractions
+        if previous_fractions and information_fraction <= previous_fractions[-1]:
+            return
+        self.critical_value = self.boundaries.add_look(information_fraction)
+        if abs(self.test_statistic) >= self.critical_value:
+            self.reject_same = True
+
+    def size(self):
+        return self.grp1_summary.size() + self.grp2_summary.size()
+
+    def will_reject(self, significance_level=None):
+        if significance_level is None or self.method != SequentialMethod.msprt:
+            return self.reject_same
+        return self.p_value < significance_level
+
+
+class SequentialMeanDiffTesting(SequentialDiffTesting):
+    def add_grp1_numeric(self, x):
+        self.grp1_summary.add_numeric(x)
+
+    def add_grp2_numeric(self, x):
+        self.grp2_summary.add_numeric(x)
+
+    def add_grp1_numerics(self, xs):
+        self.grp1_summary.add_numerics(xs)
+
+    def add_grp2_numerics(self, xs):
+        self.grp2_summary.add_numerics(xs)
+
+    def calculate_estimates(self):
+        grp1_size = self.grp1_summary.size()
+        grp2_size = self.grp2_summary.size()
+        if grp1_size < 2 or grp2_size < 2:
+            return None, None
+        grp1_variance = self.grp1_summary.sum_of_squares / (grp1_size - 1)
+        grp2_variance = self.grp2_summary.sum_of_squares / (grp2_size - 1)
+        return self.grp1_summary.mean - self.grp2_summary.mean, \
+            grp1_variance / grp1_size + grp2_variance / grp2_size
+
+
+class SequentialProportionDiffTesting(SequentialDiffTesting):
+    categorical_value = None
+
+    def __init__(self, categorical_value, method=None, significance_level=None, mixture_variance=None,
+                 max_sample_size=None):
+        self.categorical_value = categorical_value
+        super(SequentialProportionDiffTesting, self).__init__(method, significance_level, mixture_variance,
+                                                              max_sample_size)
+
+    def add_grp1_category(self, label):
+        self.grp1_summary.add_category(label)
+
+    def add_grp2_category(self, label):
+        self.grp2_summary.add_category(label)
+
+    def add_grp1_categories(self, labels):
+        self.grp1_summary.add_categories(labels)
+
+    def add_grp2_categories(self, labels):
+        self.grp2_summary.add_categories(labels)
+
+    def calculate_estimates(self):
+        grp1_size = self.grp1_summary.size()
+        grp2_size = self.grp2_summary.size()
+        if grp1_size == 0 or grp2_size == 0:
+            return None, None
+        grp1_proportion = self.grp1_summary.proportion(self.categorical_value)
+        grp2_proportion = self.grp2_summary.proportion(self.categorical_value)
+        return grp1_proportion - grp2_proportion, \
+            grp1_proportion * (1 - grp1_proportion) / grp1_size + grp2_proportion * (1 - grp2_proportion) / grp2_size
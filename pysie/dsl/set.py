@@ -1,21 +1,12 @@
 class TstNode(object):
-    key = None
-    value = None
-    mid = None
-    left = None
-    right = None
+    __slots__ = ('key', 'value', 'mid', 'left', 'right')
 
     def __init__(self, key=None, value=None, left=None, right=None, mid=None):
-        if key is not None:
-            self.key = key
-        if value is not None:
-            self.value = value
-        if mid is not None:
-            self.mid = mid
-        if left is not None:
-            self.left = left
-        if right is not None:
-            self.right = right
+        self.key = key
+        self.value = value
+        self.mid = mid
+        self.left = left
+        self.right = right
 
 
 def char_at(s, index):
@@ -24,77 +15,135 @@ def char_at(s, index):
     return ord(s[index])
 
 
+class TstView(object):
+    trie = None
+    with_keys = True
+
+    def __init__(self, trie, with_keys=True):
+        self.trie = trie
+        self.with_keys = with_keys
+
+    def __len__(self):
+        return self.trie.size()
+
+    def __iter__(self):
+        if self.with_keys:
+            return self.trie.iter_keys()
+        return self.trie.iter_values()
+
+
 class TernarySearchTrie(object):
     root = None
     N = 0
 
-    def put(self, key, value):
-        self.root = self._put(self.root, key, value, 0)
+    @classmethod
+    def bulk_load(cls, items):
+        # inserting the median of every range before the two halves keeps the left and right links of the trie
+        # balanced, whatever the order in which the sorted keys arrive
+        items = sorted(items, key=lambda item: item[0])
+        trie = cls()
+        ranges = [(0, len(items))]
+        while ranges:
+            start, stop = ranges.pop()
+            if start >= stop:
+                continue
+            middle = (start + stop) // 2
+            key, value = items[middle]
+            trie.put(key, value)
+            ranges.append((middle + 1, stop))
+            ranges.append((start, middle))
+        return trie
 
-    def _put(self, x, key, value, d):
-        c = char_at(key, d)
-        if x is None:
-            x = TstNode(key=c, value=None)
-        compared = c - x.key
-        if compared < 0:
-            x.left = self._put(x.left, key, value, d)
-        elif compared > 0:
-            x.right = self._put(x.right, key, value, d)
-        else:
-            if len(key) - 1 > d:
-                x.mid = self._put(x.mid, key, value, d + 1)
+    def put(self, key, value):
+        c = char_at(key, 0)
+        if self.root is None:
+            self.root = TstNode(key=c)
+        x = self.root
+        d = 0
+        last = len(key) - 1
+        while True:
+            if c < x.key:
+                if x.left is None:
+                    x.left = TstNode(key=c)
+                x = x.left
+            elif c > x.key:
+                if x.right is None:
+                    x.right = TstNode(key=c)
+                x = x.right
+            elif last > d:
+                d += 1
+                c = char_at(key, d)
+                if x.mid is None:
+                    x.mid = TstNode(key=c)
+                x = x.mid
             else:
                 if x.value is None:
                     self.N += 1
                 x.value = value
-        return x
+                return
 
     def get(self, key):
-        x = self._get(self.root, key, 0)
+        x = self._get(key)
         if x is None:
             return None
         return x.value
 
-    def _get(self, x, key, d):
-        c = char_at(key, d)
-        if x is None:
-            return None
-        compared = c - x.key
-        if compared < 0:
-            return self._get(x.left, key, d)
-        elif compared > 0:
-            return self._get(x.right, key, d)
-        else:
-            if len(key) - 1 > d:
-                return self._get(x.mid, key, d + 1)
+    def _get(self, key):
+        x = self.root
+        d = 0
+        c = char_at(key, 0)
+        last = len(key) - 1
+        while x is not None:
+            if c < x.key:
+                x = x.left
+            elif c > x.key:
+                x = x.right
+            elif last > d:
+                d += 1
+                c = char_at(key, d)
+                x = x.mid
             else:
                 return x
+        return None
 
     def delete(self, key):
-        self.root = self._delete(self.root, key, 0)
-
-    def _delete(self, x, key, d):
-        if x is None:
-            return None
-        c = char_at(key, d)
-        compared = c - x.key
-        if compared < 0:
-            x.left = self._delete(x.left, key, d)
-        elif compared > 0:
-            x.right = self._delete(x.right, key, d)
-        else:
-            if len(key) - 1 > d:
-                x.mid = self._delete(x.mid, key, d + 1)
+        path = []
+        x = self.root
+        d = 0
+        c = char_at(key, 0)
+        last = len(key) - 1
+        while x is not None:
+            if c < x.key:
+                path.append((x, 'left'))
+                x = x.left
+            elif c > x.key:
+                path.append((x, 'right'))
+                x = x.right
+            elif last > d:
+                d += 1
+                c = char_at(key, d)
+                path.append((x, 'mid'))
+                x = x.mid
             else:
-                self.N -= 1
-                x = None
-        return x
+                break
+
+        if x is None or x.value is None:
+            return
+        x.value = None
+        self.N -= 1
+
+        # prune the nodes that no longer lead to any key, walking back up the search path
+        while x is not None and x.value is None and x.left is None and x.mid is None and x.right is None:
+            if not path:
+                self.root = None
+                return
+            parent, link = path.pop()
+            setattr(parent, link, None)
+            x = parent
 
     def contains_key(self, key):
-        x = self._get(self.root, key, 0)
-        if x is None:
-            return False
-        return True
+        x = self._get(key)
+        return x is not None and x.value is not None
 
     def size(self):
         return self.N
@@ -103,36 +152,105 @@ class TernarySearchTrie(object):
         return self.N == 0
 
     def keys(self):
-        queue = []
-        self.collect(self.root, '', queue)
-        return queue
+        return TstView(self, with_keys=True)
 
     def values(self):
-        queue = []
-        self.collect_values(self.root, queue)
-        return queue
+        return TstView(self, with_keys=False)
+
+    def iter_keys(self):
+        for key, value in self.iter_items():
+            yield key
 
-    def collect(self, x, prefix, queue):
+    def iter_values(self):
+        for key, value in self.iter_items():
+            yield value
+
+    def iter_items(self):
+        return self.collect_items(self.root, '')
+
+    def collect_items(self, x, prefix):
+        # in-order traversal with an explicit stack, so the keys come out in sorted order; entries flagged with
+        # emit stand for the key that ends at their node
         if x is None:
             return
-        if x.value is not None:
-            queue.append(prefix + chr(x.key))
-        self.collect(x.left, prefix, queue)
-        self.collect(x.mid, prefix + chr(x.key), queue)
-        self.collect(x.right, prefix, queue)
+        stack = [(x, prefix, False)]
+        while stack:
+            x, prefix, emit = stack.pop()
+            if emit:
+                yield prefix + chr(x.key), x.value
+                continue
+            if x.right is not None:
+                stack.append((x.right, prefix, False))
+            if x.mid is not None:
+                stack.append((x.mid, prefix + chr(x.key), False))
+            if x.value is not None:
+                stack.append((x, prefix, True))
+            if x.left is not None:
+                stack.append((x.left, prefix, False))
 
-    def collect_values(self, x, queue):
+    def keys_with_prefix(self, prefix):
+        if prefix == '':
+            for key in self.iter_keys():
+                yield key
+            return
+        x = self._get(prefix)
         if x is None:
             return
         if x.value is not None:
-            queue.append(x.value)
+            yield prefix
+        for key, value in self.collect_items(x.mid, prefix):
+            yield key
+
+    def keys_that_match(self, pattern, wildcard='.'):
+        if pattern == '' or self.root is None:
+            return
+        last = len(pattern) - 1
+        stack = [(self.root, '', 0, False)]
+        while stack:
+            x, prefix, d, emit = stack.pop()
+            if emit:
+                yield prefix + chr(x.key)
+                continue
+            c = pattern[d]
+            code = ord(c)
+            any_char = c == wildcard
+            if x.right is not None and (any_char or code > x.key):
+                stack.append((x.right, prefix, d, False))
+            if any_char or code == x.key:
+                if d < last and x.mid is not None:
+                    stack.append((x.mid, prefix + chr(x.key), d + 1, False))
+                if d == last and x.value is not None:
+                    stack.append((x, prefix, d, True))
+            if x.left is not None and (any_char or code < x.key):
+                stack.append((x.left, prefix, d, False))
 
-        self.collect_values(x.left, queue)
-        self.collect_values(x.mid, queue)
-        self.collect_values(x.right, queue)
+    def longest_prefix_of(self, query):
+        length = 0
+        found = False
+        x = self.root
+        d = 0
+        while x is not None and d < len(query):
+            c = ord(query[d])
+            if c < x.key:
+                x = x.left
+            elif c > x.key:
+                x = x.right
+            else:
+                d += 1
+                if x.value is not None:
+                    length = d
+                    found = True
+                x = x.mid
+        if not found:
+            return None
+        return query[:length]
 
 
 class TernarySearchSet(TernarySearchTrie):
+    @classmethod
+    def bulk_load_keys(cls, keys):
+        return cls.bulk_load((key, 0) for key in keys)
+
     def add(self, key):
         self.put(key, 0)
 
@@ -140,4 +258,4 @@ class TernarySearchSet(TernarySearchTrie):
         return self.contains_key(key)
 
     def to_array(self):
-        return self.keys()
+        return list(self.iter_keys())
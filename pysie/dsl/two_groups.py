@@ -1,7 +1,13 @@
-import random
-
-from pysie.stats.distributions import DistributionFamily
-from scipy.stats import norm, t
+import numpy as np
+
+from pysie.instrumentation import stage
+from pysie.stats.bootstrap import get_sample_array
+from pysie.stats.distributions import DistributionFamily, DfStrategy, calculate_mean_diff_standard_errors, \
+    calculate_p_values, get_test_df
+from pysie.stats.permutation import MeanDiffStatistic, PermutationTest
+from pysie.stats.simulation import DEFAULT_REPLICATES, PValueError, calculate_p_value_error, \
+    simulate_proportion_diffs
+from pysie.stats.critical_values import NORMAL, STUDENT_T, cdf
 import math
 
 
@@ -9,19 +15,37 @@ class MeanDiffTesting(object):
     sampling_distribution = None
     p_value_one_tail = None
     p_value_two_tail = None
+    p_value_one_tail_error = None
+    p_value_two_tail_error = None
     test_statistic = None
     significance_level = None
     reject_mean_same = None
-
-    def __init__(self, sampling_distribution, significance_level=None):
+    permutation = False
+    permutation_test = None
+    replicates = DEFAULT_REPLICATES
+    random_state = None
+    early_stopping = False
+
+    def __init__(self, sampling_distribution, significance_level=None, permutation=None, replicates=None,
+                 random_state=None, early_stopping=None, processes=None, executor=None):
         self.sampling_distribution = sampling_distribution
         if significance_level is not None:
             self.significance_level = significance_level
-
-        if self.sampling_distribution.distribution_family == DistributionFamily.normal:
+        if permutation is not None:
+            self.permutation = permutation
+        if replicates is not None:
+            self.replicates = replicates
+        if random_state is not None:
+            self.random_state = random_state
+        if early_stopping is not None:
+            self.early_stopping = early_stopping
+
+        if self.permutation:
+            self.test_permutation(processes, executor)
+        elif self.sampling_distribution.distribution_family == DistributionFamily.normal:
             Z = sampling_distribution.point_estimate / sampling_distribution.standard_error
             self.test_statistic = Z
-            pf = norm.cdf(Z)
+            pf = cdf(NORMAL, Z)
             if Z < 0:
                 pf = 1 - pf
             self.p_value_one_tail = 1 - pf
@@ -29,7 +53,7 @@ class MeanDiffTesting(object):
         else:
             td_df = sampling_distribution.point_estimate / sampling_distribution.standard_error
             self.test_statistic = td_df
-            pf = t.cdf(td_df, sampling_distribution.df)
+            pf = cdf(STUDENT_T, td_df, sampling_distribution.df)
             if td_df < 0:
                 pf = 1 - pf
             self.p_value_one_tail = 1 - pf
@@ -39,11 +63,91 @@ class MeanDiffTesting(object):
             self.reject_mean_same = (self.p_value_one_tail < significance_level,
                                      self.p_value_two_tail < significance_level)
 
+    def test_permutation(self, processes=None, executor=None):
+        # shuffles the group memberships of the pooled observations; the statistic is the difference of the means,
+        # and early stopping is decided on the two-tailed p-value
+        statistic = MeanDiffStatistic(get_sample_array(self.sampling_distribution.grp1_sample_distribution),
+                                      get_sample_array(self.sampling_distribution.grp2_sample_distribution))
+        with stage('mean_diff_testing', 'permutation', rows=len(statistic.codes)) as permutation_stage:
+            self.permutation_test = PermutationTest(statistic, two_sided=True, replicates=self.replicates,
+                                                    random_state=self.random_state,
+                                                    significance_level=self.significance_level,
+                                                    early_stopping=self.early_stopping, processes=processes,
+                                                    executor=executor)
+            permutation_stage.replicates = self.permutation_test.size()
+        self.test_statistic = self.permutation_test.observed
+        self.p_value_one_tail = self.permutation_test.calculate_p_value(two_sided=False)
+        self.p_value_two_tail = self.permutation_test.p_value
+        self.p_value_one_tail_error = self.permutation_test.calculate_p_value_error(two_sided=False)
+        self.p_value_two_tail_error = self.permutation_test.p_value_error
+
     def will_reject(self, significance_level):
 
         return self.p_value_one_tail < significance_level, self.p_value_two_tail < significance_level
 
 
+class BatchMeanDiffTesting(object):
+    point_estimates = None
+    standard_errors = None
+    dfs = None
+    test_statistics = None
+    p_values_one_tail = None
+    p_values_two_tail = None
+    significance_level = None
+    reject_mean_same = None
+
+    def __init__(self, point_estimates, standard_errors, dfs=None, significance_level=None):
+        self.point_estimates = np.asarray(point_estimates, dtype=np.float64)
+        self.standard_errors = np.asarray(standard_errors, dtype=np.float64)
+        self.dfs = dfs
+        if significance_level is not None:
+            self.significance_level = significance_level
+
+        self.test_statistics = self.point_estimates / self.standard_errors
+        self.p_values_one_tail, self.p_values_two_tail = calculate_p_values(self.test_statistics, dfs)
+
+        if significance_level is not None:
+            self.reject_mean_same = self.will_reject(significance_level)
+
+    @staticmethod
+    def from_sampling_distributions(sampling_distributions, significance_level=None):
+        return BatchMeanDiffTesting(point_estimates=[x.point_estimate for x in sampling_distributions],
+                                    standard_errors=[x.standard_error for x in sampling_distributions],
+                                    dfs=[get_test_df(x) for x in sampling_distributions],
+                                    significance_level=significance_level)
+
+    @staticmethod
+    def from_sample_statistics(grp1_sample_means, grp1_sample_sds, grp1_sample_sizes, grp2_sample_means,
+                               grp2_sample_sds, grp2_sample_sizes, df_strategy=DfStrategy.conservative,
+                               significance_level=None):
+        # array form of MeanDiffSamplingDistribution for many group pairs at once; pairs where both groups have at
+        # least 30 observations use the normal distribution, as the single sampling distribution does
+        grp1_sample_sizes = np.asarray(grp1_sample_sizes, dtype=np.float64)
+        grp2_sample_sizes = np.asarray(grp2_sample_sizes, dtype=np.float64)
+        standard_errors, dfs = calculate_mean_diff_standard_errors(grp1_sample_sds, grp1_sample_sizes,
+                                                                   grp2_sample_sds, grp2_sample_sizes, df_strategy)
+        dfs = np.where((grp1_sample_sizes < 30) | (grp2_sample_sizes < 30), dfs, np.inf)
+        point_estimates = np.asarray(grp1_sample_means, dtype=np.float64) - np.asarray(grp2_sample_means,
+                                                                                       dtype=np.float64)
+        return BatchMeanDiffTesting(point_estimates=point_estimates, standard_errors=standard_errors, dfs=dfs,
+                                    significance_level=significance_level)
+
+    @staticmethod
+    def from_paired_statistics(diff_sample_means, diff_sample_sds, sample_sizes, significance_level=None):
+        # paired differences are a one-sample problem on the differences x - y
+        sample_sizes = np.asarray(sample_sizes, dtype=np.float64)
+        standard_errors = np.asarray(diff_sample_sds, dtype=np.float64) / np.sqrt(sample_sizes)
+        dfs = np.where(sample_sizes < 30, sample_sizes - 1, np.inf)
+        return BatchMeanDiffTesting(point_estimates=diff_sample_means, standard_errors=standard_errors, dfs=dfs,
+                                    significance_level=significance_level)
+
+    def size(self):
+        return len(self.test_statistics)
+
+    def will_reject(self, significance_level):
+        return self.p_values_one_tail < significance_level, self.p_values_two_tail < significance_level
+
+
 class ProportionDiffTesting(object):
     sampling_distribution = None
     p_value_one_tail = None
@@ -52,48 +156,90 @@ class ProportionDiffTesting(object):
     test_statistic = None
     significance_level = None
     reject_proportion_same = None
-
-    def __init__(self, sampling_distribution, significance_level=None):
+    exact = False
+    replicates = DEFAULT_REPLICATES
+    random_state = None
+    precision = None
+    p_value_one_tail_error = None
+    p_value_two_tail_error = None
+
+    def __init__(self, sampling_distribution, significance_level=None, exact=None, replicates=None,
+                 random_state=None, precision=None, processes=None, executor=None):
         self.sampling_distribution = sampling_distribution
         p_null = (sampling_distribution.grp1_point_estimate + sampling_distribution.grp2_point_estimate) / 2
         self.p_null = p_null
         if significance_level is not None:
             self.significance_level = significance_level
-
-        if self.sampling_distribution.distribution_family == DistributionFamily.normal:
+        if exact is not None:
+            self.exact = exact
+        if replicates is not None:
+            self.replicates = replicates
+        if random_state is not None:
+            self.random_state = random_state
+        if precision is not None:
+            self.precision = precision
+
+        if self.exact:
+            self.test_exact()
+        elif self.sampling_distribution.distribution_family == DistributionFamily.normal:
             standard_error_null = math.sqrt(p_null * (1 - p_null) / sampling_distribution.grp1_sample_size + p_null * (1-p_null) / sampling_distribution.grp2_sample_size)
             Z = sampling_distribution.point_estimate / standard_error_null
             self.test_statistic = Z
-            pf = norm.cdf(Z)
+            pf = cdf(NORMAL, Z)
             if Z < 0:
                 pf = 1 - pf
             self.p_value_one_tail = 1 - pf
             self.p_value_two_tail = self.p_value_one_tail * 2
         else:
-            simulated_proportions = self.simulate()
             diff = sampling_distribution.grp1_point_estimate - sampling_distribution.grp2_point_estimate
-            pf = sum(1.0 for x in simulated_proportions if x > diff) / 1000.0
-            self.p_value_one_tail = pf
-            self.p_value_two_tail = sum(1.0 for x in simulated_proportions if x > diff or x < -diff) / 1000.0
+            simulated_proportions = self.simulate(processes, executor)
+            replicates = len(simulated_proportions)
+            one_tail_extreme, two_tail_extreme = ProportionDiffTesting.count_extreme(simulated_proportions, diff)
+            self.p_value_one_tail = one_tail_extreme / float(replicates)
+            self.p_value_two_tail = two_tail_extreme / float(replicates)
+            self.p_value_one_tail_error = calculate_p_value_error(one_tail_extreme, replicates)
+            self.p_value_two_tail_error = calculate_p_value_error(two_tail_extreme, replicates)
 
         if significance_level is not None:
             self.reject_proportion_same = (self.p_value_one_tail < significance_level,
                                            self.p_value_two_tail < significance_level)
 
-    def simulate(self):
-        simulated_proportions = [0] * 1000
-        for i in range(1000):
-            count1 = 0
-            for trials in range(self.sampling_distribution.grp1_sample_size):
-                if random.random() <= self.p_null:
-                    count1 += 1
-            count2 = 0
-            for trials in range(self.sampling_distribution.grp2_sample_size):
-                if random.random() <= self.p_null:
-                    count2 += 1
-
-            simulated_proportions[i] = float(count1) / self.sampling_distribution.grp1_sample_size - float(count2) / self.sampling_distribution.grp2_sample_size
-        return sorted(simulated_proportions)
+    @staticmethod
+    def count_extreme(simulated_proportions, diff):
+        return np.count_nonzero(simulated_proportions > diff), \
+            np.count_nonzero((simulated_proportions > diff) | (simulated_proportions < -diff))
+
+    def simulate(self, processes=None, executor=None):
+        # with a precision, the simulation stops once the Monte Carlo standard errors of both p-values are within it
+        diff = self.sampling_distribution.grp1_point_estimate - self.sampling_distribution.grp2_point_estimate
+        calculate_error = PValueError(lambda simulated_proportions:
+                                      ProportionDiffTesting.count_extreme(simulated_proportions, diff))
+
+        with stage('proportion_diff_testing', 'simulating',
+                   rows=self.sampling_distribution.grp1_sample_size +
+                   self.sampling_distribution.grp2_sample_size) as simulating_stage:
+            _, _, simulated_proportions = simulate_proportion_diffs(self.p_null,
+                                                                    self.sampling_distribution.grp1_sample_size,
+                                                                    self.p_null,
+                                                                    self.sampling_distribution.grp2_sample_size,
+                                                                    self.replicates, self.random_state,
+                                                                    self.precision, processes, executor,
+                                                                    calculate_error)
+            simulating_stage.replicates = len(simulated_proportions)
+            return np.sort(simulated_proportions)
+
+    def test_exact(self):
+        # Fisher's exact test on the 2x2 table of successes and failures in the two groups
+        from scipy.stats import fisher_exact
+
+        grp1_sample_size = self.sampling_distribution.grp1_sample_size
+        grp2_sample_size = self.sampling_distribution.grp2_sample_size
+        grp1_count = int(round(self.sampling_distribution.grp1_point_estimate * grp1_sample_size))
+        grp2_count = int(round(self.sampling_distribution.grp2_point_estimate * grp2_sample_size))
+        table = [[grp1_count, grp1_sample_size - grp1_count], [grp2_count, grp2_sample_size - grp2_count]]
+        self.test_statistic, self.p_value_two_tail = fisher_exact(table, alternative='two-sided')
+        alternative = 'greater' if self.sampling_distribution.point_estimate >= 0 else 'less'
+        self.p_value_one_tail = fisher_exact(table, alternative=alternative)[1]
 
     def will_reject(self, significance_level):
 
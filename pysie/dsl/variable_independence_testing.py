@@ -1,62 +1,158 @@
 import math
 
-from pysie.dsl.set import TernarySearchSet, TernarySearchTrie
+import numpy as np
+
+from pysie.dsl.set import TernarySearchTrie
+from pysie.instrumentation import stage
 from pysie.stats.distributions import MeanSamplingDistribution
-from pysie.stats.samples import SampleDistribution
+from pysie.stats.parallel import map_tasks
+from pysie.stats.permutation import AnovaStatistic, ChiSquareStatistic, PermutationTest
+from pysie.stats import samples
+from pysie.stats.samples import GroupedSampleSummary
+from pysie.stats.simulation import DEFAULT_REPLICATES
+
+from pysie.stats.critical_values import CHI_SQUARE, FISHER, sf
+
+
+def count_cells(task):
+    label_codes, group_codes, label_count, group_count = task
+    matched = (label_codes >= 0) & (group_codes >= 0)
+    cells = label_codes[matched].astype(np.int64) * group_count + group_codes[matched]
+    return np.bincount(cells, minlength=label_count * group_count).reshape(label_count, group_count)
+
+
+class NameList(list):
+    # the row or column names of a ContingencyTable in code order; to_array, size and contains keep the read side
+    # of the TernarySearchSet the names used to be kept in
+    def to_array(self):
+        return list(self)
 
-from scipy.stats import f, chi2
+    def size(self):
+        return len(self)
+
+    def contains(self, key):
+        return key in self
 
 
 class ContingencyTable(object):
     values = None
     rows = None
     columns = None
-
-    def __init__(self):
-        self.rows = TernarySearchSet()
-        self.columns = TernarySearchSet()
-        self.values = TernarySearchTrie()
+    row_index = None
+    column_index = None
+    row_totals = None
+    column_totals = None
+
+    def __init__(self, values=None, rows=None, columns=None):
+        self.rows = NameList([] if rows is None else rows)
+        self.columns = NameList([] if columns is None else columns)
+        self.row_index = dict((row_name, i) for i, row_name in enumerate(self.rows))
+        self.column_index = dict((column_name, i) for i, column_name in enumerate(self.columns))
+        if values is None:
+            values = np.zeros((max(4, len(self.rows)), max(4, len(self.columns))), dtype=np.int64)
+        self.values = values
+
+    @staticmethod
+    def from_sample(sample, processes=None, executor=None):
+        if sample.grouped_summary is not None and sample.grouped_summary.labels is not None:
+            return ContingencyTable.from_grouped_summary(sample.grouped_summary)
+        label_codes, labels = sample.get_label_codes()
+        group_codes, group_ids = sample.get_group_codes()
+        # the counts of the partitions are integers, so adding them up gives the serial counts exactly; the
+        # partition size is read here, so it is the one GroupedSampleSummary.from_codes uses
+        partition_rows = samples.PARTITION_ROWS
+        tasks = [(label_codes[start:start + partition_rows], group_codes[start:start + partition_rows], len(labels),
+                  len(group_ids)) for start in range(0, max(len(label_codes), 1), partition_rows)]
+        values = sum(map_tasks(count_cells, tasks, processes, executor))
+        return ContingencyTable(values=values, rows=labels, columns=group_ids)
+
+    @staticmethod
+    def from_grouped_summary(grouped_summary):
+        return ContingencyTable(values=np.ascontiguousarray(grouped_summary.label_counts.T),
+                                rows=grouped_summary.labels, columns=grouped_summary.group_ids)
+
+    def get_row_code(self, row_name):
+        code = self.row_index.get(row_name)
+        if code is None:
+            code = len(self.rows)
+            self.rows.append(row_name)
+            self.row_index[row_name] = code
+            self.reserve(code + 1, self.values.shape[1])
+        return code
+
+    def get_column_code(self, column_name):
+        code = self.column_index.get(column_name)
+        if code is None:
+            code = len(self.columns)
+            self.columns.append(column_name)
+            self.column_index[column_name] = code
+            self.reserve(self.values.shape[0], code + 1)
+        return code
+
+    def reserve(self, row_count, column_count):
+        capacity_rows, capacity_columns = self.values.shape
+        if row_count <= capacity_rows and column_count <= capacity_columns:
+            return
+        if row_count > capacity_rows:
+            row_count = max(row_count, 2 * capacity_rows)
+        if column_count > capacity_columns:
+            column_count = max(column_count, 2 * capacity_columns)
+        values = np.zeros((max(row_count, capacity_rows), max(column_count, capacity_columns)),
+                          dtype=self.values.dtype)
+        values[:capacity_rows, :capacity_columns] = self.values
+        self.values = values
+
+    def get_counts(self):
+        return self.values[:len(self.rows), :len(self.columns)]
 
     def set_cell(self, row_name, column_name, value):
-        key = self.make_key(row_name, column_name)
-        self.values.put(key, value)
-        self.rows.add(row_name)
-        self.columns.add(column_name)
+        row = self.get_row_code(row_name)
+        column = self.get_column_code(column_name)
+        self.values[row, column] = value
+        self.row_totals = None
+        self.column_totals = None
+
+    def make_key(self, row_name, column_name):
+        return row_name + '-' + column_name
 
     def get_cell(self, row_name, column_name):
-        key = self.make_key(row_name, column_name)
-        if not self.values.contains_key(key):
+        row = self.row_index.get(row_name)
+        column = self.column_index.get(column_name)
+        if row is None or column is None:
             return 0
-        return self.values.get(key)
+        return self.values[row, column]
 
-    def make_key(self, row_name, column_name):
-        return row_name + '-' + column_name
+    def update_totals(self):
+        if self.row_totals is None:
+            counts = self.get_counts()
+            self.row_totals = counts.sum(axis=1)
+            self.column_totals = counts.sum(axis=0)
 
     def get_row_total(self, row_name):
-        column_names = self.columns.to_array()
-        result = 0
-        for x in column_names:
-            result += self.get_cell(row_name, x)
-        return result
+        row = self.row_index.get(row_name)
+        if row is None:
+            return 0
+        self.update_totals()
+        return self.row_totals[row]
 
     def get_column_total(self, column_name):
-        row_names = self.rows.to_array()
-        result = 0
-        for x in row_names:
-            result += self.get_cell(x, column_name)
-        return result
+        column = self.column_index.get(column_name)
+        if column is None:
+            return 0
+        self.update_totals()
+        return self.column_totals[column]
 
     def get_total(self):
-        values = self.values.values()
-        result = 0
-        for val in values:
-            result += val
-        return result
+        self.update_totals()
+        return self.row_totals.sum()
 
 
 class Anova(object):
     sample = None
-    individual_samples = None
+    grouped_summary = None
+    group_prefixes = None
+    group_level = None
+    split_samples = None
     individual_sample_distributions = None
     individual_sampling_distributions = None
     overall_sample_distribution = None
@@ -75,27 +171,64 @@ class Anova(object):
 
     F = None
     p_value = None
+    p_value_error = None
 
     significance_level = None
     reject_mean_same = None
 
-    def __init__(self, sample, significance_level=None):
+    permutation = False
+    permutation_test = None
+    replicates = DEFAULT_REPLICATES
+    random_state = None
+    early_stopping = False
+
+    def __init__(self, sample=None, significance_level=None, grouped_summary=None, group_prefixes=None,
+                 group_level=None, permutation=None, replicates=None, random_state=None, early_stopping=None,
+                 processes=None, executor=None):
         if significance_level is not None:
             self.significance_level = significance_level
+        if permutation is not None:
+            self.permutation = permutation
+        if replicates is not None:
+            self.replicates = replicates
+        if random_state is not None:
+            self.random_state = random_state
+        if early_stopping is not None:
+            self.early_stopping = early_stopping
 
         self.sample = sample
-        self.individual_sampling_distributions = TernarySearchTrie()
-        self.individual_sample_distributions = TernarySearchTrie()
-        self.individual_samples = sample.split_by_group_id()
-        for group_id in self.individual_samples.keys():
-            sample_distribution = SampleDistribution(sample=self.individual_samples.get(group_id), group_id=group_id)
-            sampling_distribution = MeanSamplingDistribution(sample_distribution=sample_distribution)
-            self.individual_sample_distributions.put(group_id, sample_distribution)
-            self.individual_sampling_distributions.put(group_id, sampling_distribution)
-
-        self.overall_sample_distribution = SampleDistribution(sample=sample, group_id=None)
-        self.overall_sampling_distribution = MeanSamplingDistribution(self.overall_sample_distribution)
+        self.group_prefixes = group_prefixes
+        self.group_level = group_level
+        with stage('anova', 'grouping', rows=None if sample is None else sample.size()):
+            if grouped_summary is None:
+                grouped_summary = sample.aggregate_by_group_id(processes, executor)
+            if group_prefixes is not None or group_level is not None:
+                grouped_summary = grouped_summary.roll_up(prefixes=group_prefixes, level=group_level)
+        self.grouped_summary = grouped_summary
+
+        with stage('anova', 'summarizing', rows=grouped_summary.total_count):
+            self.individual_sampling_distributions = TernarySearchTrie()
+            self.individual_sample_distributions = TernarySearchTrie()
+            for group_id in self.grouped_summary.group_ids:
+                sample_distribution = self.grouped_summary.sample_distribution(group_id)
+                sampling_distribution = MeanSamplingDistribution(sample_distribution=sample_distribution)
+                self.individual_sample_distributions.put(group_id, sample_distribution)
+                self.individual_sampling_distributions.put(group_id, sampling_distribution)
+
+            self.overall_sample_distribution = self.grouped_summary.sample_distribution()
+            self.overall_sampling_distribution = MeanSamplingDistribution(self.overall_sample_distribution)
         self.build()
+        if self.permutation:
+            self.test_permutation(processes, executor)
+
+    @property
+    def individual_samples(self):
+        # split on first use only, as the test itself runs on the grouped summary
+        if self.sample is None:
+            return None
+        if self.split_samples is None:
+            self.split_samples = self.sample.split_by_group_id(prefixes=self.group_prefixes, level=self.group_level)
+        return self.split_samples
 
     def build(self):
         self.sum_of_squares_total = self.overall_sample_distribution.sum_of_squares
@@ -106,15 +239,44 @@ class Anova(object):
             self.sum_of_squares_group += math.pow(mean_i - mean_overall, 2.0) * sample_distribution_i.sample_size
         self.sum_of_squares_error = self.sum_of_squares_total - self.sum_of_squares_group
 
-        self.df_total = self.sample.size() - 1
-        self.df_group = self.individual_samples.size() - 1
+        self.df_total = self.grouped_summary.total_count - 1
+        self.df_group = self.grouped_summary.size() - 1
         self.df_error = self.df_total - self.df_group
 
         self.mean_square_error = self.sum_of_squares_error / self.df_error
         self.mean_square_group = self.sum_of_squares_group / self.df_group
 
         self.F = self.mean_square_group / self.mean_square_error
-        self.p_value = 1 - f.cdf(self.F, self.df_group, self.df_error)
+        with stage('anova', 'cdf'):
+            self.p_value = float(sf(FISHER, self.F, self.df_group, self.df_error))
+
+        if self.significance_level is not None:
+            self.reject_mean_same = self.p_value >= self.significance_level
+
+    def test_permutation(self, processes=None, executor=None):
+        # shuffles the group ids over the observations of the sample; the shuffled F statistics come from group-wise
+        # sums of every shuffle, so no sample or summary is rebuilt
+        if self.sample is None:
+            raise ValueError('the permutation test shuffles the observations, so it needs the sample')
+        group_codes, group_ids = self.sample.get_group_codes()
+        xs = self.sample.get_x_array()
+        if self.group_prefixes is not None or self.group_level is not None:
+            # the rows outside the rolled-up groups are not part of the test, as in the rolled-up summary
+            group_ids, mapping = GroupedSampleSummary.encode_roll_up(group_ids, self.group_prefixes, self.group_level)
+            group_codes = np.where(group_codes < 0, -1, mapping[np.maximum(group_codes, 0)])
+            kept = group_codes >= 0
+            group_codes = group_codes[kept]
+            xs = xs[kept]
+        statistic = AnovaStatistic(group_codes, len(group_ids), xs)
+        with stage('anova', 'permutation', rows=len(group_codes)) as permutation_stage:
+            self.permutation_test = PermutationTest(statistic, replicates=self.replicates,
+                                                    random_state=self.random_state,
+                                                    significance_level=self.significance_level,
+                                                    early_stopping=self.early_stopping, processes=processes,
+                                                    executor=executor)
+            permutation_stage.replicates = self.permutation_test.size()
+        self.p_value = self.permutation_test.p_value
+        self.p_value_error = self.permutation_test.p_value_error
 
         if self.significance_level is not None:
             self.reject_mean_same = self.p_value >= self.significance_level
@@ -127,33 +289,64 @@ class Anova(object):
 class ChiSquare(object):
     chiSq = None
     sample = None
+    grouped_summary = None
+    table = None
     p_value = None
     df = None
     significance_level = None
+    permutation = False
+    permutation_test = None
+    replicates = DEFAULT_REPLICATES
+    random_state = None
+    early_stopping = False
 
-    def __init__(self, sample, significance_level=None):
+    def __init__(self, sample=None, significance_level=None, grouped_summary=None, table=None, permutation=None,
+                 replicates=None, random_state=None, early_stopping=None, processes=None, executor=None):
 
         self.sample = sample
         self.significance_level = significance_level
-
-        table = ContingencyTable()
-        for i in range(sample.size()):
-            row = sample.get(i)
-            row_name = row.label
-            column_name = row.group_id
-            table.set_cell(row_name, column_name, table.get_cell(row_name, column_name) + 1)
-
-        total = table.get_total()
-        self.chiSq = 0
-        for row in table.rows.to_array():
-            for column in table.columns.to_array():
-                expected = table.get_row_total(row) * table.get_column_total(column) / total
-                observed = table.get_cell(row, column)
-                self.chiSq += math.pow(observed - expected, 2) / expected
-
-        self.df = (table.rows.size() - 1) * (table.columns.size() - 1)
-
-        self.p_value = 1 - chi2.cdf(self.chiSq, self.df)
+        if permutation is not None:
+            self.permutation = permutation
+        if replicates is not None:
+            self.replicates = replicates
+        if random_state is not None:
+            self.random_state = random_state
+        if early_stopping is not None:
+            self.early_stopping = early_stopping
+
+        with stage('chi_square', 'grouping', rows=None if sample is None else sample.size()):
+            if table is None:
+                if grouped_summary is None:
+                    table = ContingencyTable.from_sample(sample, processes, executor)
+                else:
+                    table = ContingencyTable.from_grouped_summary(grouped_summary)
+        self.grouped_summary = grouped_summary
+        self.table = table
+
+        with stage('chi_square', 'summarizing'):
+            counts = table.get_counts()
+            table.update_totals()
+            row_totals = table.row_totals[table.row_totals > 0]
+            column_totals = table.column_totals[table.column_totals > 0]
+            observed = counts[table.row_totals > 0][:, table.column_totals > 0]
+            expected = np.outer(row_totals, column_totals) / float(table.get_total())
+            self.chiSq = float((np.square(observed - expected) / expected).sum())
+
+        self.df = (len(row_totals) - 1) * (len(column_totals) - 1)
+
+        if self.permutation:
+            with stage('chi_square', 'permutation', rows=int(observed.sum())) as permutation_stage:
+                self.permutation_test = PermutationTest(ChiSquareStatistic(observed), replicates=self.replicates,
+                                                        random_state=self.random_state,
+                                                        significance_level=self.significance_level,
+                                                        early_stopping=self.early_stopping, processes=processes,
+                                                        executor=executor)
+                permutation_stage.replicates = self.permutation_test.size()
+            self.p_value = self.permutation_test.p_value
+            self.p_value_error = self.permutation_test.p_value_error
+        else:
+            with stage('chi_square', 'cdf'):
+                self.p_value = float(sf(CHI_SQUARE, self.chiSq, self.df))
 
         if self.significance_level is not None:
             self.reject_mean_same = self.p_value >= self.significance_level
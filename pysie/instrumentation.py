@@ -0,0 +1,139 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# the stages check this flag before doing any work, so instrumentation costs a function call per stage while no
+# recorder or hook is active
+enabled = False
+recorders = []
+hooks = []
+lock = threading.Lock()
+
+
+class StageRecord(object):
+    __slots__ = ('computation', 'stage', 'seconds', 'rows', 'replicates')
+
+    def __init__(self, computation, stage, seconds, rows=None, replicates=None):
+        self.computation = computation
+        self.stage = stage
+        self.seconds = seconds
+        self.rows = rows
+        self.replicates = replicates
+
+    def to_dict(self):
+        return dict(computation=self.computation, stage=self.stage, seconds=self.seconds, rows=self.rows,
+                    replicates=self.replicates)
+
+
+class Stage(object):
+    __slots__ = ('computation', 'name', 'rows', 'replicates', 'start')
+
+    def __init__(self, computation, name, rows=None, replicates=None):
+        self.computation = computation
+        self.name = name
+        self.rows = rows
+        self.replicates = replicates
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        publish(StageRecord(self.computation, self.name, time.perf_counter() - self.start, self.rows,
+                            self.replicates))
+
+
+class DisabledStage(object):
+    # rows and replicates may still be assigned inside a disabled stage, they are simply dropped
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+
+disabled_stage = DisabledStage()
+
+
+def stage(computation, name, rows=None, replicates=None):
+    if not enabled:
+        return disabled_stage
+    return Stage(computation, name, rows, replicates)
+
+
+def publish(record):
+    for recorder in list(recorders):
+        recorder.record(record)
+    for hook in list(hooks):
+        hook(record)
+
+
+def update_enabled():
+    global enabled
+    enabled = len(recorders) > 0 or len(hooks) > 0
+
+
+def add_hook(callback):
+    # the callback receives every StageRecord, for instance to forward it to a metrics client
+    with lock:
+        hooks.append(callback)
+        update_enabled()
+
+
+def remove_hook(callback):
+    with lock:
+        if callback in hooks:
+            hooks.remove(callback)
+        update_enabled()
+
+
+class Recorder(object):
+    records = None
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, stage_record):
+        self.records.append(stage_record)
+
+    def size(self):
+        return len(self.records)
+
+    def total_seconds(self, computation=None, stage_name=None):
+        return sum(x.seconds for x in self.records if (computation is None or x.computation == computation) and
+                   (stage_name is None or x.stage == stage_name))
+
+    def stage_seconds(self):
+        result = dict()
+        for x in self.records:
+            key = (x.computation, x.stage)
+            result[key] = result.get(key, 0.0) + x.seconds
+        return result
+
+    def to_dicts(self):
+        return [x.to_dict() for x in self.records]
+
+
+@contextmanager
+def instrument():
+    # records the stages of every pysie computation run inside the block:
+    #
+    #     with instrument() as recorder:
+    #         Anova(sample=sample)
+    #     print(recorder.stage_seconds())
+    recorder = Recorder()
+    with lock:
+        recorders.append(recorder)
+        update_enabled()
+    try:
+        yield recorder
+    finally:
+        with lock:
+            recorders.remove(recorder)
+            update_enabled()
@@ -0,0 +1,223 @@
+import math
+
+from enum import Enum
+
+import numpy as np
+
+from pysie.instrumentation import stage
+from pysie.stats.critical_values import NORMAL, cdf, compute_ppf
+from pysie.stats.distributions import DistributionFamily
+from pysie.stats.simulation import BLOCK_ELEMENTS, DEFAULT_REPLICATES, SimulationScheduler, calculate_interval_errors, \
+    create_random_generator
+
+TASK_REPLICATES = 2000
+
+
+class BootstrapMethod(Enum):
+    percentile = 1
+    basic = 2
+    bca = 3
+
+
+def get_sample_array(sample_distribution):
+    if sample_distribution is None or sample_distribution.sample is None:
+        raise ValueError('resampling needs the observations, so the sample distribution must be built from a sample')
+    return np.asarray(sample_distribution.sample.get_x_array(sample_distribution.group_id), dtype=np.float64)
+
+
+def resample_means(x, replicates, random_state=None, block_size=None):
+    # the resample indices are drawn a block of replicates at a time, so at most block_size * len(x) indices are held
+    # in memory whatever the number of replicates
+    generator = create_random_generator(random_state)
+    sample_size = len(x)
+    if block_size is None:
+        block_size = max(1, BLOCK_ELEMENTS // max(sample_size, 1))
+    means = np.empty(replicates, dtype=np.float64)
+    for start in range(0, replicates, block_size):
+        stop = min(start + block_size, replicates)
+        indices = generator.integers(0, sample_size, size=(stop - start, sample_size))
+        means[start:stop] = x[indices].mean(axis=1)
+    return means
+
+
+def resample_mean_diffs(x1, x2, replicates, random_state=None, block_size=None):
+    generator = create_random_generator(random_state)
+    return resample_means(x1, replicates, generator, block_size) - resample_means(x2, replicates, generator, block_size)
+
+
+def bootstrap_means_task(task):
+    x, block_size, replicates, seed_sequence = task
+    return resample_means(x, replicates, seed_sequence, block_size)
+
+
+def bootstrap_mean_diffs_task(task):
+    (x1, x2), block_size, replicates, seed_sequence = task
+    return resample_mean_diffs(x1, x2, replicates, seed_sequence, block_size)
+
+
+def bootstrap(task_function, data, replicates=DEFAULT_REPLICATES, random_state=None, block_size=None, processes=None,
+              executor=None):
+    scheduler = SimulationScheduler(replicates, random_state, processes=processes, executor=executor,
+                                    task_replicates=TASK_REPLICATES)
+    return scheduler.run(task_function, (data, block_size))
+
+
+def calculate_acceleration(jackknife_deviations):
+    # jackknife estimate of the acceleration of the BCa interval, from the deviations of the leave-one-out estimates
+    # from their mean
+    sum_of_squares = np.square(jackknife_deviations).sum()
+    if sum_of_squares == 0:
+        return 0.0
+    return float(np.power(jackknife_deviations, 3).sum() / (6.0 * math.pow(sum_of_squares, 1.5)))
+
+
+def mean_jackknife_deviations(x):
+    # leaving out x_i moves the mean by (mean - x_i) / (n - 1), so the deviations need no resampling
+    return (x - x.mean()) / max(len(x) - 1, 1)
+
+
+def bootstrap_interval_quantiles(simulated_estimates, point_estimate, confidence_level,
+                                 method=BootstrapMethod.percentile, acceleration=0.0):
+    # the quantiles of the simulated estimates the interval bounds are read from
+    alpha = (1 - confidence_level) / 2
+    if method == BootstrapMethod.percentile or method == BootstrapMethod.basic:
+        return [alpha, 1 - alpha]
+    if method == BootstrapMethod.bca:
+        replicates = len(simulated_estimates)
+        below = np.count_nonzero(simulated_estimates < point_estimate) / float(replicates)
+        below = min(max(below, 1.0 / (replicates + 1)), replicates / (replicates + 1.0))
+        z0 = compute_ppf(NORMAL, below)
+        quantiles = []
+        for q in [alpha, 1 - alpha]:
+            z = z0 + compute_ppf(NORMAL, q)
+            quantiles.append(float(cdf(NORMAL, z0 + z / (1 - acceleration * z))))
+        return quantiles
+    raise ValueError('unknown bootstrap method: ' + str(method))
+
+
+def bootstrap_confidence_interval(simulated_estimates, point_estimate, confidence_level,
+                                  method=BootstrapMethod.percentile, acceleration=0.0):
+    quantiles = bootstrap_interval_quantiles(simulated_estimates, point_estimate, confidence_level, method,
+                                             acceleration)
+    lower, upper = np.quantile(simulated_estimates, quantiles)
+    if method == BootstrapMethod.basic:
+        return 2 * point_estimate - float(upper), 2 * point_estimate - float(lower)
+    return float(lower), float(upper)
+
+
+def bootstrap_confidence_interval_errors(simulated_estimates, point_estimate, confidence_level,
+                                         method=BootstrapMethod.percentile, acceleration=0.0):
+    # the Monte Carlo standard errors of the interval bounds, in the same order as the bounds
+    quantiles = bootstrap_interval_quantiles(simulated_estimates, point_estimate, confidence_level, method,
+                                             acceleration)
+    lower_error, upper_error = calculate_interval_errors(simulated_estimates, quantiles)
+    if method == BootstrapMethod.basic:
+        # the basic bounds mirror the quantiles around the point estimate
+        return upper_error, lower_error
+    return lower_error, upper_error
+
+
+class BootstrapMeanSamplingDistribution(object):
+    sample_distribution = None
+    point_estimate = None
+    distribution_family = DistributionFamily.simulation
+    df = None
+    standard_error = None
+    sample_size = None
+    simulated_means = None
+    acceleration = None
+    replicates = DEFAULT_REPLICATES
+    random_state = None
+
+    def __init__(self, sample_distribution=None, xs=None, replicates=None, random_state=None, block_size=None,
+                 processes=None, executor=None):
+        if replicates is not None:
+            self.replicates = replicates
+
+        if random_state is not None:
+            self.random_state = random_state
+
+        if sample_distribution is not None:
+            self.sample_distribution = sample_distribution
+            xs = get_sample_array(sample_distribution)
+
+        xs = np.asarray(xs, dtype=np.float64)
+        self.sample_size = len(xs)
+        self.df = self.sample_size - 1.0
+        self.point_estimate = float(xs.mean())
+        self.acceleration = calculate_acceleration(mean_jackknife_deviations(xs))
+
+        with stage('bootstrap_mean_sampling_distribution', 'simulating', rows=self.sample_size,
+                   replicates=self.replicates):
+            self.simulated_means = np.sort(bootstrap(bootstrap_means_task, xs, self.replicates, self.random_state,
+                                                     block_size, processes, executor))
+        self.standard_error = float(self.simulated_means.std(ddof=1))
+
+    def confidence_interval(self, confidence_level, method=BootstrapMethod.percentile):
+        return bootstrap_confidence_interval(self.simulated_means, self.point_estimate, confidence_level, method,
+                                             self.acceleration)
+
+    def confidence_interval_errors(self, confidence_level, method=BootstrapMethod.percentile):
+        return bootstrap_confidence_interval_errors(self.simulated_means, self.point_estimate, confidence_level, method,
+                                                    self.acceleration)
+
+
+class BootstrapMeanDiffSamplingDistribution(object):
+    grp1_sample_distribution = None
+    grp2_sample_distribution = None
+    grp1_point_estimate = None
+    grp2_point_estimate = None
+    grp1_sample_size = None
+    grp2_sample_size = None
+    distribution_family = DistributionFamily.simulation
+    df = None
+    point_estimate = None
+    standard_error = None
+    diff_simulated_means = None
+    acceleration = None
+    replicates = DEFAULT_REPLICATES
+    random_state = None
+
+    def __init__(self, grp1_sample_distribution=None, grp2_sample_distribution=None, grp1_xs=None, grp2_xs=None,
+                 replicates=None, random_state=None, block_size=None, processes=None, executor=None):
+        if replicates is not None:
+            self.replicates = replicates
+
+        if random_state is not None:
+            self.random_state = random_state
+
+        if grp1_sample_distribution is not None:
+            self.grp1_sample_distribution = grp1_sample_distribution
+            grp1_xs = get_sample_array(grp1_sample_distribution)
+
+        if grp2_sample_distribution is not None:
+            self.grp2_sample_distribution = grp2_sample_distribution
+            grp2_xs = get_sample_array(grp2_sample_distribution)
+
+        grp1_xs = np.asarray(grp1_xs, dtype=np.float64)
+        grp2_xs = np.asarray(grp2_xs, dtype=np.float64)
+        self.grp1_sample_size = len(grp1_xs)
+        self.grp2_sample_size = len(grp2_xs)
+        self.grp1_point_estimate = float(grp1_xs.mean())
+        self.grp2_point_estimate = float(grp2_xs.mean())
+        self.point_estimate = self.grp1_point_estimate - self.grp2_point_estimate
+        self.df = min(self.grp1_sample_size - 1.0, self.grp2_sample_size - 1.0)
+
+        # leaving out an observation of the second group moves the difference the opposite way
+        self.acceleration = calculate_acceleration(np.concatenate([mean_jackknife_deviations(grp1_xs),
+                                                                   -mean_jackknife_deviations(grp2_xs)]))
+
+        with stage('bootstrap_mean_diff_sampling_distribution', 'simulating',
+                   rows=self.grp1_sample_size + self.grp2_sample_size, replicates=self.replicates):
+            self.diff_simulated_means = np.sort(bootstrap(bootstrap_mean_diffs_task, (grp1_xs, grp2_xs),
+                                                          self.replicates, self.random_state, block_size, processes,
+                                                          executor))
+        self.standard_error = float(self.diff_simulated_means.std(ddof=1))
+
+    def confidence_interval(self, confidence_level, method=BootstrapMethod.percentile):
+        return bootstrap_confidence_interval(self.diff_simulated_means, self.point_estimate, confidence_level, method,
+                                             self.acceleration)
+
+    def confidence_interval_errors(self, confidence_level, method=BootstrapMethod.percentile):
+        return bootstrap_confidence_interval_errors(self.diff_simulated_means, self.point_estimate, confidence_level,
+                                                    method, self.acceleration)
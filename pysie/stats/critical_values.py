@@ -0,0 +1,190 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from pysie.stats import special as builtin_special
+
+NORMAL = 'norm'
+STUDENT_T = 't'
+CHI_SQUARE = 'chi2'
+FISHER = 'f'
+
+AUTOMATIC = 'automatic'
+BUILTIN = 'builtin'
+SCIPY = 'scipy'
+
+DEFAULT_CONFIDENCE_LEVELS = (0.8, 0.9, 0.95, 0.98, 0.99, 0.995, 0.999)
+
+backend = AUTOMATIC
+scipy_special = None
+
+
+def set_backend(name):
+    # AUTOMATIC evaluates scalar normal lookups with the built-in functions and everything else with
+    # scipy.special, which is only imported on first use and replaced by the built-in functions when missing
+    global backend
+    if name not in (AUTOMATIC, BUILTIN, SCIPY):
+        raise ValueError('unknown backend: ' + str(name))
+    backend = name
+
+
+def load_scipy_special():
+    global scipy_special
+    if scipy_special is None:
+        try:
+            from scipy import special
+            scipy_special = special
+        except ImportError:
+            scipy_special = False
+    return scipy_special or None
+
+
+def resolve_scipy_special(family, x):
+    if backend == BUILTIN:
+        return None
+    if backend == AUTOMATIC and family == NORMAL and np.ndim(x) == 0:
+        return None
+    return load_scipy_special()
+
+
+def apply_builtin(function, *args):
+    if all(np.ndim(arg) == 0 for arg in args):
+        return function(*[float(arg) for arg in args])
+    return np.vectorize(function, otypes=[np.float64])(*args)
+
+
+def two_sided_quantile(confidence_level):
+    return 1 - (1 - confidence_level) / 2
+
+
+def compute_ppf(family, q, df=None, df2=None):
+    special = resolve_scipy_special(family, q)
+    if family == NORMAL:
+        if special is None:
+            return builtin_special.norm_ppf(q)
+        return float(special.ndtri(q))
+    if family == STUDENT_T:
+        if special is None:
+            return builtin_special.t_ppf(q, df)
+        return float(special.stdtrit(df, q))
+    if family == CHI_SQUARE:
+        if special is None:
+            return builtin_special.chi2_ppf(q, df)
+        return float(special.chdtri(df, 1 - q))
+    if family == FISHER:
+        if special is None:
+            return builtin_special.f_ppf(q, df, df2)
+        return float(special.fdtri(df, df2, q))
+    raise ValueError('unknown distribution family: ' + str(family))
+
+
+def cdf(family, x, df=None, df2=None):
+    # the scipy.special ufuncs skip the argument checking and dispatch of scipy.stats, and accept both scalars
+    # and arrays
+    special = resolve_scipy_special(family, x)
+    if family == NORMAL:
+        if special is None:
+            return apply_builtin(builtin_special.norm_cdf, x)
+        return special.ndtr(x)
+    if family == STUDENT_T:
+        if special is None:
+            return apply_builtin(builtin_special.t_cdf, x, df)
+        return special.stdtr(df, x)
+    if family == CHI_SQUARE:
+        if special is None:
+            return apply_builtin(builtin_special.chi2_cdf, x, df)
+        return special.chdtr(df, np.maximum(x, 0))
+    if family == FISHER:
+        if special is None:
+            return apply_builtin(builtin_special.f_cdf, x, df, df2)
+        return special.fdtr(df, df2, np.maximum(x, 0))
+    raise ValueError('unknown distribution family: ' + str(family))
+
+
+def sf(family, x, df=None, df2=None):
+    special = resolve_scipy_special(family, x)
+    if family == NORMAL:
+        if special is None:
+            return apply_builtin(builtin_special.norm_sf, x)
+        return special.ndtr(np.negative(x))
+    if family == STUDENT_T:
+        if special is None:
+            return apply_builtin(builtin_special.t_sf, x, df)
+        return special.stdtr(df, np.negative(x))
+    if family == CHI_SQUARE:
+        if special is None:
+            return apply_builtin(builtin_special.chi2_sf, x, df)
+        return special.chdtrc(df, np.maximum(x, 0))
+    if family == FISHER:
+        if special is None:
+            return apply_builtin(builtin_special.f_sf, x, df, df2)
+        return special.fdtrc(df, df2, np.maximum(x, 0))
+    raise ValueError('unknown distribution family: ' + str(family))
+
+
+class CriticalValueCache(object):
+    max_size = 4096
+    entries = None
+    table = None
+    hits = 0
+    misses = 0
+    lock = None
+
+    def __init__(self, max_size=None):
+        if max_size is not None:
+            self.max_size = max_size
+        self.entries = OrderedDict()
+        self.table = dict()
+        self.lock = threading.Lock()
+
+    def ppf(self, family, q, df=None, df2=None):
+        key = (family, q, df, df2)
+        value = self.table.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        with self.lock:
+            value = self.entries.pop(key, None)
+            if value is not None:
+                self.hits += 1
+                self.entries[key] = value
+                return value
+        value = compute_ppf(family, q, df, df2)
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = value
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return value
+
+    def precompute(self, confidence_levels=DEFAULT_CONFIDENCE_LEVELS, max_df=200):
+        # the table is keyed on the same two-sided quantiles that confidence_interval computes, for the normal
+        # distribution and for Student's t with integer dfs up to max_df (as floats, the way the sampling
+        # distributions store their dfs)
+        for confidence_level in confidence_levels:
+            for q in [two_sided_quantile(confidence_level), confidence_level]:
+                self.table[(NORMAL, q, None, None)] = compute_ppf(NORMAL, q)
+                for df in range(1, max_df + 1):
+                    self.table[(STUDENT_T, q, float(df), None)] = compute_ppf(STUDENT_T, q, df)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.table.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def size(self):
+        return len(self.entries) + len(self.table)
+
+
+critical_value_cache = CriticalValueCache()
+
+
+def ppf(family, q, df=None, df2=None):
+    return critical_value_cache.ppf(family, q, df, df2)
+
+
+def precompute_critical_values(confidence_levels=DEFAULT_CONFIDENCE_LEVELS, max_df=200):
+    critical_value_cache.precompute(confidence_levels, max_df)
@@ -1,9 +1,14 @@
 import math
-import random
 
 from enum import Enum
 
-from scipy.stats import norm, t
+import numpy as np
+
+from pysie.instrumentation import stage
+from pysie.stats.critical_values import NORMAL, STUDENT_T, ppf, sf
+from pysie.stats.moments import calculate_moments
+from pysie.stats.simulation import DEFAULT_REPLICATES, PRECISION_CONFIDENCE_LEVEL, calculate_interval_errors, \
+    get_interval_quantiles, get_quantile, simulate_proportions, simulate_proportion_diffs
 
 
 class DistributionFamily(Enum):
@@ -14,6 +19,67 @@ class DistributionFamily(Enum):
     simulation = 5
 
 
+class DfStrategy(Enum):
+    conservative = 1
+    welch = 2
+    pooled = 3
+
+
+def calculate_mean_diff_standard_errors(grp1_sample_sds, grp1_sample_sizes, grp2_sample_sds, grp2_sample_sizes,
+                                        df_strategy=DfStrategy.conservative):
+    # returns the standard errors and dfs of the differences of means for arrays of group pairs: conservative and
+    # welch share the unpooled standard error and differ in the df (min(n1 - 1, n2 - 1) against the
+    # Welch-Satterthwaite approximation), pooled assumes equal variances
+    grp1_sample_sds = np.asarray(grp1_sample_sds, dtype=np.float64)
+    grp2_sample_sds = np.asarray(grp2_sample_sds, dtype=np.float64)
+    grp1_sample_sizes = np.asarray(grp1_sample_sizes, dtype=np.float64)
+    grp2_sample_sizes = np.asarray(grp2_sample_sizes, dtype=np.float64)
+    grp1_variances = np.square(grp1_sample_sds) / grp1_sample_sizes
+    grp2_variances = np.square(grp2_sample_sds) / grp2_sample_sizes
+
+    if df_strategy == DfStrategy.pooled:
+        dfs = grp1_sample_sizes + grp2_sample_sizes - 2
+        pooled_variances = ((grp1_sample_sizes - 1) * np.square(grp1_sample_sds) +
+                            (grp2_sample_sizes - 1) * np.square(grp2_sample_sds)) / dfs
+        standard_errors = np.sqrt(pooled_variances * (1 / grp1_sample_sizes + 1 / grp2_sample_sizes))
+        return standard_errors, dfs
+
+    standard_errors = np.sqrt(grp1_variances + grp2_variances)
+    if df_strategy == DfStrategy.conservative:
+        return standard_errors, np.minimum(grp1_sample_sizes - 1, grp2_sample_sizes - 1)
+    if df_strategy == DfStrategy.welch:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dfs = np.square(grp1_variances + grp2_variances) / (np.square(grp1_variances) / (grp1_sample_sizes - 1) +
+                                                                 np.square(grp2_variances) / (grp2_sample_sizes - 1))
+        # equal samples without spread leave the approximation undefined, fall back to the conservative df there
+        dfs = np.where(np.isfinite(dfs), dfs, np.minimum(grp1_sample_sizes - 1, grp2_sample_sizes - 1))
+        return standard_errors, dfs
+    raise ValueError('unknown df strategy: ' + str(df_strategy))
+
+
+def calculate_p_values(test_statistics, dfs=None):
+    # one-tailed p-values are taken on the side of the observed statistic, as in the single test classes; entries
+    # with an infinite or missing df use the normal distribution, the others use Student's t
+    test_statistics = np.abs(np.asarray(test_statistics, dtype=np.float64))
+    p_values_one_tail = np.empty_like(test_statistics)
+    if dfs is None:
+        normal = np.ones(test_statistics.shape, dtype=bool)
+    else:
+        dfs = np.broadcast_to(np.asarray(dfs, dtype=np.float64), test_statistics.shape)
+        normal = ~np.isfinite(dfs)
+    p_values_one_tail[normal] = sf(NORMAL, test_statistics[normal])
+    if not normal.all():
+        student = ~normal
+        p_values_one_tail[student] = sf(STUDENT_T, test_statistics[student], dfs[student])
+    return p_values_one_tail, p_values_one_tail * 2
+
+
+def get_test_df(sampling_distribution):
+    if sampling_distribution.distribution_family == DistributionFamily.student_t:
+        return sampling_distribution.df
+    return np.inf
+
+
 class MeanSamplingDistribution(object):
     sample_distribution = None
     point_estimate = None
@@ -53,12 +119,12 @@ class MeanSamplingDistribution(object):
     def confidence_interval(self, confidence_level):
         q = 1 - (1 - confidence_level) / 2
         if self.distribution_family == DistributionFamily.normal:
-            z = norm.ppf(q)
+            z = ppf(NORMAL, q)
             pf = z * self.standard_error
             return self.point_estimate - pf, self.point_estimate + pf
         else:
-            t_df = t.ppf(q, self.df)
-            pf = t_df * self.standard_error + self.point_estimate
+            t_df = ppf(STUDENT_T, q, self.df)
+            pf = t_df * self.standard_error
             return self.point_estimate - pf, self.point_estimate + pf
 
 
@@ -73,16 +139,31 @@ class MeanDiffSamplingDistribution(object):
     grp2_sample_size = None
     distribution_family = None
     df = None
+    df_strategy = DfStrategy.conservative
     point_estimate = None
+    paired = False
+    diff_sample_sd = None
 
     def __init__(self, grp1_sample_distribution=None, grp1_sample_mean=None, grp1_sample_sd=None, grp1_sample_size=None,
-                 grp2_sample_distribution=None, grp2_sample_mean=None, grp2_sample_sd=None, grp2_sample_size=None):
-        self.build_grp1(grp1_sample_distribution, grp1_sample_mean, grp1_sample_sd, grp1_sample_size)
-        self.build_grp2(grp2_sample_distribution, grp2_sample_mean, grp2_sample_sd, grp2_sample_size)
+                 grp2_sample_distribution=None, grp2_sample_mean=None, grp2_sample_sd=None, grp2_sample_size=None,
+                 df_strategy=None, paired_sample=None, group_id=None):
+        if df_strategy is not None:
+            self.df_strategy = df_strategy
+
+        if paired_sample is not None:
+            self.build_paired(paired_sample, group_id)
+        else:
+            self.build_grp1(grp1_sample_distribution, grp1_sample_mean, grp1_sample_sd, grp1_sample_size)
+            self.build_grp2(grp2_sample_distribution, grp2_sample_mean, grp2_sample_sd, grp2_sample_size)
 
         self.standard_error = self.calculate_standard_error()
 
-        self.df = min(self.grp1_sample_size - 1.0, self.grp2_sample_size - 1.0)
+        if self.paired:
+            self.df = self.grp1_sample_size - 1.0
+        else:
+            _, df = calculate_mean_diff_standard_errors(self.grp1_sample_sd, self.grp1_sample_size,
+                                                        self.grp2_sample_sd, self.grp2_sample_size, self.df_strategy)
+            self.df = float(df)
         self.point_estimate = self.grp1_point_estimate - self.grp2_point_estimate
 
         if self.grp1_sample_size < 30 or self.grp2_sample_size < 30:
@@ -122,20 +203,44 @@ class MeanDiffSamplingDistribution(object):
             self.grp2_sample_sd = grp2_sample_distribution.sd
             self.grp2_sample_size = grp2_sample_distribution.sample_size
 
+    def build_paired(self, paired_sample, group_id=None):
+        # the x and y of every observation are measured on the same unit, so the test is on the mean of the
+        # differences x - y, whose sd replaces the two group sds in the standard error
+        self.paired = True
+        xs = paired_sample.get_x_array(group_id)
+        ys = paired_sample.get_y_array(group_id)
+        sample_size, grp1_mean, grp1_sum_of_squares = calculate_moments(xs)
+        _, grp2_mean, grp2_sum_of_squares = calculate_moments(ys)
+        _, _, diff_sum_of_squares = calculate_moments(xs - ys)
+        self.grp1_point_estimate = grp1_mean
+        self.grp2_point_estimate = grp2_mean
+        self.grp1_sample_size = sample_size
+        self.grp2_sample_size = sample_size
+        self.grp1_sample_sd = math.sqrt(grp1_sum_of_squares / (sample_size - 1))
+        self.grp2_sample_sd = math.sqrt(grp2_sum_of_squares / (sample_size - 1))
+        self.diff_sample_sd = math.sqrt(diff_sum_of_squares / (sample_size - 1))
+
     def calculate_standard_error(self):
+        if self.paired:
+            return self.diff_sample_sd / math.sqrt(self.grp1_sample_size)
+        if self.df_strategy == DfStrategy.pooled:
+            standard_error, _ = calculate_mean_diff_standard_errors(self.grp1_sample_sd, self.grp1_sample_size,
+                                                                    self.grp2_sample_sd, self.grp2_sample_size,
+                                                                    self.df_strategy)
+            return float(standard_error)
         return math.sqrt(self.grp1_sample_sd * self.grp1_sample_sd / self.grp1_sample_size + 
                          self.grp2_sample_sd * self.grp2_sample_sd / self.grp2_sample_size)
 
     def confidence_interval(self, confidence_level):
         q = 1 - (1 - confidence_level) / 2
         if self.distribution_family == DistributionFamily.normal:
-            z = norm.ppf(q)
+            z = ppf(NORMAL, q)
             pf = z * self.standard_error
             
             return self.point_estimate - pf, self.point_estimate + pf
         else:
-            t_df = t.ppf(q, self.df)
-            pf = t_df * self.standard_error + self.point_estimate
+            t_df = ppf(STUDENT_T, q, self.df)
+            pf = t_df * self.standard_error
             return self.point_estimate - pf, self.point_estimate + pf
 
 
@@ -147,8 +252,30 @@ class ProportionSamplingDistribution(object):
     categorical_value = None
     standard_error = None
     simulated_proportions = None
+    replicates = DEFAULT_REPLICATES
+    random_state = None
+    precision = None
+    confidence_level = PRECISION_CONFIDENCE_LEVEL
+    processes = None
+    executor = None
+
+    def __init__(self, sample_distribution=None, categorical_value=None, sample_proportion=None, sample_size=None,
+                 replicates=None, random_state=None, precision=None, processes=None, executor=None,
+                 confidence_level=None):
+        if replicates is not None:
+            self.replicates = replicates
+
+        if random_state is not None:
+            self.random_state = random_state
+
+        # the simulation stops early once the Monte Carlo standard errors of the bounds of the interval at
+        # confidence_level are within precision
+        self.precision = precision
+        if confidence_level is not None:
+            self.confidence_level = confidence_level
+        self.processes = processes
+        self.executor = executor
 
-    def __init__(self, sample_distribution=None, categorical_value=None, sample_proportion=None, sample_size=None):
         if sample_proportion is not None:
             self.point_estimate = sample_proportion
 
@@ -175,25 +302,27 @@ class ProportionSamplingDistribution(object):
         self.sample_size = sample_distribution.sample_size
 
     def simulate(self):
-        self.simulated_proportions = [0] * 1000
-        for i in range(1000):
-            count = 0
-            for trials in range(self.sample_size):
-                if random.random() <= self.point_estimate:
-                    count += 1
-            self.simulated_proportions[i] = float(count) / self.sample_size
-        self.simulated_proportions = sorted(self.simulated_proportions)
+        with stage('proportion_sampling_distribution', 'simulating', rows=self.sample_size) as simulating_stage:
+            self.simulated_proportions = simulate_proportions(self.point_estimate, self.sample_size, self.replicates,
+                                                              self.random_state, self.precision, self.processes,
+                                                              self.executor, confidence_level=self.confidence_level)
+            simulating_stage.replicates = len(self.simulated_proportions)
 
     def confidence_interval(self, confidence_level):
         q = 1 - (1 - confidence_level) / 2
         if self.distribution_family == DistributionFamily.normal:
-            z = norm.ppf(q)
+            z = ppf(NORMAL, q)
             pf = z * self.standard_error
             return self.point_estimate - pf, self.point_estimate + pf
         else:
-            threshold1 = int(1000 * (1 - confidence_level) / 2)
-            threshold2 = int(1000 * q)
-            return self.simulated_proportions[threshold1], self.simulated_proportions[threshold2]
+            return get_quantile(self.simulated_proportions, (1 - confidence_level) / 2), \
+                get_quantile(self.simulated_proportions, q)
+
+    def confidence_interval_errors(self, confidence_level):
+        # Monte Carlo standard errors of the two bounds of a simulated interval
+        if self.distribution_family != DistributionFamily.simulation:
+            return None
+        return calculate_interval_errors(self.simulated_proportions, get_interval_quantiles(confidence_level))
         
         
 class ProportionDiffSamplingDistribution(object):
@@ -210,12 +339,32 @@ class ProportionDiffSamplingDistribution(object):
     grp2_simulated_proportions = None
     diff_simulated_proportions = None
     point_estimate = None
+    replicates = DEFAULT_REPLICATES
+    random_state = None
+    precision = None
+    confidence_level = PRECISION_CONFIDENCE_LEVEL
+    processes = None
+    executor = None
 
     def __init__(self, categorical_value=None,
                  grp1_sample_distribution=None, grp1_sample_proportion=None, grp1_sample_size=None,
-                 grp2_sample_distribution=None, grp2_sample_proportion=None, grp2_sample_size=None):
+                 grp2_sample_distribution=None, grp2_sample_proportion=None, grp2_sample_size=None,
+                 replicates=None, random_state=None, precision=None, processes=None, executor=None,
+                 confidence_level=None):
         if categorical_value is not None:
             self.categorical_value = categorical_value
+
+        if replicates is not None:
+            self.replicates = replicates
+
+        if random_state is not None:
+            self.random_state = random_state
+
+        self.precision = precision
+        if confidence_level is not None:
+            self.confidence_level = confidence_level
+        self.processes = processes
+        self.executor = executor
             
         self.build_grp1(grp1_sample_distribution, grp1_sample_proportion, grp1_sample_size)
         self.build_grp2(grp2_sample_distribution, grp2_sample_proportion, grp2_sample_size)
@@ -271,37 +420,36 @@ class ProportionDiffSamplingDistribution(object):
             self.grp2_sample_size = grp2_sample_distribution.sample_size
             
     def simulate(self):
-        self.grp1_simulated_proportions = ProportionDiffSamplingDistribution.simulate_grp(self.grp1_point_estimate,
-                                                                                          self.grp1_sample_size)
-        self.grp2_simulated_proportions = ProportionDiffSamplingDistribution.simulate_grp(self.grp2_point_estimate,
-                                                                                          self.grp2_sample_size)
-
-        self.diff_simulated_proportions = [0] * 1000;
-        for i in range(1000):
-            self.diff_simulated_proportions[i] = self.grp1_simulated_proportions[i] - self.grp2_simulated_proportions[i]
-        
+        with stage('proportion_diff_sampling_distribution', 'simulating',
+                   rows=self.grp1_sample_size + self.grp2_sample_size) as simulating_stage:
+            grp1_simulated_proportions, grp2_simulated_proportions, diff_simulated_proportions = \
+                simulate_proportion_diffs(self.grp1_point_estimate, self.grp1_sample_size,
+                                          self.grp2_point_estimate, self.grp2_sample_size,
+                                          self.replicates, self.random_state, self.precision, self.processes,
+                                          self.executor, confidence_level=self.confidence_level)
+            simulating_stage.replicates = len(diff_simulated_proportions)
+        self.grp1_simulated_proportions = np.sort(grp1_simulated_proportions)
+        self.grp2_simulated_proportions = np.sort(grp2_simulated_proportions)
+        self.diff_simulated_proportions = np.sort(diff_simulated_proportions)
+
     @staticmethod
-    def simulate_grp(proportion, sample_size):
-        simulated_proportions = [0] * 1000
-        for iter in range(1000):
-            count = 0
-            for trials in range(sample_size):
-                if random.random() <= proportion:
-                    count += 1
-            simulated_proportions[iter] = float(count) / sample_size
-
-        return sorted(simulated_proportions)
-    
+    def simulate_grp(proportion, sample_size, replicates=DEFAULT_REPLICATES, random_state=None):
+        return simulate_proportions(proportion, sample_size, replicates, random_state)
+
     def confidence_interval(self, confidence_level):
         q = 1 - (1 - confidence_level) / 2
         if self.distribution_family == DistributionFamily.normal:
-            z = norm.ppf(q)
+            z = ppf(NORMAL, q)
             pf = z * self.standard_error
             return self.point_estimate - pf, self.point_estimate + pf
         else:
-            threshold1 = int(1000 * (1 - confidence_level) / 2)
-            threshold2 = int(1000 * q)
-            return self.diff_simulated_proportions[threshold1], self.diff_simulated_proportions[threshold2]
+            return get_quantile(self.diff_simulated_proportions, (1 - confidence_level) / 2), \
+                get_quantile(self.diff_simulated_proportions, q)
+
+    def confidence_interval_errors(self, confidence_level):
+        if self.distribution_family != DistributionFamily.simulation:
+            return None
+        return calculate_interval_errors(self.diff_simulated_proportions, get_interval_quantiles(confidence_level))
 
 
 
@@ -0,0 +1,59 @@
+import numpy as np
+
+CHUNK_SIZE = 65536
+
+
+def merge_moments(count1, mean1, sum_of_squares1, count2, mean2, sum_of_squares2):
+    count = count1 + count2
+    if count == 0:
+        return 0, 0.0, 0.0
+    delta = mean2 - mean1
+    mean = mean1 + delta * count2 / count
+    sum_of_squares = sum_of_squares1 + sum_of_squares2 + delta * delta * count1 * count2 / count
+    return count, mean, sum_of_squares
+
+
+def calculate_moments(x, chunk_size=CHUNK_SIZE):
+    # each chunk is small enough to stay in cache, so the mean and the centered sum of squares of a chunk are
+    # computed from a single read of the data; the chunk results are then combined with Chan's parallel update
+    x = np.asarray(x, dtype=np.float64)
+    count, mean, sum_of_squares = 0, 0.0, 0.0
+    for start in range(0, len(x), chunk_size):
+        chunk = x[start:start + chunk_size]
+        chunk_mean = chunk.mean()
+        deviations = chunk - chunk_mean
+        count, mean, sum_of_squares = merge_moments(count, mean, sum_of_squares,
+                                                    len(chunk), float(chunk_mean),
+                                                    float(np.dot(deviations, deviations)))
+    return count, mean, sum_of_squares
+
+
+def merge_grouped_moments(counts1, means1, sum_of_squares1, counts2, means2, sum_of_squares2):
+    counts = counts1 + counts2
+    safe_counts = np.maximum(counts, 1)
+    deltas = means2 - means1
+    means = means1 + deltas * counts2 / safe_counts
+    sum_of_squares = sum_of_squares1 + sum_of_squares2 + deltas * deltas * counts1 * counts2 / safe_counts
+    return counts, means, sum_of_squares
+
+
+def calculate_grouped_moments(group_codes, x, group_count, chunk_size=CHUNK_SIZE):
+    counts = np.zeros(group_count, dtype=np.int64)
+    means = np.zeros(group_count, dtype=np.float64)
+    sum_of_squares = np.zeros(group_count, dtype=np.float64)
+    for start in range(0, len(group_codes), chunk_size):
+        codes = group_codes[start:start + chunk_size]
+        chunk = np.asarray(x[start:start + chunk_size], dtype=np.float64)
+        chunk_counts = np.bincount(codes, minlength=group_count)
+        chunk_means = np.bincount(codes, weights=chunk, minlength=group_count) / np.maximum(chunk_counts, 1)
+        deviations = chunk - chunk_means[codes]
+        chunk_sum_of_squares = np.bincount(codes, weights=deviations * deviations, minlength=group_count)
+        counts, means, sum_of_squares = merge_grouped_moments(counts, means, sum_of_squares,
+                                                              chunk_counts, chunk_means, chunk_sum_of_squares)
+    return counts, means, sum_of_squares
+
+
+def count_labels_by_group(group_codes, label_codes, group_count, label_count):
+    matched = label_codes >= 0
+    cells = group_codes[matched].astype(np.int64) * label_count + label_codes[matched]
+    return np.bincount(cells, minlength=group_count * label_count).reshape(group_count, label_count)
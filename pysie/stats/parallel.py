@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+
+
+class TaskRunner(object):
+    processes = None
+    executor = None
+    pool = None
+
+    def __init__(self, processes=None, executor=None):
+        self.processes = processes
+        self.executor = executor
+
+    def worker_count(self):
+        # the number of tasks that run at the same time: processes when given, even with an executor, as executors
+        # have no public worker count; otherwise the _max_workers of the concurrent.futures executors, and for other
+        # executors the number of CPUs
+        if self.processes is not None:
+            return max(1, self.processes)
+        if self.executor is not None:
+            return max(1, getattr(self.executor, '_max_workers', None) or os.cpu_count() or 1)
+        return 1
+
+    def map(self, function, tasks):
+        # results come back in task order whatever runs them; function must be a module-level function so that it
+        # can be pickled for the worker processes
+        tasks = list(tasks)
+        if self.executor is not None:
+            return list(self.executor.map(function, tasks))
+        if self.processes is None or self.processes <= 1 or len(tasks) <= 1:
+            return [function(task) for task in tasks]
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.processes)
+        return self.pool.map(function, tasks)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def map_tasks(function, tasks, processes=None, executor=None):
+    with TaskRunner(processes, executor) as runner:
+        return runner.map(function, tasks)
@@ -0,0 +1,183 @@
+import math
+
+import numpy as np
+
+from pysie.stats.critical_values import NORMAL, ppf
+from pysie.stats.simulation import BLOCK_ELEMENTS, DEFAULT_REPLICATES, SimulationScheduler, calculate_p_value_error, \
+    create_random_generator
+
+TASK_REPLICATES = 500
+STOPPING_CONFIDENCE = 0.999
+
+
+def permute_codes(codes, replicates, generator):
+    return generator.permuted(np.broadcast_to(codes, (replicates, len(codes))), axis=1)
+
+
+def sum_by_permuted_group(permuted_codes, group_count, x=None):
+    # offsetting the codes of every replicate by replicate * group_count lets a single bincount reduce all the groups
+    # of all the replicates at once; without x it counts the rows
+    replicates = permuted_codes.shape[0]
+    offsets = np.arange(replicates, dtype=np.int64)[:, None] * group_count
+    weights = None if x is None else np.broadcast_to(x, permuted_codes.shape).ravel()
+    sums = np.bincount((permuted_codes + offsets).ravel(), weights=weights, minlength=replicates * group_count)
+    return sums.reshape(replicates, group_count)
+
+
+def count_extreme(statistics, observed, two_sided=False):
+    # ties count as extreme, with a tolerance for the rounding of the group-wise sums; one-tailed counts are taken
+    # on the side of the observed statistic
+    tolerance = 1e-9 * max(abs(observed), 1.0)
+    if two_sided:
+        return int(np.count_nonzero(np.abs(statistics) >= abs(observed) - tolerance))
+    if observed < 0:
+        return int(np.count_nonzero(statistics <= observed + tolerance))
+    return int(np.count_nonzero(statistics >= observed - tolerance))
+
+
+class MeanDiffStatistic(object):
+    codes = None
+    xs = None
+    counts = None
+
+    def __init__(self, grp1_xs, grp2_xs):
+        self.xs = np.concatenate([grp1_xs, grp2_xs]).astype(np.float64)
+        self.codes = np.repeat(np.arange(2, dtype=np.int64), [len(grp1_xs), len(grp2_xs)])
+        self.counts = np.array([len(grp1_xs), len(grp2_xs)], dtype=np.float64)
+
+    def evaluate(self, permuted_codes):
+        means = sum_by_permuted_group(permuted_codes, 2, self.xs) / self.counts
+        return means[:, 0] - means[:, 1]
+
+
+class AnovaStatistic(object):
+    codes = None
+    xs = None
+    group_count = None
+    counts = None
+    mean = None
+    sum_of_squares_total = None
+    df_group = None
+    df_error = None
+
+    def __init__(self, group_codes, group_count, xs):
+        # rows without a group take the extra code group_count: they are shuffled with the others and count
+        # towards the total sum of squares, but not towards the sum of squares between the groups
+        self.codes = np.where(group_codes < 0, group_count, group_codes).astype(np.int64)
+        self.group_count = group_count
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.counts = np.bincount(self.codes, minlength=group_count + 1)[:group_count].astype(np.float64)
+        self.mean = self.xs.mean()
+        self.sum_of_squares_total = np.square(self.xs - self.mean).sum()
+        self.df_group = np.count_nonzero(self.counts) - 1
+        self.df_error = len(self.xs) - 1 - self.df_group
+
+    def evaluate(self, permuted_codes):
+        sums = sum_by_permuted_group(permuted_codes, self.group_count + 1, self.xs)[:, :self.group_count]
+        means = sums / np.maximum(self.counts, 1)
+        sum_of_squares_group = (np.square(means - self.mean) * self.counts).sum(axis=1)
+        return (sum_of_squares_group / self.df_group) / \
+            ((self.sum_of_squares_total - sum_of_squares_group) / self.df_error)
+
+
+class ChiSquareStatistic(object):
+    codes = None
+    label_codes = None
+    column_count = None
+    expected = None
+
+    def __init__(self, counts):
+        # the table is expanded back into one (row, column) pair per observation, and shuffling the column codes
+        # keeps both margins, and so the expected counts, fixed
+        counts = np.asarray(counts, dtype=np.int64)
+        row_count, self.column_count = counts.shape
+        cells = np.repeat(np.arange(row_count * self.column_count, dtype=np.int64), counts.ravel())
+        self.label_codes = cells // self.column_count
+        self.codes = cells % self.column_count
+        self.expected = (np.outer(counts.sum(axis=1), counts.sum(axis=0)) / float(counts.sum())).ravel()
+
+    def evaluate(self, permuted_codes):
+        cell_counts = sum_by_permuted_group(self.label_codes * self.column_count + permuted_codes, len(self.expected))
+        return (np.square(cell_counts - self.expected) / self.expected).sum(axis=1)
+
+
+def permutation_task(task):
+    statistic, block_size, replicates, seed_sequence = task
+    generator = create_random_generator(seed_sequence)
+    if block_size is None:
+        block_size = max(1, BLOCK_ELEMENTS // max(len(statistic.codes), 1))
+    statistics = np.empty(replicates, dtype=np.float64)
+    for start in range(0, replicates, block_size):
+        stop = min(start + block_size, replicates)
+        statistics[start:stop] = statistic.evaluate(permute_codes(statistic.codes, stop - start, generator))
+    return statistics
+
+
+class PermutationTest(object):
+    statistic = None
+    observed = None
+    two_sided = False
+    simulated_statistics = None
+    replicates = DEFAULT_REPLICATES
+    random_state = None
+    significance_level = None
+    early_stopping = False
+    stopped_early = False
+    p_value = None
+    p_value_error = None
+
+    def __init__(self, statistic, two_sided=None, replicates=None, random_state=None, significance_level=None,
+                 early_stopping=None, block_size=None, processes=None, executor=None):
+        self.statistic = statistic
+        if two_sided is not None:
+            self.two_sided = two_sided
+        if replicates is not None:
+            self.replicates = replicates
+        if random_state is not None:
+            self.random_state = random_state
+        if significance_level is not None:
+            self.significance_level = significance_level
+        if early_stopping is not None:
+            self.early_stopping = early_stopping
+        if self.early_stopping and self.significance_level is None:
+            raise ValueError('early stopping needs a significance level')
+
+        self.observed = float(statistic.evaluate(statistic.codes[np.newaxis, :])[0])
+        self.run(block_size, processes, executor)
+        self.p_value = self.calculate_p_value(self.two_sided)
+        self.p_value_error = self.calculate_p_value_error(self.two_sided)
+
+    def run(self, block_size=None, processes=None, executor=None):
+        # with early stopping, the stopping rule sees the statistics of one task at a time and keeps the running
+        # count of extreme ones
+        counts = dict(extreme=0, replicates=0)
+
+        def stopping_rule(statistics):
+            counts['extreme'] += count_extreme(statistics, self.observed, self.two_sided)
+            counts['replicates'] += len(statistics)
+            return self.is_decided(counts['extreme'], counts['replicates'])
+
+        scheduler = SimulationScheduler(self.replicates, self.random_state, processes=processes, executor=executor,
+                                        task_replicates=TASK_REPLICATES)
+        self.simulated_statistics = scheduler.run(permutation_task, (self.statistic, block_size),
+                                                  stopping_rule=stopping_rule if self.early_stopping else None)
+        self.stopped_early = scheduler.stopped_early
+
+    def is_decided(self, extreme, replicates):
+        # stop once a normal-approximation confidence interval for the p-value no longer contains the
+        # significance level
+        p_value = (extreme + 1.0) / (replicates + 1.0)
+        half_width = ppf(NORMAL, STOPPING_CONFIDENCE) * math.sqrt(p_value * (1 - p_value) / replicates)
+        return p_value - half_width > self.significance_level or p_value + half_width < self.significance_level
+
+    def size(self):
+        return len(self.simulated_statistics)
+
+    def calculate_p_value(self, two_sided=False):
+        extreme = count_extreme(self.simulated_statistics, self.observed, two_sided)
+        return (extreme + 1.0) / (self.size() + 1.0)
+
+    def calculate_p_value_error(self, two_sided=False):
+        # the Monte Carlo standard error of the p-value
+        return calculate_p_value_error(count_extreme(self.simulated_statistics, self.observed, two_sided),
+                                       self.size())
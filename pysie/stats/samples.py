@@ -1,6 +1,101 @@
 import math
 
-from pysie.dsl.set import TernarySearchTrie
+import numpy as np
+
+from pysie.dsl.set import TernarySearchTrie, TernarySearchSet
+from pysie.instrumentation import stage
+from pysie.stats.distributions import MeanSamplingDistribution, ProportionSamplingDistribution
+from pysie.stats.moments import calculate_moments, calculate_grouped_moments, count_labels_by_group, merge_moments, \
+    merge_grouped_moments
+from pysie.stats.parallel import map_tasks
+
+
+GROUP_ID_SEPARATOR = '/'
+# rows per task of the partitioned aggregations, a multiple of the moments CHUNK_SIZE
+PARTITION_ROWS = 1 << 22
+
+
+def group_id_prefix(group_id, level, separator=GROUP_ID_SEPARATOR):
+    parts = group_id.split(separator)
+    if len(parts) <= level:
+        return group_id
+    return separator.join(parts[:level]) + separator
+
+
+def roll_up_group_ids(group_ids, prefixes=None, level=None, separator=GROUP_ID_SEPARATOR):
+    # map every group id onto the longest of the given prefixes it starts with (None when there is none); with a
+    # level instead of prefixes, group ids such as 'region/store/day' are rolled up to their first level parts
+    if prefixes is None:
+        prefixes = set(group_id_prefix(group_id, level, separator) for group_id in group_ids)
+    trie = TernarySearchSet.bulk_load_keys(prefixes)
+    return [trie.longest_prefix_of(group_id) for group_id in group_ids]
+
+
+def encode_value(value, values, index):
+    if value is None:
+        return -1
+    code = index.get(value)
+    if code is None:
+        code = len(values)
+        values.append(value)
+        index[value] = code
+    return code
+
+
+def reorder_codes(codes, values):
+    # renumbers the codes in the order in which they first appear and drops the values that no row uses, which is
+    # how encode_value numbers values added row by row
+    codes = np.asarray(codes)
+    present = codes >= 0
+    used, first_index = np.unique(codes[present], return_index=True)
+    used = used[np.argsort(first_index, kind='stable')]
+    mapping = np.full(len(values), -1, dtype=np.int32)
+    mapping[used] = np.arange(len(used), dtype=np.int32)
+    return np.where(present, mapping[np.maximum(codes, 0)], -1).astype(np.int32), [values[i] for i in used.tolist()]
+
+
+def encode_column(column):
+    # codes for a whole column of labels or group ids, with -1 for the missing (None or NaN) entries
+    column = np.asarray(column)
+    if column.dtype.kind == 'f':
+        missing = np.isnan(column)
+    elif column.dtype.kind == 'O':
+        missing = np.asarray(column == None) | np.asarray(column != column)  # noqa: E711, elementwise comparison
+    else:
+        missing = np.zeros(len(column), dtype=bool)
+    values, inverse = np.unique(column[~missing], return_inverse=True)
+    codes = np.full(len(column), -1, dtype=np.int64)
+    codes[~missing] = inverse.ravel()
+    return reorder_codes(codes, values.tolist())
+
+
+def aggregate_partition(task):
+    group_codes, group_count, xs, label_codes, label_count = task
+    # rows without a group id are aggregated into an extra trailing bucket so that they still count towards the
+    # totals of the whole sample
+    group_codes = np.where(group_codes < 0, group_count, group_codes)
+
+    means = None
+    sum_of_squares = None
+    if xs is not None:
+        counts, means, sum_of_squares = calculate_grouped_moments(group_codes, xs, group_count + 1)
+        if np.isnan(means).any():
+            # a NaN x is a missing value; the rows are only filtered when a group turns out to have one
+            present = ~np.isnan(xs)
+            counts, means, sum_of_squares = calculate_grouped_moments(group_codes[present], xs[present],
+                                                                      group_count + 1)
+    else:
+        counts = np.bincount(group_codes, minlength=group_count + 1)
+
+    label_counts = None
+    if label_codes is not None:
+        label_counts = count_labels_by_group(group_codes, label_codes, group_count + 1, label_count)
+    return counts, means, sum_of_squares, label_counts
+
+
+def as_float_column(column):
+    # no copy when the column already holds float64 values
+    return np.asarray(column, dtype=np.float64)
 
 
 class Observation(object):
@@ -30,10 +125,89 @@ class Observation(object):
 
 class Sample(object):
     observations = None
+    # per-group summaries of every row, kept by samples that are stored together with them (see
+    # pysie.stats.storage); when present they stand in for a pass over the rows
+    grouped_summary = None
 
     def __init__(self):
         self.observations = []
 
+    @staticmethod
+    def from_arrays(x=None, y=None, label=None, group_id=None):
+        # builds a ColumnarSample from whole columns; float64 columns are used without a copy, and the label and
+        # group id columns are encoded with vectorised unique passes instead of one dictionary lookup per row
+        label_codes, labels = (None, None) if label is None else encode_column(label)
+        group_codes, group_ids = (None, None) if group_id is None else encode_column(group_id)
+        return ColumnarSample.from_columns(xs=None if x is None else as_float_column(x),
+                                           ys=None if y is None else as_float_column(y),
+                                           label_codes=label_codes, labels=labels, group_codes=group_codes,
+                                           group_ids=group_ids)
+
+    @staticmethod
+    def from_dataframe(data_frame, x=None, y=None, label=None, group_id=None):
+        # x, y, label and group_id name the columns of a pandas DataFrame; categorical columns reuse their codes and
+        # the other label and group id columns are encoded with pandas.factorize
+        import pandas as pd
+
+        def float_column(name):
+            if name is None:
+                return None
+            column = data_frame[name]
+            if column.dtype == np.float64:
+                return np.asarray(column)
+            return column.to_numpy(dtype=np.float64, na_value=np.nan)
+
+        def coded_column(name):
+            if name is None:
+                return None, None
+            column = data_frame[name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                return reorder_codes(np.asarray(column.cat.codes), list(column.cat.categories))
+            codes, values = pd.factorize(column, sort=False)
+            return codes.astype(np.int32), list(values)
+
+        label_codes, labels = coded_column(label)
+        group_codes, group_ids = coded_column(group_id)
+        return ColumnarSample.from_columns(xs=float_column(x), ys=float_column(y), label_codes=label_codes,
+                                           labels=labels, group_codes=group_codes, group_ids=group_ids)
+
+    @staticmethod
+    def from_arrow(table, x=None, y=None, label=None, group_id=None):
+        # x, y, label and group_id name the columns of a pyarrow Table (or RecordBatch); single-chunk float64
+        # columns without nulls are viewed without a copy, and dictionary columns reuse their indices
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        def column_array(name):
+            column = table.column(name)
+            if isinstance(column, pa.ChunkedArray):
+                column = column.combine_chunks()
+            return column
+
+        def float_column(name):
+            if name is None:
+                return None
+            column = column_array(name)
+            if column.type != pa.float64():
+                column = column.cast(pa.float64())
+            if column.null_count > 0:
+                column = pc.fill_null(column, np.nan)
+            return column.to_numpy(zero_copy_only=False)
+
+        def coded_column(name):
+            if name is None:
+                return None, None
+            column = column_array(name)
+            if not pa.types.is_dictionary(column.type):
+                column = column.dictionary_encode()
+            codes = pc.fill_null(column.indices, -1).to_numpy(zero_copy_only=False)
+            return reorder_codes(codes, column.dictionary.to_pylist())
+
+        label_codes, labels = coded_column(label)
+        group_codes, group_ids = coded_column(group_id)
+        return ColumnarSample.from_columns(xs=float_column(x), ys=float_column(y), label_codes=label_codes,
+                                           labels=labels, group_codes=group_codes, group_ids=group_ids)
+
     def add(self, observation):
         self.observations.append(observation)
 
@@ -71,10 +245,51 @@ class Sample(object):
     def count_by_group_id(self, group_id):
         return sum(1 for x in self.observations if group_id is None or x.group_id == group_id)
 
-    def split_by_group_id(self):
+    def count_by_label(self, label, group_id=None):
+        return sum(1 for x in self.observations if (group_id is None or x.group_id == group_id) and x.label == label)
+
+    def get_x_array(self, group_id=None):
+        if group_id is None:
+            return np.fromiter((x.x for x in self.observations), dtype=np.float64, count=len(self.observations))
+        return np.fromiter((x.x for x in self.observations if x.group_id == group_id), dtype=np.float64)
+
+    def get_y_array(self, group_id=None):
+        return np.fromiter((np.nan if x.y is None else x.y for x in self.observations
+                            if group_id is None or x.group_id == group_id), dtype=np.float64)
+
+    def get_label_codes(self):
+        labels = []
+        label_index = dict()
+        codes = np.fromiter((encode_value(x.label, labels, label_index) for x in self.observations),
+                            dtype=np.int32, count=len(self.observations))
+        return codes, labels
+
+    def get_group_codes(self):
+        group_ids = []
+        group_index = dict()
+        codes = np.fromiter((encode_value(x.group_id, group_ids, group_index) for x in self.observations),
+                            dtype=np.int32, count=len(self.observations))
+        return codes, group_ids
+
+    def aggregate_by_group_id(self, processes=None, executor=None):
+        if self.grouped_summary is not None:
+            return self.grouped_summary
+        group_codes, group_ids = self.get_group_codes()
+        xs = self.get_x_array() if self.is_numerical() else None
+        label_codes, labels = self.get_label_codes() if self.is_categorical() else (None, None)
+        return GroupedSampleSummary.from_codes(group_codes, group_ids, xs=xs, label_codes=label_codes, labels=labels,
+                                               processes=processes, executor=executor)
+
+    def split_by_group_id(self, prefixes=None, level=None, separator=GROUP_ID_SEPARATOR):
+        roll_up = None
+        if prefixes is not None or level is not None:
+            group_ids = list(set(x.group_id for x in self.observations if x.group_id is not None))
+            roll_up = dict(zip(group_ids, roll_up_group_ids(group_ids, prefixes, level, separator)))
         result = TernarySearchTrie()
         for ob in self.observations:
             group_id = ob.group_id
+            if roll_up is not None and group_id is not None:
+                group_id = roll_up[group_id]
             if group_id is None:
                 continue
             if result.contains_key(group_id):
@@ -86,6 +301,218 @@ class Sample(object):
         return result
 
 
+class ColumnarSample(Sample):
+    count = 0
+    xs = None
+    ys = None
+    label_codes = None
+    group_codes = None
+    labels = None
+    label_index = None
+    group_ids = None
+    group_index = None
+
+    def __init__(self, capacity=16):
+        self.count = 0
+        self.xs = np.full(capacity, np.nan, dtype=np.float64)
+        self.ys = np.full(capacity, np.nan, dtype=np.float64)
+        self.label_codes = np.full(capacity, -1, dtype=np.int32)
+        self.group_codes = np.full(capacity, -1, dtype=np.int32)
+        self.labels = []
+        self.label_index = dict()
+        self.group_ids = []
+        self.group_index = dict()
+
+    @staticmethod
+    def from_columns(xs=None, ys=None, label_codes=None, labels=None, group_codes=None, group_ids=None):
+        # the columns become the arrays of the sample as they are; a missing column is a read-only broadcast of
+        # its missing value, so it takes no memory until the sample grows, which always copies into new arrays
+        sizes = set(len(column) for column in [xs, ys, label_codes, group_codes] if column is not None)
+        if len(sizes) > 1:
+            raise ValueError('the columns of a sample must have the same length')
+        count = sizes.pop() if sizes else 0
+
+        sample = ColumnarSample(capacity=0)
+        sample.count = count
+        sample.xs = np.broadcast_to(np.float64(np.nan), (count,)) if xs is None else xs
+        sample.ys = np.broadcast_to(np.float64(np.nan), (count,)) if ys is None else ys
+        if label_codes is not None:
+            sample.label_codes = np.asarray(label_codes, dtype=np.int32)
+            sample.labels = list(labels)
+            sample.label_index = dict((label, i) for i, label in enumerate(sample.labels))
+        else:
+            sample.label_codes = np.broadcast_to(np.int32(-1), (count,))
+        if group_codes is not None:
+            sample.group_codes = np.asarray(group_codes, dtype=np.int32)
+            sample.group_ids = list(group_ids)
+            sample.group_index = dict((group_id, i) for i, group_id in enumerate(sample.group_ids))
+        else:
+            sample.group_codes = np.broadcast_to(np.int32(-1), (count,))
+        return sample
+
+    def capacity(self):
+        return len(self.xs)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity():
+            return
+        self.xs = ColumnarSample.grow(self.xs, capacity, np.nan)
+        self.ys = ColumnarSample.grow(self.ys, capacity, np.nan)
+        self.label_codes = ColumnarSample.grow(self.label_codes, capacity, -1)
+        self.group_codes = ColumnarSample.grow(self.group_codes, capacity, -1)
+
+    @staticmethod
+    def grow(array, capacity, fill_value):
+        result = np.full(capacity, fill_value, dtype=array.dtype)
+        result[:len(array)] = array
+        return result
+
+    def append(self, x=None, y=None, label=None, group_id=None):
+        i = self.count
+        if i == self.capacity():
+            self.reserve(max(16, 2 * i))
+        if x is not None:
+            self.xs[i] = x
+        if y is not None:
+            self.ys[i] = y
+        self.label_codes[i] = encode_value(label, self.labels, self.label_index)
+        self.group_codes[i] = encode_value(group_id, self.group_ids, self.group_index)
+        self.count = i + 1
+
+    def add(self, observation):
+        self.append(x=observation.x, y=observation.y, label=observation.label, group_id=observation.group_id)
+
+    def add_numeric(self, x, group_id=None):
+        self.append(x=x, group_id=group_id)
+
+    def add_category(self, label, group_id=None):
+        self.append(label=label, group_id=group_id)
+
+    def add_xy(self, x, y, group_id=None):
+        self.append(x=x, y=y, group_id=group_id)
+
+    def size(self):
+        return self.count
+
+    def get(self, index):
+        if index < 0:
+            index += self.count
+        if index < 0 or index >= self.count:
+            raise IndexError('sample index out of range')
+        x = self.xs[index]
+        y = self.ys[index]
+        label_code = self.label_codes[index]
+        group_code = self.group_codes[index]
+        ob = Observation()
+        if not np.isnan(x):
+            ob.x = float(x)
+        if not np.isnan(y):
+            ob.y = float(y)
+        if label_code >= 0:
+            ob.label = self.labels[label_code]
+        if group_code >= 0:
+            ob.group_id = self.group_ids[group_code]
+        return ob
+
+    # a column holds a kind of value if any row has it, so a missing value in the first row does not decide
+    def is_categorical(self):
+        return bool((self.label_codes[:self.count] >= 0).any())
+
+    def is_numerical(self):
+        return not np.isnan(self.xs[:self.count]).all()
+
+    def count_by_group_id(self, group_id):
+        if group_id is None:
+            return self.count
+        code = self.group_index.get(group_id)
+        if code is None:
+            return 0
+        return int(np.count_nonzero(self.group_codes[:self.count] == code))
+
+    def count_by_label(self, label, group_id=None):
+        label_code = self.label_index.get(label)
+        if label_code is None:
+            return 0
+        matched = self.label_codes[:self.count] == label_code
+        if group_id is not None:
+            code = self.group_index.get(group_id)
+            if code is None:
+                return 0
+            matched &= self.group_codes[:self.count] == code
+        return int(np.count_nonzero(matched))
+
+    def get_x_array(self, group_id=None):
+        if group_id is None:
+            return self.xs[:self.count]
+        code = self.group_index.get(group_id)
+        if code is None:
+            return self.xs[:0]
+        return self.xs[:self.count][self.group_codes[:self.count] == code]
+
+    def get_y_array(self, group_id=None):
+        if group_id is None:
+            return self.ys[:self.count]
+        code = self.group_index.get(group_id)
+        if code is None:
+            return self.ys[:0]
+        return self.ys[:self.count][self.group_codes[:self.count] == code]
+
+    def get_label_codes(self):
+        return self.label_codes[:self.count], self.labels
+
+    def get_group_codes(self):
+        return self.group_codes[:self.count], self.group_ids
+
+    @staticmethod
+    def take_codes(codes, values):
+        # re-encodes the codes of some rows against only the values they use, so the rows of one group do not carry
+        # the labels and group ids of the whole sample
+        if len(values) == 0:
+            return codes, []
+        used, codes = np.unique(codes, return_inverse=True)
+        if len(used) > 0 and used[0] < 0:
+            used = used[1:]
+            codes = codes - 1
+        return codes, [values[code] for code in used]
+
+    def take(self, indices, group_id=None):
+        # with a group_id, the rows all belong to that one group
+        sample = ColumnarSample(capacity=max(16, len(indices)))
+        sample.count = len(indices)
+        sample.xs[:sample.count] = self.xs[indices]
+        sample.ys[:sample.count] = self.ys[indices]
+        sample.label_codes[:sample.count], sample.labels = ColumnarSample.take_codes(self.label_codes[indices],
+                                                                                     self.labels)
+        if group_id is not None:
+            sample.group_codes[:sample.count] = 0
+            sample.group_ids = [group_id]
+        else:
+            sample.group_codes[:sample.count], sample.group_ids = \
+                ColumnarSample.take_codes(self.group_codes[indices], self.group_ids)
+        sample.label_index = dict((label, i) for i, label in enumerate(sample.labels))
+        sample.group_index = dict((group_id, i) for i, group_id in enumerate(sample.group_ids))
+        return sample
+
+    def split_by_group_id(self, prefixes=None, level=None, separator=GROUP_ID_SEPARATOR):
+        group_ids = self.group_ids
+        group_codes = self.group_codes[:self.count]
+        rolled_up = prefixes is not None or level is not None
+        if rolled_up:
+            group_ids, mapping = GroupedSampleSummary.encode_roll_up(self.group_ids, prefixes, level, separator)
+            group_codes = np.where(group_codes < 0, -1, mapping[np.maximum(group_codes, 0)])
+
+        result = TernarySearchTrie()
+        order = np.argsort(group_codes, kind='stable')
+        boundaries = np.searchsorted(group_codes[order], np.arange(len(group_ids) + 1))
+        for code, group_id in enumerate(group_ids):
+            start, stop = boundaries[code], boundaries[code + 1]
+            if start == stop:
+                continue
+            # a rolled-up group keeps the group ids of its rows
+            result.put(group_id, self.take(order[start:stop], None if rolled_up else group_id))
+        return result
+
+
 class SampleDistribution(object):
     sample = None
     group_id = None
@@ -103,7 +530,7 @@ class SampleDistribution(object):
     proportion = None
 
     def __init__(self, sample=None, group_id=None, categorical_value=None, mean=None, sd=None, sample_size=None,
-                 proportion=None):
+                 proportion=None, summary=None):
         if group_id is not None:
             self.group_id = group_id
 
@@ -120,6 +547,9 @@ class SampleDistribution(object):
         if sample is not None:
             self.build(sample)
 
+        if summary is not None:
+            summary.update_sample_distribution(self)
+
     def track_categorical(self, categorical_value, proportion):
         if categorical_value is not None:
             self.categorical_value = categorical_value
@@ -138,19 +568,37 @@ class SampleDistribution(object):
 
     def build(self, sample):
         self.sample = sample
-        if sample.is_numerical():
-            self.mean = SampleDistribution.calculate_mean(sample, self.group_id)
-            self.sum_of_squares = SampleDistribution.calculate_sum_of_squares(sample, self.mean, self.group_id)
-            self.sample_size = sample.count_by_group_id(self.group_id)
-            self.variance = self.sum_of_squares / (self.sample_size - 1)
-            self.sd = math.sqrt(self.variance)
-            self.is_numerical = True
-        elif sample.is_categorical() and self.categorical_value is not None:
-            self.proportion = SampleDistribution.calculate_proportion(sample, self.categorical_value, self.group_id)
-            self.sample_size = sample.count_by_group_id(self.group_id)
-            self.mean = self.proportion * self.sample_size
-            self.variance = self.proportion * (1.0 - self.proportion) * self.sample_size
-            self.is_categorical = True
+        with stage('sample_distribution', 'summarizing', rows=sample.size()):
+            summary = sample.grouped_summary
+            if summary is not None and (self.group_id is None or self.group_id in summary.group_index):
+                summary.update_sample_distribution(self)
+            elif sample.is_numerical():
+                xs = sample.get_x_array(self.group_id)
+                sample_size, mean, sum_of_squares = calculate_moments(xs)
+                if math.isnan(mean):
+                    sample_size, mean, sum_of_squares = calculate_moments(xs[~np.isnan(xs)])
+                self.track_moments(sample_size, mean, sum_of_squares)
+            elif sample.is_categorical() and self.categorical_value is not None:
+                self.track_counts(sample.count_by_label(self.categorical_value, self.group_id),
+                                  sample.count_by_group_id(self.group_id))
+
+    def track_moments(self, sample_size, mean, sum_of_squares):
+        if sample_size == 0:
+            raise ValueError('no numerical observations' +
+                             ('' if self.group_id is None else ' in group ' + str(self.group_id)))
+        self.sample_size = sample_size
+        self.mean = mean
+        self.sum_of_squares = sum_of_squares
+        self.variance = self.sum_of_squares / (self.sample_size - 1)
+        self.sd = math.sqrt(self.variance)
+        self.is_numerical = True
+
+    def track_counts(self, label_count, sample_size):
+        self.sample_size = sample_size
+        self.proportion = 0.0 if sample_size == 0 else float(label_count) / sample_size
+        self.mean = self.proportion * self.sample_size
+        self.variance = self.proportion * (1.0 - self.proportion) * self.sample_size
+        self.is_categorical = True
 
     @staticmethod
     def calculate_mean(sample, group_id):
@@ -188,3 +636,346 @@ class SampleDistribution(object):
         if counter2 == 0:
             return 0.0
         return float(counter1) / counter2
+
+
+class GroupedSampleSummary(object):
+    group_ids = None
+    group_index = None
+    labels = None
+    label_index = None
+
+    counts = None
+    means = None
+    sum_of_squares = None
+    label_counts = None
+
+    total_count = 0
+    total_mean = None
+    total_sum_of_squares = None
+    total_label_counts = None
+
+    def __init__(self, group_ids=None, counts=None, means=None, sum_of_squares=None, labels=None, label_counts=None,
+                 total_count=None, total_mean=None, total_sum_of_squares=None, total_label_counts=None):
+        self.group_ids = [] if group_ids is None else list(group_ids)
+        self.group_index = dict((group_id, i) for i, group_id in enumerate(self.group_ids))
+        self.counts = np.zeros(len(self.group_ids), dtype=np.int64) if counts is None else np.asarray(counts)
+
+        if means is not None:
+            self.means = np.asarray(means, dtype=np.float64)
+            self.sum_of_squares = np.asarray(sum_of_squares, dtype=np.float64)
+
+        if labels is not None:
+            self.labels = list(labels)
+            self.label_index = dict((label, i) for i, label in enumerate(self.labels))
+            self.label_counts = np.asarray(label_counts, dtype=np.int64).reshape(len(self.group_ids),
+                                                                                  len(self.labels))
+
+        if total_count is not None:
+            self.total_count = total_count
+        if total_mean is not None:
+            self.total_mean = total_mean
+            self.total_sum_of_squares = total_sum_of_squares
+        if total_label_counts is not None:
+            self.total_label_counts = np.asarray(total_label_counts, dtype=np.int64)
+
+    @staticmethod
+    def from_buckets(group_ids, counts, means=None, sum_of_squares=None, labels=None, label_counts=None):
+        # counts, means, sum_of_squares and label_counts carry one trailing entry for the rows without a group id
+        total_count = int(counts.sum())
+        total_mean = None
+        total_sum_of_squares = None
+        if means is not None:
+            total_mean = float((counts * means).sum() / max(total_count, 1))
+            total_sum_of_squares = float(sum_of_squares.sum() + (counts * (means - total_mean) ** 2).sum())
+        total_label_counts = None
+        if label_counts is not None:
+            total_label_counts = label_counts.sum(axis=0)
+
+        present = np.flatnonzero(counts[:len(group_ids)])
+        return GroupedSampleSummary(group_ids=[group_ids[i] for i in present], counts=counts[present],
+                                    means=None if means is None else means[present],
+                                    sum_of_squares=None if sum_of_squares is None else sum_of_squares[present],
+                                    labels=labels,
+                                    label_counts=None if label_counts is None else label_counts[present],
+                                    total_count=total_count, total_mean=total_mean,
+                                    total_sum_of_squares=total_sum_of_squares, total_label_counts=total_label_counts)
+
+    @staticmethod
+    def from_codes(group_codes, group_ids, xs=None, label_codes=None, labels=None, processes=None, executor=None):
+        # the rows are cut into partitions of PARTITION_ROWS whatever the number of processes, and the partition
+        # results are merged in partition order, so the summary is bit for bit the same serially and in a pool
+        row_count = len(group_codes)
+        tasks = []
+        for start in range(0, max(row_count, 1), PARTITION_ROWS):
+            stop = start + PARTITION_ROWS
+            tasks.append((group_codes[start:stop], len(group_ids), None if xs is None else xs[start:stop],
+                          None if label_codes is None else label_codes[start:stop],
+                          None if labels is None else len(labels)))
+        results = map_tasks(aggregate_partition, tasks, processes, executor)
+
+        counts, means, sum_of_squares, label_counts = results[0]
+        for partition_counts, partition_means, partition_sum_of_squares, partition_label_counts in results[1:]:
+            if means is None:
+                counts = counts + partition_counts
+            else:
+                counts, means, sum_of_squares = merge_grouped_moments(counts, means, sum_of_squares,
+                                                                      partition_counts, partition_means,
+                                                                      partition_sum_of_squares)
+            if label_counts is not None:
+                label_counts = label_counts + partition_label_counts
+
+        return GroupedSampleSummary.from_buckets(group_ids=group_ids, counts=counts, means=means,
+                                                 sum_of_squares=sum_of_squares, labels=labels,
+                                                 label_counts=label_counts)
+
+    def size(self):
+        return len(self.group_ids)
+
+    def sums(self):
+        return self.counts * self.means
+
+    @staticmethod
+    def encode_roll_up(group_ids, prefixes=None, level=None, separator=GROUP_ID_SEPARATOR):
+        rolled_up_ids = []
+        rolled_up_index = dict()
+        mapping = np.array([encode_value(group_id, rolled_up_ids, rolled_up_index)
+                            for group_id in roll_up_group_ids(group_ids, prefixes, level, separator)],
+                           dtype=np.int64)
+        return rolled_up_ids, mapping
+
+    def roll_up(self, prefixes=None, level=None, separator=GROUP_ID_SEPARATOR):
+        group_ids, mapping = GroupedSampleSummary.encode_roll_up(self.group_ids, prefixes, level, separator)
+        # groups outside every prefix and rows without a group id are dropped, so the totals are those of the
+        # rolled-up groups
+        matched = mapping >= 0
+        codes = mapping[matched]
+        counts = np.bincount(codes, weights=self.counts[matched], minlength=len(group_ids)).astype(np.int64)
+
+        means = None
+        sum_of_squares = None
+        if self.means is not None:
+            group_counts = self.counts[matched]
+            group_means = self.means[matched]
+            means = np.bincount(codes, weights=group_counts * group_means, minlength=len(group_ids)) / \
+                np.maximum(counts, 1)
+            deviations = group_means - means[codes]
+            sum_of_squares = np.bincount(codes, weights=self.sum_of_squares[matched] +
+                                         group_counts * deviations * deviations, minlength=len(group_ids))
+
+        label_counts = None
+        if self.labels is not None:
+            label_counts = np.zeros((len(group_ids), len(self.labels)), dtype=np.int64)
+            np.add.at(label_counts, codes, self.label_counts[matched])
+
+        total_count = int(counts.sum())
+        total_mean = None
+        total_sum_of_squares = None
+        if means is not None:
+            total_mean = float((counts * means).sum() / max(total_count, 1))
+            total_sum_of_squares = float(sum_of_squares.sum() + (counts * (means - total_mean) ** 2).sum())
+        total_label_counts = None
+        if label_counts is not None:
+            total_label_counts = label_counts.sum(axis=0)
+
+        return GroupedSampleSummary(group_ids=group_ids, counts=counts, means=means, sum_of_squares=sum_of_squares,
+                                    labels=self.labels, label_counts=label_counts, total_count=total_count,
+                                    total_mean=total_mean, total_sum_of_squares=total_sum_of_squares,
+                                    total_label_counts=total_label_counts)
+
+    def sample_distribution(self, group_id=None, categorical_value=None):
+        return SampleDistribution(group_id=group_id, categorical_value=categorical_value, summary=self)
+
+    def update_sample_distribution(self, sample_distribution):
+        group_id = sample_distribution.group_id
+        categorical_value = sample_distribution.categorical_value
+        if group_id is None:
+            count, mean, sum_of_squares, label_counts = self.total_count, self.total_mean, \
+                                                        self.total_sum_of_squares, self.total_label_counts
+        else:
+            i = self.group_index[group_id]
+            count = int(self.counts[i])
+            mean = None if self.means is None else float(self.means[i])
+            sum_of_squares = None if self.sum_of_squares is None else float(self.sum_of_squares[i])
+            label_counts = None if self.label_counts is None else self.label_counts[i]
+
+        if categorical_value is not None and label_counts is not None:
+            label_code = self.label_index.get(categorical_value)
+            sample_distribution.track_counts(0 if label_code is None else int(label_counts[label_code]), count)
+        elif mean is not None:
+            sample_distribution.track_moments(count, mean, sum_of_squares)
+
+    def merge(self, other):
+        if other.total_count == 0:
+            return self
+        if self.total_count == 0:
+            return other
+        # a summary with moments or label counts on one side only cannot be merged without losing them
+        if (self.means is None) != (other.means is None):
+            raise ValueError('cannot merge a numerical summary with a summary without moments')
+        if (self.labels is None) != (other.labels is None):
+            raise ValueError('cannot merge a categorical summary with a summary without label counts')
+        group_ids = list(self.group_ids)
+        group_index = dict(self.group_index)
+        for group_id in other.group_ids:
+            encode_value(group_id, group_ids, group_index)
+        other_rows = np.array([group_index[group_id] for group_id in other.group_ids], dtype=np.int64)
+
+        counts = GroupedSampleSummary.scatter(self.counts, len(group_ids))
+        other_counts = GroupedSampleSummary.scatter(other.counts, len(group_ids), other_rows)
+        means = None
+        sum_of_squares = None
+        total_mean = None
+        total_sum_of_squares = None
+        if self.means is not None:
+            counts, means, sum_of_squares = merge_grouped_moments(
+                counts, GroupedSampleSummary.scatter(self.means, len(group_ids)),
+                GroupedSampleSummary.scatter(self.sum_of_squares, len(group_ids)),
+                other_counts, GroupedSampleSummary.scatter(other.means, len(group_ids), other_rows),
+                GroupedSampleSummary.scatter(other.sum_of_squares, len(group_ids), other_rows))
+            _, total_mean, total_sum_of_squares = merge_moments(self.total_count, self.total_mean,
+                                                                self.total_sum_of_squares, other.total_count,
+                                                                other.total_mean, other.total_sum_of_squares)
+        else:
+            counts = counts + other_counts
+
+        labels = None
+        label_counts = None
+        total_label_counts = None
+        if self.labels is not None:
+            labels = list(self.labels)
+            label_index = dict(self.label_index)
+            for label in other.labels:
+                encode_value(label, labels, label_index)
+            other_columns = np.array([label_index[label] for label in other.labels], dtype=np.int64)
+            label_counts = np.zeros((len(group_ids), len(labels)), dtype=np.int64)
+            label_counts[:self.size(), :len(self.labels)] = self.label_counts
+            label_counts[np.ix_(other_rows, other_columns)] += other.label_counts
+            total_label_counts = np.zeros(len(labels), dtype=np.int64)
+            total_label_counts[:len(self.labels)] = self.total_label_counts
+            total_label_counts[other_columns] += other.total_label_counts
+
+        return GroupedSampleSummary(group_ids=group_ids, counts=counts, means=means, sum_of_squares=sum_of_squares,
+                                    labels=labels, label_counts=label_counts,
+                                    total_count=self.total_count + other.total_count, total_mean=total_mean,
+                                    total_sum_of_squares=total_sum_of_squares, total_label_counts=total_label_counts)
+
+    @staticmethod
+    def scatter(values, size, rows=None):
+        result = np.zeros(size, dtype=values.dtype)
+        if rows is None:
+            result[:len(values)] = values
+        else:
+            result[rows] = values
+        return result
+
+    def to_dict(self):
+        result = dict(group_ids=list(self.group_ids), counts=self.counts.tolist(), total_count=self.total_count)
+        if self.means is not None:
+            result['means'] = self.means.tolist()
+            result['sum_of_squares'] = self.sum_of_squares.tolist()
+            result['total_mean'] = self.total_mean
+            result['total_sum_of_squares'] = self.total_sum_of_squares
+        if self.labels is not None:
+            result['labels'] = list(self.labels)
+            result['label_counts'] = self.label_counts.tolist()
+            result['total_label_counts'] = self.total_label_counts.tolist()
+        return result
+
+    @staticmethod
+    def from_dict(values):
+        return GroupedSampleSummary(group_ids=values['group_ids'], counts=np.asarray(values['counts'], dtype=np.int64),
+                                    means=values.get('means'), sum_of_squares=values.get('sum_of_squares'),
+                                    labels=values.get('labels'), label_counts=values.get('label_counts'),
+                                    total_count=values['total_count'], total_mean=values.get('total_mean'),
+                                    total_sum_of_squares=values.get('total_sum_of_squares'),
+                                    total_label_counts=values.get('total_label_counts'))
+
+
+class SampleSummary(object):
+    group_id = None
+    sample_size = 0
+    mean = 0.0
+    sum_of_squares = 0.0
+    label_counts = None
+
+    def __init__(self, group_id=None):
+        if group_id is not None:
+            self.group_id = group_id
+        self.label_counts = dict()
+
+    def add_numeric(self, x):
+        # Welford's online update of the mean and the centered sum of squares
+        self.sample_size += 1
+        delta = x - self.mean
+        self.mean += delta / self.sample_size
+        self.sum_of_squares += delta * (x - self.mean)
+
+    def add_numerics(self, xs):
+        self.sample_size, self.mean, self.sum_of_squares = merge_moments(self.sample_size, self.mean,
+                                                                         self.sum_of_squares, *calculate_moments(xs))
+
+    def add_category(self, label):
+        self.sample_size += 1
+        self.label_counts[label] = self.label_counts.get(label, 0) + 1
+
+    def add_categories(self, labels):
+        values, counts = np.unique(np.asarray(labels), return_counts=True)
+        for label, count in zip(values.tolist(), counts.tolist()):
+            self.label_counts[label] = self.label_counts.get(label, 0) + count
+        self.sample_size += int(counts.sum())
+
+    def size(self):
+        return self.sample_size
+
+    def is_categorical(self):
+        return len(self.label_counts) > 0
+
+    def is_numerical(self):
+        return self.sample_size > 0 and len(self.label_counts) == 0
+
+    def proportion(self, categorical_value):
+        if self.sample_size == 0:
+            return 0.0
+        return float(self.label_counts.get(categorical_value, 0)) / self.sample_size
+
+    def sample_distribution(self, categorical_value=None):
+        return SampleDistribution(group_id=self.group_id, categorical_value=categorical_value, summary=self)
+
+    def update_sample_distribution(self, sample_distribution):
+        if sample_distribution.categorical_value is not None:
+            sample_distribution.track_counts(self.label_counts.get(sample_distribution.categorical_value, 0),
+                                             self.sample_size)
+        else:
+            sample_distribution.track_moments(self.sample_size, self.mean, self.sum_of_squares)
+
+    def merge(self, other):
+        result = SampleSummary(group_id=self.group_id)
+        result.sample_size, result.mean, result.sum_of_squares = merge_moments(self.sample_size, self.mean,
+                                                                               self.sum_of_squares, other.sample_size,
+                                                                               other.mean, other.sum_of_squares)
+        result.label_counts = dict(self.label_counts)
+        for label, count in other.label_counts.items():
+            result.label_counts[label] = result.label_counts.get(label, 0) + count
+        return result
+
+    def to_dict(self):
+        # the label counts are [label, count] pairs, as JSON would turn labels that are not strings into strings
+        return dict(group_id=self.group_id, sample_size=self.sample_size, mean=self.mean,
+                    sum_of_squares=self.sum_of_squares,
+                    label_counts=[[label, count] for label, count in self.label_counts.items()])
+
+    @staticmethod
+    def from_dict(values):
+        result = SampleSummary(group_id=values.get('group_id'))
+        result.sample_size = values['sample_size']
+        result.mean = values['mean']
+        result.sum_of_squares = values['sum_of_squares']
+        result.label_counts = dict(values['label_counts'])
+        return result
+
+    def mean_sampling_distribution(self):
+        return MeanSamplingDistribution(sample_distribution=self.sample_distribution())
+
+    def proportion_sampling_distribution(self, categorical_value, replicates=None, random_state=None):
+        return ProportionSamplingDistribution(sample_distribution=self.sample_distribution(categorical_value),
+                                              replicates=replicates, random_state=random_state)
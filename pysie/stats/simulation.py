@@ -0,0 +1,210 @@
+import math
+
+import numpy as np
+
+from pysie.stats.parallel import TaskRunner
+
+DEFAULT_REPLICATES = 1000
+BLOCK_ELEMENTS = 1 << 22
+TASK_REPLICATES = 10000
+# a precision applies to the bounds of the interval at this confidence level unless another one is given
+PRECISION_CONFIDENCE_LEVEL = 0.95
+
+
+def create_random_generator(random_state=None):
+    if isinstance(random_state, np.random.Generator):
+        return random_state
+    return np.random.default_rng(random_state)
+
+
+def spawn_seed_sequences(random_state, count):
+    # the child streams depend only on the seed and their position, so work split into a fixed number of tasks draws
+    # the same numbers whichever process runs each task
+    if isinstance(random_state, np.random.SeedSequence):
+        seed_sequence = random_state
+    elif isinstance(random_state, np.random.Generator):
+        seed_sequence = np.random.SeedSequence(int(random_state.integers(2 ** 63)))
+    else:
+        seed_sequence = np.random.SeedSequence(random_state)
+    return seed_sequence.spawn(count)
+
+
+def proportions_task(task):
+    # each replicate counts the successes of sample_size Bernoulli trials, which is a single binomial draw
+    proportion, sample_size, replicates, seed_sequence = task
+    generator = create_random_generator(seed_sequence)
+    return generator.binomial(sample_size, min(max(proportion, 0.0), 1.0), size=replicates) / float(sample_size)
+
+
+def proportion_diffs_task(task):
+    grp1_proportion, grp1_sample_size, grp2_proportion, grp2_sample_size, replicates, seed_sequence = task
+    generator = create_random_generator(seed_sequence)
+    return np.vstack([generator.binomial(grp1_sample_size, min(max(grp1_proportion, 0.0), 1.0),
+                                         size=replicates) / float(grp1_sample_size),
+                      generator.binomial(grp2_sample_size, min(max(grp2_proportion, 0.0), 1.0),
+                                         size=replicates) / float(grp2_sample_size)])
+
+
+def calculate_p_value_error(extreme, replicates):
+    # binomial standard error of a simulated p-value; the count is shrunk away from 0 and replicates, as a p-value of
+    # exactly 0 would otherwise claim a perfect precision
+    p_value = (extreme + 1.0) / (replicates + 2.0)
+    return math.sqrt(p_value * (1 - p_value) / replicates)
+
+
+def calculate_quantile_error(values, counts, q):
+    # values are the distinct simulated values in order and counts the number of replicates of each. The rank of
+    # the q quantile has a binomial standard deviation, which the quantile function interpolated between the
+    # mid-ranks of the distinct values turns into a distance; with ties, the neighbouring values stay part of that
+    # distance, so a discrete distribution does not report an exact quantile after a single task
+    replicates = counts.sum()
+    spread = math.sqrt(replicates * q * (1 - q))
+    mid_ranks = np.cumsum(counts) - counts / 2.0
+    lower, upper = np.interp([replicates * q - spread, replicates * q + spread], mid_ranks, values)
+    return float(upper - lower) / 2
+
+
+class ValueCounts(object):
+    # the distinct values simulated so far with the number of replicates of each; a task is merged in with a sort of
+    # its own values and of the distinct values, so earlier tasks are never sorted again
+    values = None
+    counts = None
+
+    def __init__(self):
+        self.values = np.zeros(0, dtype=np.float64)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, simulated):
+        values, counts = np.unique(simulated, return_counts=True)
+        self.values, codes = np.unique(np.concatenate([self.values, values]), return_inverse=True)
+        self.counts = np.bincount(codes, weights=np.concatenate([self.counts, counts])).astype(np.int64)
+
+    def size(self):
+        return int(self.counts.sum())
+
+
+class IntervalError(object):
+    # the larger Monte Carlo standard error of the two bounds of the interval at confidence_level, from the value
+    # counts of the tasks seen so far
+    value_counts = None
+    quantiles = None
+
+    def __init__(self, confidence_level=None):
+        self.value_counts = ValueCounts()
+        self.quantiles = get_interval_quantiles(PRECISION_CONFIDENCE_LEVEL if confidence_level is None
+                                                else confidence_level)
+
+    def __call__(self, simulated):
+        self.value_counts.add(simulated)
+        return max(calculate_quantile_error(self.value_counts.values, self.value_counts.counts, q)
+                   for q in self.quantiles)
+
+
+class PValueError(object):
+    # the larger Monte Carlo standard error of the p-values whose extreme replicates count_extreme counts in a task;
+    # the counts are kept across the tasks seen so far
+    count_extreme = None
+    extreme = None
+    replicates = 0
+
+    def __init__(self, count_extreme):
+        self.count_extreme = count_extreme
+
+    def __call__(self, simulated):
+        extreme = np.atleast_1d(self.count_extreme(simulated))
+        self.extreme = extreme if self.extreme is None else self.extreme + extreme
+        self.replicates += len(simulated)
+        return max(calculate_p_value_error(count, self.replicates) for count in self.extreme)
+
+
+def get_interval_quantiles(confidence_level):
+    # the lower bound is taken from (1 - confidence_level) / 2 directly, as 1 - q would round it
+    return (1 - confidence_level) / 2, 1 - (1 - confidence_level) / 2
+
+
+def calculate_interval_errors(simulated, quantiles):
+    # the Monte Carlo standard errors of the given quantiles of all the simulated values
+    values, counts = np.unique(simulated, return_counts=True)
+    return tuple(calculate_quantile_error(values, counts, q) for q in quantiles)
+
+
+def get_quantile(sorted_values, q):
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+class SimulationScheduler(object):
+    # splits the replicates into tasks of task_replicates with their own random streams and runs them through a
+    # TaskRunner; every task is the tuple of parameters followed by its number of replicates and its seed sequence.
+    # With a precision, the tasks run in rounds of one task per worker and the simulation stops once the Monte Carlo
+    # standard error given by error_function is within the precision; error_function receives one task's replicates
+    # at a time and keeps its own running counts, such as an IntervalError or a PValueError. A stopping_rule does
+    # the same for other rules, returning True once the simulation may stop. The rule is checked after every task in
+    # task order, so a seeded simulation gives the same replicates with or without a pool
+    replicates = DEFAULT_REPLICATES
+    random_state = None
+    precision = None
+    processes = None
+    executor = None
+    task_replicates = TASK_REPLICATES
+    stopped_early = False
+
+    def __init__(self, replicates=None, random_state=None, precision=None, processes=None, executor=None,
+                 task_replicates=None):
+        if replicates is not None:
+            self.replicates = replicates
+        if random_state is not None:
+            self.random_state = random_state
+        if precision is not None:
+            self.precision = precision
+        self.processes = processes
+        self.executor = executor
+        if task_replicates is not None:
+            self.task_replicates = task_replicates
+
+    def run(self, task_function, parameters, error_function=None, stopping_rule=None):
+        task_count = max(1, int(math.ceil(self.replicates / float(self.task_replicates))))
+        tasks = []
+        for i, seed_sequence in enumerate(spawn_seed_sequences(self.random_state, task_count)):
+            task_replicates = min(self.task_replicates, self.replicates - i * self.task_replicates)
+            tasks.append(tuple(parameters) + (task_replicates, seed_sequence))
+
+        if stopping_rule is None and self.precision is not None and error_function is not None:
+            def stopping_rule(chunk):
+                return error_function(chunk) <= self.precision
+
+        chunks = []
+        self.stopped_early = False
+        with TaskRunner(self.processes, self.executor) as runner:
+            round_size = runner.worker_count() if stopping_rule is not None else len(tasks)
+            for start in range(0, len(tasks), round_size):
+                for chunk in runner.map(task_function, tasks[start:start + round_size]):
+                    chunks.append(chunk)
+                    if stopping_rule is not None and len(chunks) < len(tasks) and stopping_rule(chunk):
+                        self.stopped_early = True
+                        break
+                if self.stopped_early:
+                    break
+        return np.concatenate(chunks, axis=-1)
+
+
+def simulate_proportions(proportion, sample_size, replicates=DEFAULT_REPLICATES, random_state=None, precision=None,
+                         processes=None, executor=None, error_function=None, confidence_level=None):
+    # error_function receives the proportions of each task and decides, together with the precision, when the
+    # simulation may stop early; it defaults to the error of the interval at confidence_level
+    if error_function is None:
+        error_function = IntervalError(confidence_level)
+    scheduler = SimulationScheduler(replicates, random_state, precision, processes, executor)
+    return np.sort(scheduler.run(proportions_task, (proportion, sample_size), error_function))
+
+
+def simulate_proportion_diffs(grp1_proportion, grp1_sample_size, grp2_proportion, grp2_sample_size,
+                              replicates=DEFAULT_REPLICATES, random_state=None, precision=None, processes=None,
+                              executor=None, error_function=None, confidence_level=None):
+    # error_function receives the differences of each task
+    if error_function is None:
+        error_function = IntervalError(confidence_level)
+    scheduler = SimulationScheduler(replicates, random_state, precision, processes, executor)
+    simulated = scheduler.run(proportion_diffs_task, (grp1_proportion, grp1_sample_size, grp2_proportion,
+                                                      grp2_sample_size),
+                              lambda proportions: error_function(proportions[0] - proportions[1]))
+    return simulated[0], simulated[1], simulated[0] - simulated[1]
@@ -0,0 +1,224 @@
+import math
+
+EPSILON = 3e-16
+TINY = 1e-300
+MAX_ITERATIONS = 500
+
+SQRT2 = math.sqrt(2.0)
+
+
+def norm_cdf(x):
+    return 0.5 * math.erfc(-x / SQRT2)
+
+
+def norm_sf(x):
+    return 0.5 * math.erfc(x / SQRT2)
+
+
+def norm_ppf(p):
+    # algorithm AS 241 (Wichura, 1988), accurate to about 1e-16
+    if p <= 0.0:
+        return -float('inf')
+    if p >= 1.0:
+        return float('inf')
+    q = p - 0.5
+    if abs(q) <= 0.425:
+        r = 0.180625 - q * q
+        num = (((((((2509.0809287301226727 * r + 33430.575583588128105) * r + 67265.770927008700853) * r +
+                   45921.953931549871457) * r + 13731.693765509461125) * r + 1971.5909503065514427) * r +
+                133.14166789178437745) * r + 3.387132872796366608)
+        den = (((((((5226.495278852545925 * r + 28729.085735721942674) * r + 39307.89580009271061) * r +
+                   21213.794301586595867) * r + 5394.1960214247511077) * r + 687.1870074920579083) * r +
+                42.313330701600911252) * r + 1.0)
+        return q * num / den
+
+    r = p if q < 0 else 1.0 - p
+    r = math.sqrt(-math.log(r))
+    if r <= 5.0:
+        r -= 1.6
+        num = (((((((7.7454501427834140764e-4 * r + 0.0227238449892691845833) * r + 0.24178072517745061177) * r +
+                   1.27045825245236838258) * r + 3.64784832476320460504) * r + 5.7694972214606914055) * r +
+                4.6303378461565452959) * r + 1.42343711074968357734)
+        den = (((((((1.05075007164441684324e-9 * r + 5.475938084995344946e-4) * r + 0.0151986665636164571966) * r +
+                   0.14810397642748007459) * r + 0.68976733498510000455) * r + 1.6763848301838038494) * r +
+                2.05319162663775882187) * r + 1.0)
+    else:
+        r -= 5.0
+        num = (((((((2.01033439929228813265e-7 * r + 2.71155556874348757815e-5) * r + 0.0012426609473880784386) * r +
+                   0.026532189526576123093) * r + 0.29656057182850489123) * r + 1.7848265399172913358) * r +
+                5.4637849111641143699) * r + 6.6579046435011037772)
+        den = (((((((2.04426310338993978564e-15 * r + 1.4215117583164458887e-7) * r + 1.8463183175100546818e-5) * r +
+                   7.868691311456132591e-4) * r + 0.0148753612908506148525) * r + 0.13692988092273580531) * r +
+                0.59983220655588793769) * r + 1.0)
+    x = num / den
+    if q < 0:
+        return -x
+    return x
+
+
+def beta_continued_fraction(a, b, x):
+    # modified Lentz evaluation of the continued fraction of the incomplete beta function
+    qab = a + b
+    qap = a + 1.0
+    qam = a - 1.0
+    c = 1.0
+    d = 1.0 - qab * x / qap
+    if abs(d) < TINY:
+        d = TINY
+    d = 1.0 / d
+    h = d
+    for m in range(1, MAX_ITERATIONS + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        if abs(d) < TINY:
+            d = TINY
+        c = 1.0 + aa / c
+        if abs(c) < TINY:
+            c = TINY
+        d = 1.0 / d
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        if abs(d) < TINY:
+            d = TINY
+        c = 1.0 + aa / c
+        if abs(c) < TINY:
+            c = TINY
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < EPSILON:
+            break
+    return h
+
+
+def regularized_beta(x, a, b):
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * beta_continued_fraction(a, b, x) / a
+    return 1.0 - math.exp(log_front) * beta_continued_fraction(b, a, 1.0 - x) / b
+
+
+def regularized_gamma_p(a, x):
+    if x <= 0.0:
+        return 0.0
+    if x < a + 1.0:
+        return gamma_series(a, x)
+    return 1.0 - gamma_continued_fraction(a, x)
+
+
+def regularized_gamma_q(a, x):
+    if x <= 0.0:
+        return 1.0
+    if x < a + 1.0:
+        return 1.0 - gamma_series(a, x)
+    return gamma_continued_fraction(a, x)
+
+
+def gamma_series(a, x):
+    term = 1.0 / a
+    total = term
+    ap = a
+    for n in range(MAX_ITERATIONS):
+        ap += 1.0
+        term *= x / ap
+        total += term
+        if abs(term) < abs(total) * EPSILON:
+            break
+    return total * math.exp(-x + a * math.log(x) - math.lgamma(a))
+
+
+def gamma_continued_fraction(a, x):
+    b = x + 1.0 - a
+    c = 1.0 / TINY
+    d = 1.0 / b
+    h = d
+    for i in range(1, MAX_ITERATIONS + 1):
+        an = -i * (i - a)
+        b += 2.0
+        d = an * d + b
+        if abs(d) < TINY:
+            d = TINY
+        c = b + an / c
+        if abs(c) < TINY:
+            c = TINY
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < EPSILON:
+            break
+    return math.exp(-x + a * math.log(x) - math.lgamma(a)) * h
+
+
+def t_sf(x, df):
+    if math.isinf(df):
+        return norm_sf(x)
+    tail = 0.5 * regularized_beta(df / (df + x * x), 0.5 * df, 0.5)
+    if x > 0:
+        return tail
+    return 1.0 - tail
+
+
+def t_cdf(x, df):
+    return t_sf(-x, df)
+
+
+def chi2_cdf(x, df):
+    return regularized_gamma_p(0.5 * df, 0.5 * x)
+
+
+def chi2_sf(x, df):
+    return regularized_gamma_q(0.5 * df, 0.5 * x)
+
+
+def f_cdf(x, df1, df2):
+    if x <= 0.0:
+        return 0.0
+    return regularized_beta(df1 * x / (df1 * x + df2), 0.5 * df1, 0.5 * df2)
+
+
+def f_sf(x, df1, df2):
+    if x <= 0.0:
+        return 1.0
+    return regularized_beta(df2 / (df2 + df1 * x), 0.5 * df2, 0.5 * df1)
+
+
+def invert_cdf(cdf, p, lower, upper):
+    # the cdfs are monotone, so bisection on a bracket that is widened until it contains the quantile is enough
+    if p <= 0.0:
+        return lower
+    if p >= 1.0:
+        return float('inf')
+    while cdf(upper) < p:
+        lower = upper
+        upper *= 2.0
+    for i in range(200):
+        middle = 0.5 * (lower + upper)
+        if middle == lower or middle == upper:
+            break
+        if cdf(middle) < p:
+            lower = middle
+        else:
+            upper = middle
+    return 0.5 * (lower + upper)
+
+
+def t_ppf(p, df):
+    if math.isinf(df):
+        return norm_ppf(p)
+    if p < 0.5:
+        return -t_ppf(1.0 - p, df)
+    return invert_cdf(lambda x: t_cdf(x, df), p, 0.0, 1.0)
+
+
+def chi2_ppf(p, df):
+    return invert_cdf(lambda x: chi2_cdf(x, df), p, 0.0, max(float(df), 1.0))
+
+
+def f_ppf(p, df1, df2):
+    return invert_cdf(lambda x: f_cdf(x, df1, df2), p, 0.0, 1.0)
@@ -0,0 +1,229 @@
+import json
+import os
+
+import numpy as np
+
+from pysie.stats.moments import CHUNK_SIZE
+from pysie.stats.samples import ColumnarSample, GroupedSampleSummary, encode_value
+
+FORMAT_VERSION = 1
+HEADER_FILE = 'header.json'
+
+# column name -> (attribute of ColumnarSample, on-disk dtype, missing value); every column is a raw little-endian
+# array in its own file, so appending rows appends bytes and opening the sample maps the files without reading them
+COLUMNS = [
+    ('x', 'xs', '<f8', np.nan),
+    ('y', 'ys', '<f8', np.nan),
+    ('label', 'label_codes', '<i4', -1),
+    ('group_id', 'group_codes', '<i4', -1),
+]
+
+
+def column_file(path, name):
+    return os.path.join(path, name + '.bin')
+
+
+def read_header(path):
+    with open(os.path.join(path, HEADER_FILE)) as f:
+        header = json.load(f)
+    if header['version'] > FORMAT_VERSION:
+        raise ValueError('unsupported sample file version: ' + str(header['version']))
+    return header
+
+
+def write_header(path, header):
+    # the header is replaced in one rename after the columns are flushed, so a reader never sees rows that are
+    # not fully written, and an interrupted append leaves the previous header in place
+    temporary = os.path.join(path, HEADER_FILE + '.tmp')
+    with open(temporary, 'w') as f:
+        json.dump(header, f)
+    os.replace(temporary, os.path.join(path, HEADER_FILE))
+
+
+def encode_codes(codes, values, file_values, file_index):
+    # translates the codes of a chunk into the codes of the file, adding the values the file has not seen yet
+    mapping = np.array([encode_value(value, file_values, file_index) for value in values] + [-1], dtype=np.int32)
+    codes = np.asarray(codes)
+    return mapping[np.where(codes < 0, len(values), codes)]
+
+
+def get_columns(sample):
+    label_codes, labels = sample.get_label_codes()
+    group_codes, group_ids = sample.get_group_codes()
+    return dict(x=np.asarray(sample.get_x_array(), dtype=np.float64),
+                y=np.asarray(sample.get_y_array(), dtype=np.float64),
+                label=(label_codes, labels), group_id=(group_codes, group_ids))
+
+
+def present_columns(columns):
+    result = []
+    if not np.isnan(columns['x']).all():
+        result.append('x')
+    if not np.isnan(columns['y']).all():
+        result.append('y')
+    if (columns['label'][0] >= 0).any():
+        result.append('label')
+    if (columns['group_id'][0] >= 0).any():
+        result.append('group_id')
+    return result
+
+
+class SampleWriter(object):
+    # writes a sample to a directory of column files plus a JSON header that carries the dictionaries of the labels
+    # and group ids and the per-group summaries of all the rows written so far:
+    #
+    #     with SampleWriter('events.sample', append=True) as writer:
+    #         writer.write(todays_sample)
+    path = None
+    columns = None
+    count = 0
+    labels = None
+    label_index = None
+    group_ids = None
+    group_index = None
+    summary = None
+    files = None
+
+    def __init__(self, path, columns=None, append=False):
+        self.path = path
+        self.labels = []
+        self.group_ids = []
+        self.files = dict()
+        if append and os.path.exists(os.path.join(path, HEADER_FILE)):
+            header = read_header(path)
+            # a file that was closed before its first write has no columns yet, and takes those of the next write
+            if header['columns'] and columns is not None and sorted(columns) != sorted(header['columns']):
+                raise ValueError('the columns do not match the columns of the sample file')
+            self.columns = header['columns'] or (None if columns is None else list(columns))
+            self.count = header['count']
+            self.labels = header['labels']
+            self.group_ids = header['group_ids']
+            if header['summary'] is not None:
+                self.summary = GroupedSampleSummary.from_dict(header['summary'])
+        else:
+            if not os.path.exists(path):
+                os.makedirs(path)
+            self.columns = None if columns is None else list(columns)
+        self.label_index = dict((label, i) for i, label in enumerate(self.labels))
+        self.group_index = dict((group_id, i) for i, group_id in enumerate(self.group_ids))
+
+        if self.columns is not None:
+            self.open_files(append)
+
+    def open_files(self, append):
+        for name, attribute, dtype, missing in COLUMNS:
+            if name not in self.columns:
+                continue
+            f = open(column_file(self.path, name), 'r+b' if append and self.count > 0 else 'wb')
+            # bytes past the rows in the header are left over from an interrupted append
+            f.truncate(self.count * np.dtype(dtype).itemsize)
+            f.seek(0, os.SEEK_END)
+            self.files[name] = f
+
+    def write(self, sample):
+        self.write_columns(get_columns(sample))
+
+    def write_arrays(self, x=None, y=None, label_codes=None, labels=None, group_codes=None, group_ids=None):
+        size = max(len(column) for column in [x, y, label_codes, group_codes] if column is not None)
+        columns = dict(x=np.full(size, np.nan) if x is None else np.asarray(x, dtype=np.float64),
+                       y=np.full(size, np.nan) if y is None else np.asarray(y, dtype=np.float64),
+                       label=(np.full(size, -1, dtype=np.int32), []) if label_codes is None else
+                       (label_codes, labels),
+                       group_id=(np.full(size, -1, dtype=np.int32), []) if group_codes is None else
+                       (group_codes, group_ids))
+        self.write_columns(columns)
+
+    def write_columns(self, columns):
+        if self.columns is None:
+            self.columns = present_columns(columns)
+            self.open_files(False)
+        else:
+            unknown = set(present_columns(columns)) - set(self.columns)
+            if unknown:
+                raise ValueError('the sample file has no ' + ', '.join(sorted(unknown)) + ' column')
+
+        label_codes = encode_codes(columns['label'][0], columns['label'][1], self.labels, self.label_index)
+        group_codes = encode_codes(columns['group_id'][0], columns['group_id'][1], self.group_ids,
+                                   self.group_index)
+        arrays = dict(x=columns['x'], y=columns['y'], label=label_codes, group_id=group_codes)
+        for name, attribute, dtype, missing in COLUMNS:
+            if name in self.columns:
+                arrays[name].astype(dtype, copy=False).tofile(self.files[name])
+
+        summary = GroupedSampleSummary.from_codes(group_codes, self.group_ids,
+                                                  xs=arrays['x'] if 'x' in self.columns else None,
+                                                  label_codes=label_codes if 'label' in self.columns else None,
+                                                  labels=self.labels if 'label' in self.columns else None)
+        self.summary = summary if self.summary is None else self.summary.merge(summary)
+        self.count += len(label_codes)
+
+    def close_files(self):
+        for f in self.files.values():
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        self.files = dict()
+
+    def close(self):
+        self.close_files()
+        write_header(self.path, dict(version=FORMAT_VERSION, count=self.count,
+                                     columns=self.columns, labels=self.labels,
+                                     group_ids=self.group_ids,
+                                     summary=None if self.summary is None else self.summary.to_dict()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # after an error the header is left as it was, so the rows of the failed writes stay invisible and the
+        # next append truncates them
+        if exc_type is not None:
+            self.close_files()
+        else:
+            self.close()
+
+
+def write_sample(path, sample, append=False):
+    with SampleWriter(path, append=append) as writer:
+        writer.write(sample)
+
+
+class MappedSample(ColumnarSample):
+    # a ColumnarSample whose columns are read-only memory maps of a sample file: the operating system pages the rows
+    # in as they are read and may drop them again, and the per-group summaries of the header answer
+    # SampleDistribution, Anova and ChiSquare without reading the rows at all
+    path = None
+
+    def __init__(self, path):
+        super(MappedSample, self).__init__(capacity=0)
+        header = read_header(path)
+        self.path = path
+        self.count = header['count']
+        for name, attribute, dtype, missing in COLUMNS:
+            if name in (header['columns'] or []) and self.count > 0:
+                column = np.memmap(column_file(path, name), dtype=dtype, mode='r', shape=(self.count,))
+            else:
+                column = np.broadcast_to(np.array(missing, dtype=dtype), (self.count,))
+            setattr(self, attribute, column)
+        self.labels = header['labels']
+        self.label_index = dict((label, i) for i, label in enumerate(self.labels))
+        self.group_ids = header['group_ids']
+        self.group_index = dict((group_id, i) for i, group_id in enumerate(self.group_ids))
+        if header['summary'] is not None:
+            self.grouped_summary = GroupedSampleSummary.from_dict(header['summary'])
+
+    def append(self, x=None, y=None, label=None, group_id=None):
+        # rows added in memory are not part of the file or of its summaries
+        self.grouped_summary = None
+        super(MappedSample, self).append(x, y, label, group_id)
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        for start in range(0, self.count, chunk_size):
+            stop = min(start + chunk_size, self.count)
+            yield ColumnarSample.from_columns(xs=self.xs[start:stop], ys=self.ys[start:stop],
+                                              label_codes=self.label_codes[start:stop], labels=self.labels,
+                                              group_codes=self.group_codes[start:stop], group_ids=self.group_ids)
+
+
+def open_sample(path):
+    return MappedSample(path)
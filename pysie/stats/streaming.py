@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+
+from pysie.dsl.variable_independence_testing import ContingencyTable
+from pysie.instrumentation import stage
+from pysie.stats.samples import GroupedSampleSummary, Sample, SampleSummary
+
+CHUNK_ROWS = 100000
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+
+
+class ChunkedReader(object):
+    # reads a CSV or Parquet file in chunks of chunk_size rows and maps its columns onto x, y, label and group_id;
+    # every chunk is a ColumnarSample of its own, and the summaries below fold the chunks in one at a time, so the
+    # memory used does not grow with the size of the file:
+    #
+    #     reader = ChunkedReader('requests.csv', x='latency', group_id='region')
+    #     anova = Anova(grouped_summary=reader.summarize_by_group_id())
+    path = None
+    x = None
+    y = None
+    label = None
+    group_id = None
+    chunk_size = CHUNK_ROWS
+    file_format = None
+    dropna = True
+    read_options = None
+
+    def __init__(self, path, x=None, y=None, label=None, group_id=None, chunk_size=None, file_format=None,
+                 dropna=None, **read_options):
+        self.path = path
+        self.x = x
+        self.y = y
+        self.label = label
+        self.group_id = group_id
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+        if file_format is None:
+            file_format = 'parquet' if os.path.splitext(path)[1].lower() in PARQUET_EXTENSIONS else 'csv'
+        if file_format not in ('csv', 'parquet'):
+            raise ValueError('unsupported file format: ' + str(file_format))
+        self.file_format = file_format
+        # rows without an x are skipped, as a blank cell would otherwise turn every mean into NaN
+        if dropna is not None:
+            self.dropna = dropna
+        self.read_options = read_options
+
+    def columns(self):
+        return [name for name in [self.x, self.y, self.label, self.group_id] if name is not None]
+
+    def __iter__(self):
+        if self.file_format == 'parquet':
+            return self.read_parquet()
+        return self.read_csv()
+
+    def read_csv(self):
+        import pandas as pd
+
+        dtype = dict((name, 'float64') for name in [self.x, self.y] if name is not None)
+        for name in [self.label, self.group_id]:
+            if name is not None:
+                dtype[name] = 'object'
+        for data_frame in pd.read_csv(self.path, usecols=self.columns(), dtype=dtype, chunksize=self.chunk_size,
+                                      **self.read_options):
+            if self.dropna and self.x is not None:
+                data_frame = data_frame[data_frame[self.x].notna()]
+            yield Sample.from_dataframe(data_frame, x=self.x, y=self.y, label=self.label, group_id=self.group_id)
+
+    def read_parquet(self):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(self.path)
+        for batch in parquet_file.iter_batches(batch_size=self.chunk_size, columns=self.columns(),
+                                               **self.read_options):
+            if self.dropna and self.x is not None:
+                x = batch.column(self.x)
+                valid = pc.is_valid(x)
+                if pa.types.is_floating(x.type):
+                    valid = pc.and_(valid, pc.invert(pc.is_nan(x)))
+                batch = batch.filter(valid)
+            yield Sample.from_arrow(batch, x=self.x, y=self.y, label=self.label, group_id=self.group_id)
+
+    def summarize(self):
+        # a SampleSummary of the whole file, for MeanTesting, ProportionTesting and the sampling distributions
+        summary = SampleSummary()
+        with stage('chunked_reader', 'summarizing') as summarizing_stage:
+            for chunk in self:
+                if self.x is not None:
+                    summary.add_numerics(chunk.get_x_array())
+                if self.label is not None:
+                    label_codes, labels = chunk.get_label_codes()
+                    counts = np.bincount(label_codes[label_codes >= 0], minlength=len(labels))
+                    for label, count in zip(labels, counts.tolist()):
+                        summary.label_counts[label] = summary.label_counts.get(label, 0) + count
+                    if self.x is None:
+                        summary.sample_size += int(counts.sum())
+            summarizing_stage.rows = summary.size()
+        return summary
+
+    def summarize_by_group_id(self):
+        # a GroupedSampleSummary of the whole file, for Anova, ChiSquare and the per-group sample distributions
+        grouped_summary = GroupedSampleSummary()
+        with stage('chunked_reader', 'grouping') as grouping_stage:
+            for chunk in self:
+                group_codes, group_ids = chunk.get_group_codes()
+                label_codes, labels = chunk.get_label_codes() if self.label is not None else (None, None)
+                grouped_summary = grouped_summary.merge(GroupedSampleSummary.from_codes(
+                    group_codes, group_ids, xs=None if self.x is None else chunk.get_x_array(),
+                    label_codes=label_codes, labels=labels))
+            grouping_stage.rows = grouped_summary.total_count
+        return grouped_summary
+
+    def contingency_table(self):
+        return ContingencyTable.from_grouped_summary(self.summarize_by_group_id())
+
+    def write_to(self, writer):
+        # copies the mapped columns into a pysie.stats.storage.SampleWriter, one chunk at a time
+        for chunk in self:
+            writer.write(chunk)
@@ -0,0 +1 @@
+python $PSScriptRoot/../benchmarks/run_benchmarks.py --scales tiny,small,medium --output $PSScriptRoot/../benchmark-results.json
@@ -34,22 +34,21 @@ setup(
     include_package_data=True,
     zip_safe=False,
     platforms='any',
-    setup_requires=["numpy"],
+    python_requires='>=3.7',
+    setup_requires=["numpy>=1.20"],
     install_requires=[
-        "scipy",
-        "enum"
+        "numpy>=1.20",
+        "scipy"
     ],
     classifiers=[
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
         'Natural Language :: English',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 2',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
         'Topic :: Text Processing :: General',
         'Topic :: Utilities',
         'Intended Audience :: Developers',
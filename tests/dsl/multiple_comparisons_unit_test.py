@@ -0,0 +1,45 @@
+import unittest
+
+import numpy
+
+from pysie.dsl.multiple_comparisons import MultipleComparisonCorrection, CorrectionMethod
+
+
+class MultipleComparisonCorrectionUnitTest(unittest.TestCase):
+    p_values = [0.01, 0.04, 0.03, 0.005, 0.2]
+
+    def assert_adjusted(self, method, expected):
+        correction = MultipleComparisonCorrection(self.p_values, method=method)
+        for actual_p_value, expected_p_value in zip(correction.adjusted_p_values, expected):
+            self.assertAlmostEqual(actual_p_value, expected_p_value)
+
+    def test_bonferroni(self):
+        self.assert_adjusted(CorrectionMethod.bonferroni, [0.05, 0.2, 0.15, 0.025, 1.0])
+
+    def test_holm(self):
+        self.assert_adjusted(CorrectionMethod.holm, [0.04, 0.09, 0.09, 0.025, 0.2])
+
+    def test_hochberg(self):
+        self.assert_adjusted(CorrectionMethod.hochberg, [0.04, 0.08, 0.08, 0.025, 0.2])
+
+    def test_benjamini_hochberg(self):
+        self.assert_adjusted(CorrectionMethod.benjamini_hochberg, [0.025, 0.05, 0.05, 0.025, 0.2])
+
+    def test_benjamini_yekutieli(self):
+        c = 1 + 1 / 2.0 + 1 / 3.0 + 1 / 4.0 + 1 / 5.0
+        self.assert_adjusted(CorrectionMethod.benjamini_yekutieli, [0.025 * c, 0.05 * c, 0.05 * c, 0.025 * c, 0.2 * c])
+
+    def test_reject(self):
+        correction = MultipleComparisonCorrection(self.p_values, method=CorrectionMethod.holm,
+                                                  significance_level=0.05)
+        self.assertEqual(correction.reject_null.tolist(), [True, False, False, True, False])
+
+    def test_large(self):
+        p_values = numpy.random.uniform(size=1000000)
+        correction = MultipleComparisonCorrection(p_values, method=CorrectionMethod.benjamini_hochberg)
+        self.assertEqual(correction.size(), 1000000)
+        self.assertTrue((correction.adjusted_p_values >= p_values).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ from random import random
 
 from numpy.random.mtrand import normal
 
-from pysie.dsl.one_group import MeanTesting, ProportionTesting
+from pysie.dsl.one_group import MeanTesting, ProportionTesting, BatchMeanTesting
 from pysie.stats.distributions import MeanSamplingDistribution, ProportionSamplingDistribution
 from pysie.stats.samples import Sample, SampleDistribution
 
@@ -50,6 +50,21 @@ class MeanTestingUnitTest(unittest.TestCase):
         self.assertFalse(reject_two_tail)
 
 
+class BatchMeanTestingUnitTest(unittest.TestCase):
+    def test_batch(self):
+        sampling_distributions = [MeanSamplingDistribution(sample_mean=0.3 * i - 1.0, sample_sd=1.0 + 0.1 * i,
+                                                           sample_size=10 + 5 * i) for i in range(8)]
+        testing = BatchMeanTesting.from_sampling_distributions(sampling_distributions, mean_nulls=0.1,
+                                                               significance_level=0.05)
+        self.assertEqual(testing.size(), 8)
+        for i, sampling_distribution in enumerate(sampling_distributions):
+            expected = MeanTesting(sampling_distribution=sampling_distribution, mean_null=0.1)
+            self.assertAlmostEqual(testing.test_statistics[i], expected.test_statistic)
+            self.assertAlmostEqual(testing.p_values_one_tail[i], expected.p_value_one_tail)
+            self.assertAlmostEqual(testing.p_values_two_tail[i], expected.p_value_two_tail)
+            self.assertEqual(testing.reject_mean_null[1][i], expected.will_reject(0.05)[1])
+
+
 class ProportionTestingUnitTest(unittest.TestCase):
     def test_proportion_normal(self):
         sample = Sample()
@@ -95,5 +110,16 @@ class ProportionTestingUnitTest(unittest.TestCase):
         self.assertFalse(reject_one_tail)
         self.assertFalse(reject_two_tail)
 
+    def test_proportion_simulation_precision(self):
+        sampling_distribution = ProportionSamplingDistribution(sample_proportion=0.3, sample_size=10)
+        testing = ProportionTesting(sampling_distribution=sampling_distribution, p_null=0.2, replicates=50000,
+                                    random_state=3, precision=0.01)
+        parallel = ProportionTesting(sampling_distribution=sampling_distribution, p_null=0.2, replicates=50000,
+                                     random_state=3, precision=0.01, processes=2)
+        self.assertTrue(testing.p_value_one_tail_error <= 0.01)
+        self.assertEqual(testing.p_value_one_tail, parallel.p_value_one_tail)
+        # P(X > 3) for X ~ Binomial(10, 0.2)
+        self.assertAlmostEqual(testing.p_value_one_tail, 0.1209, delta=0.02)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+import numpy as np
+
+from pysie.dsl.sequential import GroupSequentialBoundaries, SequentialDiffTesting, SequentialMethod, \
+    SequentialMeanDiffTesting, SequentialProportionDiffTesting
+
+
+class GroupSequentialBoundariesUnitTest(unittest.TestCase):
+    def test_single_look(self):
+        boundaries = GroupSequentialBoundaries(SequentialMethod.obrien_fleming, 0.05)
+        self.assertAlmostEqual(boundaries.add_look(1.0), 1.959964, places=5)
+
+    def test_pocock(self):
+        boundaries = GroupSequentialBoundaries(SequentialMethod.pocock, 0.05)
+        critical_values = [boundaries.add_look(k / 5.0) for k in range(1, 6)]
+        print('pocock boundaries: ' + str(critical_values))
+        for expected, actual in zip([2.438, 2.427, 2.410, 2.397, 2.386], critical_values):
+            self.assertAlmostEqual(expected, actual, delta=0.005)
+
+    def test_obrien_fleming(self):
+        boundaries = GroupSequentialBoundaries(SequentialMethod.obrien_fleming, 0.05)
+        critical_values = np.array([boundaries.add_look(k / 5.0) for k in range(1, 6)])
+        print('obrien-fleming boundaries: ' + str(critical_values))
+        self.assertAlmostEqual(critical_values[0], 1.959964 / np.sqrt(0.2), places=4)
+        self.assertTrue(np.all(np.diff(critical_values) < 0))
+
+        # the overall type I error of the five looks is the significance level
+        generator = np.random.default_rng(0)
+        scores = np.cumsum(generator.normal(scale=np.sqrt(0.2), size=(200000, 5)), axis=1)
+        z = scores / np.sqrt(np.arange(1, 6) / 5.0)
+        self.assertAlmostEqual((np.abs(z) >= critical_values).any(axis=1).mean(), 0.05, delta=0.003)
+
+    def test_looks_must_increase(self):
+        boundaries = GroupSequentialBoundaries()
+        boundaries.add_look(0.5)
+        self.assertRaises(ValueError, boundaries.add_look, 0.5)
+
+
+class SequentialMeanDiffTestingUnitTest(unittest.TestCase):
+    def test_abstract(self):
+        self.assertRaises(TypeError, SequentialDiffTesting)
+
+    def test_msprt(self):
+        generator = np.random.default_rng(1)
+        testing = SequentialMeanDiffTesting(significance_level=0.05, mixture_variance=0.25)
+        rejected_at = None
+        for i in range(2000):
+            testing.add_grp1_numeric(generator.normal(0.3, 1.0))
+            testing.add_grp2_numeric(generator.normal(0.0, 1.0))
+            if i % 20 == 19 and testing.peek() and rejected_at is None:
+                rejected_at = testing.size()
+        print('rejected after ' + str(rejected_at) + ' observations, p-value: ' + str(testing.p_value))
+        self.assertIsNotNone(rejected_at)
+        self.assertTrue(testing.will_reject(0.05))
+
+    def test_msprt_null(self):
+        generator = np.random.default_rng(2)
+        testing = SequentialMeanDiffTesting(significance_level=0.05)
+        previous = 1.0
+        for i in range(50):
+            testing.add_grp1_numerics(generator.normal(0.0, 1.0, size=20))
+            testing.add_grp2_numerics(generator.normal(0.0, 1.0, size=20))
+            testing.peek()
+            self.assertTrue(testing.p_value <= previous)
+            previous = testing.p_value
+        self.assertFalse(testing.will_reject())
+
+    def test_group_sequential(self):
+        generator = np.random.default_rng(3)
+        testing = SequentialMeanDiffTesting(method=SequentialMethod.obrien_fleming, max_sample_size=1000)
+        self.assertRaises(ValueError, SequentialMeanDiffTesting, method=SequentialMethod.pocock)
+        for look in range(5):
+            testing.add_grp1_numerics(generator.normal(0.5, 1.0, size=100))
+            testing.add_grp2_numerics(generator.normal(0.0, 1.0, size=100))
+            testing.peek()
+        self.assertEqual(testing.boundaries.size(), 5)
+        self.assertTrue(testing.will_reject())
+
+
+class SequentialProportionDiffTestingUnitTest(unittest.TestCase):
+    def test_msprt(self):
+        generator = np.random.default_rng(4)
+        testing = SequentialProportionDiffTesting('A', significance_level=0.05, mixture_variance=0.01)
+        for i in range(40):
+            testing.add_grp1_categories(np.where(generator.random(100) < 0.3, 'A', 'B'))
+            testing.add_grp2_categories(np.where(generator.random(100) < 0.2, 'A', 'B'))
+            testing.peek()
+        print('p-value: ' + str(testing.p_value))
+        self.assertTrue(testing.will_reject())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 
-from pysie.dsl.set import TernarySearchTrie
+from pysie.dsl.set import TernarySearchTrie, TernarySearchSet
 
 
 class TernarySearchTrieUnitTest(unittest.TestCase):
@@ -25,6 +25,60 @@ class TernarySearchTrieUnitTest(unittest.TestCase):
 
         keys = trie.keys()
         self.assertEqual(len(keys), 101)
+        self.assertEqual(list(keys), sorted(keys))
+        self.assertEqual(sum(1 for x in trie.values()), 101)
+
+    def test_delete_keeps_longer_keys(self):
+        trie = TernarySearchTrie()
+        trie.put('he', 1)
+        trie.put('hello', 2)
+        self.assertFalse(trie.contains_key('hel'))
+        trie.delete('he')
+        trie.delete('he')
+        self.assertFalse(trie.contains_key('he'))
+        self.assertEqual(trie.get('hello'), 2)
+        self.assertEqual(trie.size(), 1)
+        trie.delete('hello')
+        self.assertTrue(trie.is_empty())
+        self.assertIsNone(trie.root)
+
+    def test_long_keys(self):
+        trie = TernarySearchTrie()
+        key = 'x' * 5000
+        trie.put(key, 1)
+        trie.put(key + 'y', 2)
+        self.assertEqual(trie.get(key), 1)
+        self.assertEqual(list(trie.keys()), [key, key + 'y'])
+        trie.delete(key + 'y')
+        self.assertEqual(trie.size(), 1)
+
+    def test_bulk_load(self):
+        keys = ['%08x-%04x' % (i * 7919, i) for i in range(1000)]
+        trie = TernarySearchTrie.bulk_load((key, i) for i, key in enumerate(keys))
+        self.assertEqual(trie.size(), 1000)
+        for i, key in enumerate(keys):
+            self.assertEqual(trie.get(key), i)
+        self.assertEqual(list(trie.keys()), sorted(keys))
+
+        key_set = TernarySearchSet.bulk_load_keys(keys)
+        self.assertTrue(key_set.contains(keys[10]))
+        self.assertEqual(key_set.to_array(), sorted(keys))
+
+    def test_queries(self):
+        trie = TernarySearchTrie()
+        for key in ['she', 'sells', 'sea', 'shells', 'by', 'the', 'shore', 's']:
+            trie.put(key, len(key))
+
+        self.assertEqual(list(trie.keys_with_prefix('sh')), ['she', 'shells', 'shore'])
+        self.assertEqual(list(trie.keys_with_prefix('s')), ['s', 'sea', 'sells', 'she', 'shells', 'shore'])
+        self.assertEqual(list(trie.keys_with_prefix('x')), [])
+        self.assertEqual(list(trie.keys_that_match('.he')), ['she', 'the'])
+        self.assertEqual(list(trie.keys_that_match('s..')), ['sea', 'she'])
+        self.assertEqual(list(trie.keys_that_match('s.e..s')), ['shells'])
+        self.assertEqual(trie.longest_prefix_of('shellsort'), 'shells')
+        self.assertEqual(trie.longest_prefix_of('sx'), 's')
+        self.assertIsNone(trie.longest_prefix_of('xyz'))
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -3,10 +3,10 @@ from random import random
 
 from numpy.random.mtrand import normal
 
-from pysie.dsl.two_groups import MeanDiffTesting, ProportionDiffTesting
+from pysie.dsl.two_groups import MeanDiffTesting, ProportionDiffTesting, BatchMeanDiffTesting
 from pysie.stats.distributions import MeanDiffSamplingDistribution, DistributionFamily, \
-    ProportionDiffSamplingDistribution
-from pysie.stats.samples import Sample, SampleDistribution
+    ProportionDiffSamplingDistribution, DfStrategy
+from pysie.stats.samples import Sample, SampleDistribution, ColumnarSample
 
 
 class MeanDiffTestingUnitTest(unittest.TestCase):
@@ -67,6 +67,70 @@ class MeanDiffTestingUnitTest(unittest.TestCase):
         self.assertFalse(reject_one_tail)
         self.assertFalse(reject_two_tail)
 
+    def test_permutation(self):
+        sample = ColumnarSample()
+        for x in [1.0, 1.5, 2.0, 2.5, 3.0]:
+            sample.add_numeric(x, group_id='grp1')
+        for x in [3.5, 4.0, 4.5, 5.0]:
+            sample.add_numeric(x, group_id='grp2')
+
+        sampling_distribution = MeanDiffSamplingDistribution(
+            grp1_sample_distribution=SampleDistribution(sample, group_id='grp1'),
+            grp2_sample_distribution=SampleDistribution(sample, group_id='grp2'))
+        testing = MeanDiffTesting(sampling_distribution=sampling_distribution, permutation=True, replicates=5000,
+                                  random_state=1)
+        self.assertAlmostEqual(testing.test_statistic, sampling_distribution.point_estimate)
+        # only 1 of the 126 splits of the 9 observations into groups of 5 and 4 is as extreme on each side
+        self.assertAlmostEqual(testing.p_value_one_tail, 1.0 / 126, delta=0.005)
+        self.assertAlmostEqual(testing.p_value_two_tail, 2.0 / 126, delta=0.007)
+        # the p-values carry the Monte Carlo standard errors of their replicates
+        self.assertTrue(0 < testing.p_value_one_tail_error < testing.p_value_two_tail_error < 0.003)
+
+
+class BatchMeanDiffTestingUnitTest(unittest.TestCase):
+    def test_batch(self):
+        sampling_distributions = [MeanDiffSamplingDistribution(grp1_sample_mean=0.1 * i, grp1_sample_sd=1.0,
+                                                               grp1_sample_size=20 + 3 * i, grp2_sample_mean=0.5,
+                                                               grp2_sample_sd=1.5, grp2_sample_size=25 + 2 * i)
+                                  for i in range(10)]
+        testing = BatchMeanDiffTesting.from_sampling_distributions(sampling_distributions)
+        for i, sampling_distribution in enumerate(sampling_distributions):
+            expected = MeanDiffTesting(sampling_distribution=sampling_distribution)
+            self.assertAlmostEqual(testing.test_statistics[i], expected.test_statistic)
+            self.assertAlmostEqual(testing.p_values_one_tail[i], expected.p_value_one_tail)
+            self.assertAlmostEqual(testing.p_values_two_tail[i], expected.p_value_two_tail)
+
+    def test_batch_df_strategies(self):
+        grp1_sample_means = [0.0, 0.2, 0.5]
+        grp1_sample_sds = [1.0, 1.5, 0.7]
+        grp1_sample_sizes = [29, 12, 40]
+        grp2_sample_means = [0.001, 0.6, 0.1]
+        grp2_sample_sds = [1.3, 0.9, 1.1]
+        grp2_sample_sizes = [24, 18, 35]
+        for df_strategy in [DfStrategy.conservative, DfStrategy.welch, DfStrategy.pooled]:
+            testing = BatchMeanDiffTesting.from_sample_statistics(grp1_sample_means, grp1_sample_sds,
+                                                                  grp1_sample_sizes, grp2_sample_means,
+                                                                  grp2_sample_sds, grp2_sample_sizes, df_strategy)
+            for i in range(3):
+                sampling_distribution = MeanDiffSamplingDistribution(
+                    grp1_sample_mean=grp1_sample_means[i], grp1_sample_sd=grp1_sample_sds[i],
+                    grp1_sample_size=grp1_sample_sizes[i], grp2_sample_mean=grp2_sample_means[i],
+                    grp2_sample_sd=grp2_sample_sds[i], grp2_sample_size=grp2_sample_sizes[i], df_strategy=df_strategy)
+                expected = MeanDiffTesting(sampling_distribution=sampling_distribution)
+                self.assertAlmostEqual(testing.p_values_two_tail[i], expected.p_value_two_tail)
+
+        # the first pair is the student_t case, where welch matches the unequal-variance t-test
+        testing = BatchMeanDiffTesting.from_sample_statistics(grp1_sample_means, grp1_sample_sds, grp1_sample_sizes,
+                                                              grp2_sample_means, grp2_sample_sds, grp2_sample_sizes,
+                                                              DfStrategy.welch)
+        self.assertAlmostEqual(testing.p_values_two_tail[0], 0.9975508980768566)
+
+    def test_batch_paired(self):
+        testing = BatchMeanDiffTesting.from_paired_statistics([0.516667, 0.516667], [0.470815, 0.470815], [6, 60])
+        self.assertAlmostEqual(testing.test_statistics[0], 2.688040, places=5)
+        self.assertAlmostEqual(testing.p_values_two_tail[0], 0.043400, places=5)
+        self.assertTrue(testing.p_values_two_tail[1] < testing.p_values_two_tail[0])
+
 
 class ProportionDiffTestingUnitTest(unittest.TestCase):
 
@@ -132,5 +196,42 @@ class ProportionDiffTestingUnitTest(unittest.TestCase):
         self.assertFalse(reject_one_tail)
         self.assertFalse(reject_two_tail)
 
+    def test_seeded_simulation(self):
+        sampling_distribution = ProportionDiffSamplingDistribution(grp1_sample_proportion=0.6, grp1_sample_size=10,
+                                                                   grp2_sample_proportion=0.5, grp2_sample_size=12)
+        testing1 = ProportionDiffTesting(sampling_distribution=sampling_distribution, replicates=5000,
+                                         random_state=7)
+        testing2 = ProportionDiffTesting(sampling_distribution=sampling_distribution, replicates=5000,
+                                         random_state=7)
+        self.assertEqual(testing1.p_value_one_tail, testing2.p_value_one_tail)
+        self.assertEqual(testing1.p_value_two_tail, testing2.p_value_two_tail)
+
+    def test_scheduled_simulation(self):
+        sampling_distribution = ProportionDiffSamplingDistribution(grp1_sample_proportion=0.6, grp1_sample_size=10,
+                                                                   grp2_sample_proportion=0.5, grp2_sample_size=12,
+                                                                   replicates=30000, random_state=5, processes=2)
+        self.assertEqual(len(sampling_distribution.diff_simulated_proportions), 30000)
+        self.assertEqual(len(sampling_distribution.confidence_interval_errors(0.95)), 2)
+
+        testing = ProportionDiffTesting(sampling_distribution=sampling_distribution, replicates=200000,
+                                        random_state=5, precision=0.003)
+        replicates = len(testing.simulate())
+        self.assertTrue(10000 < replicates < 200000)
+        self.assertTrue(testing.p_value_two_tail_error <= 0.003)
+        self.assertTrue(testing.p_value_one_tail_error <= 0.003)
+        self.assertTrue(testing.p_value_one_tail < testing.p_value_two_tail)
+
+    def test_exact(self):
+        sampling_distribution = ProportionDiffSamplingDistribution(grp1_sample_proportion=0.9, grp1_sample_size=10,
+                                                                   grp2_sample_proportion=0.2, grp2_sample_size=10)
+        testing = ProportionDiffTesting(sampling_distribution=sampling_distribution, exact=True)
+        print('one tail p-value: ' + str(testing.p_value_one_tail))
+        print('two tail p-value: ' + str(testing.p_value_two_tail))
+        self.assertAlmostEqual(testing.p_value_two_tail, 0.005477, places=5)
+        self.assertTrue(testing.p_value_one_tail < testing.p_value_two_tail)
+        reject_one_tail, reject_two_tail = testing.will_reject(0.01)
+        self.assertTrue(reject_one_tail)
+        self.assertTrue(reject_two_tail)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
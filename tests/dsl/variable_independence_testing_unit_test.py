@@ -1,12 +1,26 @@
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
 import numpy
 from numpy.random.mtrand import normal
 
 from pysie.dsl.variable_independence_testing import Anova, ContingencyTable, ChiSquare
+from pysie.stats import samples
 from pysie.stats.samples import Sample
 
 
+class RecordingExecutor(ThreadPoolExecutor):
+    task_counts = None
+
+    def map(self, function, *iterables, **kwargs):
+        tasks = list(iterables[0])
+        if self.task_counts is None:
+            self.task_counts = []
+        self.task_counts.append(len(tasks))
+        return super(RecordingExecutor, self).map(function, tasks, **kwargs)
+
+
 class AnovaUnitTest(unittest.TestCase):
     def test_anova(self):
         sample = Sample()
@@ -32,6 +46,53 @@ class AnovaUnitTest(unittest.TestCase):
         print('will reject [same mean for all groups] ? ' + str(reject))
         self.assertFalse(reject)
 
+    def test_permutation(self):
+        generator = numpy.random.default_rng(17)
+        sample = Sample()
+        for i in range(60):
+            sample.add_numeric(generator.exponential(1.0), 'group1')
+            sample.add_numeric(generator.exponential(1.0) + 0.8, 'group2')
+            sample.add_numeric(generator.exponential(1.0), 'group3')
+        sample.add_numeric(1.0)
+
+        testing = Anova(sample=sample, permutation=True, replicates=2000, random_state=3)
+        self.assertAlmostEqual(testing.permutation_test.observed, testing.F)
+        self.assertEqual(testing.permutation_test.size(), 2000)
+        print('permutation p-value: ' + str(testing.p_value))
+        self.assertTrue(testing.will_reject(0.01))
+        self.assertAlmostEqual(testing.p_value_error, testing.permutation_test.calculate_p_value_error(True))
+        self.assertTrue(0 < testing.p_value_error < 0.01)
+
+        stopped = Anova(sample=sample, significance_level=0.05, permutation=True, replicates=20000, random_state=3,
+                        early_stopping=True)
+        self.assertTrue(stopped.permutation_test.stopped_early)
+        self.assertTrue(stopped.permutation_test.size() < 20000)
+        self.assertTrue(stopped.will_reject(0.05))
+
+        # with an executor, every round hands one task to each of its workers
+        with RecordingExecutor(4) as executor:
+            pooled = Anova(sample=sample, significance_level=0.05, permutation=True, replicates=20000,
+                           random_state=3, early_stopping=True, executor=executor)
+        self.assertEqual(executor.task_counts[-1], 4)
+        self.assertEqual(pooled.permutation_test.size(), stopped.permutation_test.size())
+
+    def test_partitions(self):
+        generator = numpy.random.default_rng(23)
+        sample = Sample.from_arrays(x=generator.normal(10.0, 3.0, size=5000),
+                                    group_id=generator.choice(['group1', 'group2', 'group3'], size=5000))
+        serial = Anova(sample=sample)
+
+        # small partitions so that the rows span several tasks; the merged result does not depend on who runs them
+        with mock.patch.object(samples, 'PARTITION_ROWS', 700):
+            partitioned = Anova(sample=sample)
+            parallel = Anova(sample=sample, processes=2)
+            with ThreadPoolExecutor(3) as executor:
+                threaded = Anova(sample=sample, executor=executor)
+        self.assertAlmostEqual(partitioned.F, serial.F)
+        self.assertEqual(parallel.F, partitioned.F)
+        self.assertEqual(parallel.p_value, partitioned.p_value)
+        self.assertEqual(threaded.F, partitioned.F)
+
 
 class ContingencyTableUnitTest(unittest.TestCase):
     def test_table(self):
@@ -50,6 +111,27 @@ class ContingencyTableUnitTest(unittest.TestCase):
         print(table.get_row_total('eventC'))
         self.assertEqual(table.get_row_total('eventC'), 30)
         self.assertEqual(table.get_total(), 55)
+        self.assertEqual(table.get_cell('eventA', 'eventE'), 0)
+        self.assertEqual(table.rows.to_array(), ['eventA', 'eventC'])
+        self.assertEqual(table.columns.size(), 2)
+        self.assertTrue(table.columns.contains('eventD'))
+
+        for i in range(20):
+            table.set_cell('row' + str(i), 'column' + str(i), i)
+        self.assertEqual(table.get_row_total('row7'), 7)
+        self.assertEqual(table.get_column_total('eventB'), 30)
+        self.assertEqual(table.get_total(), 245)
+
+    def test_from_sample(self):
+        sample = Sample()
+        for i in range(100):
+            sample.add_category('item' + str(i % 2), 'group' + str(i % 5))
+
+        table = ContingencyTable.from_sample(sample)
+        self.assertEqual(table.get_cell('item0', 'group0'), 10)
+        self.assertEqual(table.get_row_total('item1'), 50)
+        self.assertEqual(table.get_column_total('group3'), 20)
+        self.assertEqual(table.get_total(), 100)
 
 
 class ChiSquareUnitTest(unittest.TestCase):
@@ -67,5 +149,45 @@ class ChiSquareUnitTest(unittest.TestCase):
         reject = testing.will_reject(0.01)
         print('will reject [two categorical variables are independent of each other] ? ' + str(reject))
 
+    def test_table(self):
+        table = ContingencyTable()
+        table.set_cell('eventA', 'eventB', 10)
+        table.set_cell('eventC', 'eventB', 20)
+        table.set_cell('eventA', 'eventD', 15)
+        table.set_cell('eventC', 'eventD', 10)
+
+        testing = ChiSquare(table=table)
+        self.assertEqual(testing.df, 1)
+        self.assertAlmostEqual(testing.chiSq, 3.9111, places=4)
+
+    def test_permutation(self):
+        table = ContingencyTable()
+        table.set_cell('eventA', 'eventB', 10)
+        table.set_cell('eventC', 'eventB', 20)
+        table.set_cell('eventA', 'eventD', 15)
+        table.set_cell('eventC', 'eventD', 10)
+
+        testing = ChiSquare(table=table, permutation=True, replicates=4000, random_state=7)
+        self.assertAlmostEqual(testing.permutation_test.observed, testing.chiSq)
+        print('permutation p-value: ' + str(testing.p_value))
+        self.assertAlmostEqual(testing.p_value, 0.048, delta=0.03)
+
+        parallel = ChiSquare(table=table, permutation=True, replicates=4000, random_state=7, processes=2)
+        self.assertEqual(parallel.p_value, testing.p_value)
+
+    def test_partitions(self):
+        generator = numpy.random.default_rng(29)
+        sample = Sample.from_arrays(label=generator.choice(['itemA', 'itemB', 'itemC'], size=5000),
+                                    group_id=generator.choice(['group1', 'group2'], size=5000))
+        serial = ChiSquare(sample=sample)
+        with mock.patch.object(samples, 'PARTITION_ROWS', 700):
+            parallel = ChiSquare(sample=sample, processes=2)
+            with RecordingExecutor(2) as executor:
+                threaded = ChiSquare(sample=sample, executor=executor)
+        self.assertEqual(executor.task_counts, [8])
+        self.assertEqual(threaded.chiSq, serial.chiSq)
+        self.assertEqual(parallel.chiSq, serial.chiSq)
+        self.assertEqual(parallel.p_value, serial.p_value)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from pysie import instrumentation
+from pysie.dsl.one_group import ProportionTesting
+from pysie.dsl.variable_independence_testing import Anova, ChiSquare
+from pysie.instrumentation import instrument, add_hook, remove_hook, stage
+from pysie.stats.distributions import ProportionSamplingDistribution
+from pysie.stats.samples import ColumnarSample
+
+
+class InstrumentationUnitTest(unittest.TestCase):
+    def test_disabled(self):
+        self.assertFalse(instrumentation.enabled)
+        with stage('anova', 'grouping') as current:
+            current.rows = 10
+        self.assertIs(current, instrumentation.disabled_stage)
+
+    def test_anova(self):
+        generator = np.random.default_rng(0)
+        sample = ColumnarSample()
+        for i in range(300):
+            sample.add_numeric(generator.normal(), 'group' + str(i % 3))
+
+        with instrument() as recorder:
+            Anova(sample=sample)
+            Anova(sample=sample, permutation=True, replicates=200, random_state=1)
+        self.assertFalse(instrumentation.enabled)
+
+        stages = recorder.stage_seconds()
+        for name in ['grouping', 'summarizing', 'cdf', 'permutation']:
+            self.assertTrue(('anova', name) in stages)
+        permutation = [x for x in recorder.records if x.stage == 'permutation'][0]
+        self.assertEqual(permutation.rows, 300)
+        self.assertEqual(permutation.replicates, 200)
+        self.assertTrue(recorder.total_seconds('anova') > 0)
+
+    def test_hook(self):
+        records = []
+        add_hook(records.append)
+        try:
+            sample = ColumnarSample()
+            for i in range(100):
+                sample.add_category('item' + str(i % 2), 'group' + str(i % 5))
+            ChiSquare(sample=sample)
+            sampling_distribution = ProportionSamplingDistribution(sample_proportion=0.02, sample_size=100,
+                                                                   replicates=500, random_state=0)
+            ProportionTesting(sampling_distribution, p_null=0.01, replicates=700, random_state=0)
+        finally:
+            remove_hook(records.append)
+        self.assertFalse(instrumentation.enabled)
+
+        computations = set((x.computation, x.stage) for x in records)
+        self.assertTrue(('chi_square', 'grouping') in computations)
+        self.assertTrue(('chi_square', 'cdf') in computations)
+        simulations = [x.to_dict() for x in records if x.stage == 'simulating']
+        self.assertEqual([x['replicates'] for x in simulations], [500, 700])
+        self.assertEqual(simulations[1]['computation'], 'proportion_testing')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+
+import numpy as np
+
+from pysie.stats.bootstrap import BootstrapMeanSamplingDistribution, BootstrapMeanDiffSamplingDistribution, \
+    BootstrapMethod, resample_means
+from pysie.stats.distributions import DistributionFamily
+from pysie.stats.samples import ColumnarSample, SampleDistribution
+
+
+class BootstrapMeanSamplingDistributionUnitTest(unittest.TestCase):
+    def test_confidence_interval(self):
+        generator = np.random.default_rng(7)
+        sample = ColumnarSample()
+        for x in generator.lognormal(0.0, 1.0, size=200):
+            sample.add_numeric(x)
+
+        sampling_distribution = BootstrapMeanSamplingDistribution(sample_distribution=SampleDistribution(sample),
+                                                                  replicates=3000, random_state=42)
+        self.assertEqual(sampling_distribution.distribution_family, DistributionFamily.simulation)
+        self.assertEqual(len(sampling_distribution.simulated_means), 3000)
+        for method in [BootstrapMethod.percentile, BootstrapMethod.basic, BootstrapMethod.bca]:
+            lower, upper = sampling_distribution.confidence_interval(0.95, method)
+            print('bootstrap ' + method.name + ' interval: ' + str((lower, upper)))
+            self.assertTrue(lower < sampling_distribution.point_estimate < upper)
+
+        # the lognormal is skewed to the right, which BCa corrects by moving both limits up
+        percentile = sampling_distribution.confidence_interval(0.95, BootstrapMethod.percentile)
+        bca = sampling_distribution.confidence_interval(0.95, BootstrapMethod.bca)
+        self.assertTrue(sampling_distribution.acceleration > 0)
+        self.assertTrue(bca[1] > percentile[1])
+
+    def test_confidence_interval_errors(self):
+        xs = np.random.default_rng(13).lognormal(0.0, 1.0, size=100)
+        small = BootstrapMeanSamplingDistribution(xs=xs, replicates=1000, random_state=2)
+        large = BootstrapMeanSamplingDistribution(xs=xs, replicates=16000, random_state=2)
+        for method in [BootstrapMethod.percentile, BootstrapMethod.basic, BootstrapMethod.bca]:
+            small_errors = small.confidence_interval_errors(0.95, method)
+            large_errors = large.confidence_interval_errors(0.95, method)
+            print('bootstrap ' + method.name + ' interval errors: ' + str(small_errors))
+            for small_error, large_error in zip(small_errors, large_errors):
+                self.assertTrue(0 < large_error < small_error)
+
+        # the basic lower bound is read from the upper quantile
+        percentile_errors = small.confidence_interval_errors(0.95, BootstrapMethod.percentile)
+        basic_errors = small.confidence_interval_errors(0.95, BootstrapMethod.basic)
+        self.assertEqual(basic_errors, percentile_errors[::-1])
+
+    def test_seeded_and_blocked(self):
+        xs = np.arange(50, dtype=np.float64)
+        first = BootstrapMeanSamplingDistribution(xs=xs, replicates=4500, random_state=3)
+        second = BootstrapMeanSamplingDistribution(xs=xs, replicates=4500, random_state=3, block_size=7)
+        third = BootstrapMeanSamplingDistribution(xs=xs, replicates=4500, random_state=3, processes=2)
+        np.testing.assert_array_equal(first.simulated_means, second.simulated_means)
+        np.testing.assert_array_equal(first.simulated_means, third.simulated_means)
+        self.assertAlmostEqual(first.standard_error, xs.std() / np.sqrt(50), delta=0.1)
+
+    def test_resample_means(self):
+        means = resample_means(np.array([2.0, 2.0, 2.0]), 10, random_state=1)
+        np.testing.assert_array_equal(means, np.full(10, 2.0))
+
+
+class BootstrapMeanDiffSamplingDistributionUnitTest(unittest.TestCase):
+    def test_confidence_interval(self):
+        generator = np.random.default_rng(11)
+        sample = ColumnarSample()
+        for x in generator.exponential(2.0, size=150):
+            sample.add_numeric(x, group_id='a')
+        for x in generator.exponential(1.0, size=120):
+            sample.add_numeric(x, group_id='b')
+
+        sampling_distribution = BootstrapMeanDiffSamplingDistribution(
+            grp1_sample_distribution=SampleDistribution(sample, group_id='a'),
+            grp2_sample_distribution=SampleDistribution(sample, group_id='b'), replicates=2000, random_state=5)
+        self.assertEqual(sampling_distribution.grp1_sample_size, 150)
+        self.assertEqual(sampling_distribution.grp2_sample_size, 120)
+        for method in [BootstrapMethod.percentile, BootstrapMethod.basic, BootstrapMethod.bca]:
+            lower, upper = sampling_distribution.confidence_interval(0.95, method)
+            print('bootstrap ' + method.name + ' interval: ' + str((lower, upper)))
+            self.assertTrue(lower < sampling_distribution.point_estimate < upper)
+            self.assertTrue(lower > 0)
+            lower_error, upper_error = sampling_distribution.confidence_interval_errors(0.95, method)
+            self.assertTrue(0 < lower_error < upper - lower)
+            self.assertTrue(0 < upper_error < upper - lower)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from scipy.stats import norm, t, f, chi2
+
+from pysie.stats.critical_values import CriticalValueCache, NORMAL, STUDENT_T, CHI_SQUARE, FISHER, cdf, sf, \
+    two_sided_quantile
+
+
+class CriticalValueCacheUnitTest(unittest.TestCase):
+    def test_ppf(self):
+        cache = CriticalValueCache(max_size=2)
+        q = two_sided_quantile(0.95)
+        self.assertAlmostEqual(cache.ppf(NORMAL, q), norm.ppf(q))
+        self.assertAlmostEqual(cache.ppf(STUDENT_T, q, 28.0), t.ppf(q, 28))
+        self.assertAlmostEqual(cache.ppf(STUDENT_T, q, 28), t.ppf(q, 28))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 2)
+
+        self.assertAlmostEqual(cache.ppf(CHI_SQUARE, 0.95, 3), chi2.ppf(0.95, 3))
+        self.assertAlmostEqual(cache.ppf(FISHER, 0.95, 2, 30), f.ppf(0.95, 2, 30))
+        self.assertEqual(cache.size(), 2)
+
+    def test_precompute(self):
+        cache = CriticalValueCache()
+        cache.precompute(confidence_levels=[0.95, 0.99], max_df=50)
+        q = 1 - (1 - 0.99) / 2
+        self.assertAlmostEqual(cache.ppf(STUDENT_T, q, 49.0), t.ppf(q, 49))
+        self.assertEqual(cache.misses, 0)
+
+    def test_cdf(self):
+        self.assertAlmostEqual(cdf(NORMAL, 1.2), norm.cdf(1.2))
+        self.assertAlmostEqual(cdf(STUDENT_T, -1.2, 7), t.cdf(-1.2, 7))
+        self.assertAlmostEqual(sf(STUDENT_T, 1.2, 7), t.sf(1.2, 7))
+        self.assertAlmostEqual(sf(CHI_SQUARE, 4.5, 3), chi2.sf(4.5, 3))
+        self.assertAlmostEqual(sf(FISHER, 2.5, 3, 40), f.sf(2.5, 3, 40))
+        self.assertAlmostEqual(cdf(FISHER, 2.5, 3, 40), f.cdf(2.5, 3, 40))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,12 @@
 import unittest
 
+import numpy as np
 from numpy.random import normal, random
 
 from pysie.stats.distributions import MeanSamplingDistribution, DistributionFamily, ProportionSamplingDistribution, \
-    MeanDiffSamplingDistribution, ProportionDiffSamplingDistribution
+    MeanDiffSamplingDistribution, ProportionDiffSamplingDistribution, DfStrategy
 from pysie.stats.samples import Sample, SampleDistribution
+from pysie.stats.simulation import IntervalError, PValueError, calculate_p_value_error, calculate_quantile_error
 
 
 class MeanSamplingDistributionUnitTest(unittest.TestCase):
@@ -45,6 +47,13 @@ class MeanSamplingDistributionUnitTest(unittest.TestCase):
               + ', standard_error = ' + str(sampling_distribution.standard_error) + ')')
         print('confidence interval for 95% confidence level: ' + str(sampling_distribution.confidence_interval(0.95)))
 
+    def test_student_interval_is_centered(self):
+        sampling_distribution = MeanSamplingDistribution(sample_mean=2.0, sample_sd=1.0, sample_size=29)
+        lower, upper = sampling_distribution.confidence_interval(0.95)
+        # t(0.975, 28) = 2.048407 and SE = 1 / sqrt(29)
+        self.assertAlmostEqual(lower, 2.0 - 0.380378, places=5)
+        self.assertAlmostEqual(upper, 2.0 + 0.380378, places=5)
+
     def test_confidence_interval_with_sample_student(self):
         mu = 0.0
         sigma = 1.0
@@ -122,6 +131,15 @@ class MeanDiffSamplingDistributionUnitTest(unittest.TestCase):
               + ', standard_error = ' + str(sampling_distribution.standard_error) + ')')
         print('confidence interval for 95% confidence level: ' + str(sampling_distribution.confidence_interval(0.95)))
 
+    def test_student_interval_is_centered(self):
+        sampling_distribution = MeanDiffSamplingDistribution(grp1_sample_mean=3.0, grp1_sample_sd=1.0,
+                                                             grp1_sample_size=20, grp2_sample_mean=1.0,
+                                                             grp2_sample_sd=1.0, grp2_sample_size=20)
+        self.assertEqual(sampling_distribution.distribution_family, DistributionFamily.student_t)
+        lower, upper = sampling_distribution.confidence_interval(0.95)
+        self.assertAlmostEqual((lower + upper) / 2, 2.0)
+        self.assertTrue(lower > 0)
+
     def test_confidence_interval_with_sample_student(self):
         grp1_mu = 0.0
         grp1_sigma = 1.0
@@ -144,6 +162,28 @@ class MeanDiffSamplingDistributionUnitTest(unittest.TestCase):
               + ', standard_error = ' + str(sampling_distribution.standard_error) + ')')
         print('confidence interval for 95% confidence level: ' + str(sampling_distribution.confidence_interval(0.95)))
 
+    def test_df_strategies(self):
+        kwargs = dict(grp1_sample_mean=0, grp1_sample_sd=1, grp1_sample_size=29, grp2_sample_mean=0.001,
+                      grp2_sample_sd=1.3, grp2_sample_size=24)
+        conservative = MeanDiffSamplingDistribution(**kwargs)
+        self.assertEqual(conservative.df, 23)
+        welch = MeanDiffSamplingDistribution(df_strategy=DfStrategy.welch, **kwargs)
+        self.assertAlmostEqual(welch.df, 42.641857, places=5)
+        self.assertAlmostEqual(welch.standard_error, conservative.standard_error)
+        pooled = MeanDiffSamplingDistribution(df_strategy=DfStrategy.pooled, **kwargs)
+        self.assertEqual(pooled.df, 51)
+        self.assertAlmostEqual(pooled.standard_error, 0.001 / 0.0031647259738964762, places=6)
+
+    def test_paired(self):
+        sample = Sample()
+        for x, y in zip([1.0, 2.5, 3.1, 4.0, 5.2, 6.1], [0.8, 2.0, 3.3, 3.1, 4.6, 5.0]):
+            sample.add_xy(x, y)
+        sampling_distribution = MeanDiffSamplingDistribution(paired_sample=sample)
+        self.assertTrue(sampling_distribution.paired)
+        self.assertEqual(sampling_distribution.df, 5)
+        self.assertAlmostEqual(sampling_distribution.point_estimate / sampling_distribution.standard_error,
+                               2.688040905524773)
+
 
 class ProportionSamplingDistributionUnitTest(unittest.TestCase):
     def test_confidence_interval_with_sample_stats_normal(self):
@@ -198,6 +238,69 @@ class ProportionSamplingDistributionUnitTest(unittest.TestCase):
               + ', standard_error = ' + str(sampling_distribution.standard_error) + ')')
         print('confidence level for 95% confidence level: ' + str(sampling_distribution.confidence_interval(0.95)))
 
+    def test_confidence_interval_with_seeded_simulation(self):
+        sampling_distribution1 = ProportionSamplingDistribution(sample_proportion=0.6, sample_size=10,
+                                                                replicates=5000, random_state=42)
+        sampling_distribution2 = ProportionSamplingDistribution(sample_proportion=0.6, sample_size=10,
+                                                                replicates=5000, random_state=42)
+        self.assertEqual(len(sampling_distribution1.simulated_proportions), 5000)
+        lo, hi = sampling_distribution1.confidence_interval(0.95)
+        self.assertEqual((lo, hi), sampling_distribution2.confidence_interval(0.95))
+        self.assertTrue(lo <= 0.6 <= hi)
+
+    def test_scheduled_simulation(self):
+        serial = ProportionSamplingDistribution(sample_proportion=0.03, sample_size=200, replicates=45000,
+                                                random_state=9)
+        parallel = ProportionSamplingDistribution(sample_proportion=0.03, sample_size=200, replicates=45000,
+                                                  random_state=9, processes=2)
+        self.assertEqual(len(serial.simulated_proportions), 45000)
+        self.assertEqual(serial.confidence_interval(0.95), parallel.confidence_interval(0.95))
+        lower_error, upper_error = serial.confidence_interval_errors(0.95)
+        self.assertTrue(0 <= lower_error < 0.01 and 0 <= upper_error < 0.01)
+
+        # a coarse precision is reached after the first task of 10000 replicates
+        stopped = ProportionSamplingDistribution(sample_proportion=0.03, sample_size=200, replicates=100000,
+                                                 random_state=9, precision=0.01)
+        self.assertEqual(len(stopped.simulated_proportions), 10000)
+        self.assertAlmostEqual(stopped.confidence_interval(0.95)[1], serial.confidence_interval(0.95)[1],
+                               delta=0.01)
+
+        # the proportions take few distinct values, but the bounds still have an error, so a precision that cannot
+        # be reached runs all the replicates
+        lower_error, upper_error = stopped.confidence_interval_errors(0.95)
+        self.assertTrue(lower_error > 0 and upper_error > 0)
+        unreachable = ProportionSamplingDistribution(sample_proportion=0.03, sample_size=200, replicates=45000,
+                                                     random_state=9, precision=1e-6)
+        self.assertEqual(len(unreachable.simulated_proportions), 45000)
+
+    def test_precision_confidence_level(self):
+        # the bounds of a 99% interval lie further in the tails, so the same precision needs more replicates
+        interval95 = ProportionSamplingDistribution(sample_proportion=0.03, sample_size=200, replicates=100000,
+                                                    random_state=9, precision=0.001)
+        interval99 = ProportionSamplingDistribution(sample_proportion=0.03, sample_size=200, replicates=100000,
+                                                    random_state=9, precision=0.001, confidence_level=0.99)
+        self.assertEqual(len(interval95.simulated_proportions), 10000)
+        self.assertEqual(len(interval99.simulated_proportions), 20000)
+        self.assertTrue(max(interval99.confidence_interval_errors(0.99)) <= 0.001)
+        lower, upper = IntervalError(0.8).quantiles
+        self.assertAlmostEqual(lower, 0.1)
+        self.assertAlmostEqual(upper, 0.9)
+
+    def test_running_errors(self):
+        # the errors kept one task at a time are the errors of all the replicates seen so far
+        generator = np.random.default_rng(4)
+        chunks = [generator.binomial(200, 0.3, size=1000) / 200.0 for i in range(5)]
+        interval_error = IntervalError()
+        p_value_error = PValueError(lambda simulated: np.count_nonzero(simulated > 0.33))
+        for i, chunk in enumerate(chunks):
+            simulated = np.concatenate(chunks[:i + 1])
+            values, counts = np.unique(simulated, return_counts=True)
+            self.assertAlmostEqual(interval_error(chunk),
+                                   max(calculate_quantile_error(values, counts, q) for q in [0.025, 0.975]))
+            self.assertAlmostEqual(p_value_error(chunk),
+                                   calculate_p_value_error(np.count_nonzero(simulated > 0.33), len(simulated)))
+        self.assertEqual(interval_error.value_counts.size(), 5000)
+
 
 class ProportionDiffSamplingDistributionUnitTest(unittest.TestCase):
     def test_confidence_interval_with_sample_stats_normal(self):
@@ -0,0 +1,27 @@
+import unittest
+
+import numpy
+
+from pysie.stats.moments import calculate_moments, merge_moments
+
+
+class MomentsUnitTest(unittest.TestCase):
+    def test_calculate_moments(self):
+        x = numpy.random.normal(1e9, 1.0, 200000)
+        count, mean, sum_of_squares = calculate_moments(x, chunk_size=1000)
+        self.assertEqual(count, 200000)
+        self.assertAlmostEqual(mean, x.mean(), delta=1e-6)
+        self.assertAlmostEqual(sum_of_squares / x.var() / count, 1.0, places=6)
+
+    def test_merge_moments(self):
+        x = numpy.random.normal(0.0, 1.0, 101)
+        count1, mean1, sum_of_squares1 = calculate_moments(x[:40])
+        count2, mean2, sum_of_squares2 = calculate_moments(x[40:])
+        count, mean, sum_of_squares = merge_moments(count1, mean1, sum_of_squares1, count2, mean2, sum_of_squares2)
+        self.assertEqual(count, 101)
+        self.assertAlmostEqual(mean, x.mean())
+        self.assertAlmostEqual(sum_of_squares, ((x - x.mean()) ** 2).sum())
+
+
+if __name__ == '__main__':
+    unittest.main()
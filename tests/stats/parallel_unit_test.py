@@ -0,0 +1,32 @@
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from pysie.stats.parallel import TaskRunner, map_tasks
+
+
+def square(x):
+    return x * x
+
+
+class SerialExecutor(object):
+    # an executor from outside concurrent.futures, without a _max_workers
+    def map(self, function, tasks):
+        return map(function, tasks)
+
+
+class TaskRunnerUnitTest(unittest.TestCase):
+    def test_worker_count(self):
+        self.assertEqual(TaskRunner().worker_count(), 1)
+        self.assertEqual(TaskRunner(processes=3).worker_count(), 3)
+        self.assertEqual(TaskRunner(executor=SerialExecutor()).worker_count(), os.cpu_count() or 1)
+        self.assertEqual(TaskRunner(processes=2, executor=SerialExecutor()).worker_count(), 2)
+        with ThreadPoolExecutor(5) as executor:
+            self.assertEqual(TaskRunner(executor=executor).worker_count(), 5)
+
+    def test_map(self):
+        self.assertEqual(map_tasks(square, range(5), executor=SerialExecutor()), [0, 1, 4, 9, 16])
+
+
+if __name__ == '__main__':
+    unittest.main()
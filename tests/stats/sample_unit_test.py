@@ -0,0 +1,397 @@
+import json
+import unittest
+
+import numpy as np
+from numpy.random import normal, random
+
+from pysie.dsl.variable_independence_testing import Anova, ChiSquare
+from pysie.stats.distributions import MeanSamplingDistribution, ProportionSamplingDistribution, \
+    MeanDiffSamplingDistribution
+from pysie.stats.samples import Sample, ColumnarSample, SampleDistribution, SampleSummary, GroupedSampleSummary
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+class ColumnarSampleUnitTest(unittest.TestCase):
+    def test_numeric(self):
+        sample = ColumnarSample()
+        for i in range(100):
+            sample.add_numeric(float(i), 'group' + str(i % 3))
+
+        self.assertEqual(sample.size(), 100)
+        self.assertTrue(sample.is_numerical())
+        self.assertFalse(sample.is_categorical())
+        self.assertEqual(sample.get(5).x, 5.0)
+        self.assertEqual(sample.get(5).group_id, 'group2')
+        self.assertIsNone(sample.get(5).label)
+        self.assertEqual(sample.count_by_group_id('group0'), 34)
+        self.assertEqual(sample.count_by_group_id(None), 100)
+
+        groups = sample.split_by_group_id()
+        self.assertEqual(groups.size(), 3)
+        self.assertEqual(groups.get('group1').size(), 33)
+        self.assertEqual(groups.get('group1').get(0).x, 1.0)
+        # every group keeps only its own group id
+        self.assertEqual(groups.get('group1').group_ids, ['group1'])
+        self.assertEqual(groups.get('group1').count_by_group_id('group1'), 33)
+
+    def test_split_vocabulary(self):
+        sample = ColumnarSample()
+        for i in range(3000):
+            sample.add_category('item' + str(i % 7) if i % 5 else None, 'group' + str(i % 1000))
+
+        labels = list(sample.labels)
+        groups = sample.split_by_group_id()
+        self.assertEqual(groups.size(), 1000)
+        group = groups.get('group12')
+        self.assertEqual(group.group_ids, ['group12'])
+        self.assertEqual(len(group.labels), 3)
+        self.assertEqual([group.get(i).label for i in range(3)],
+                         [sample.get(i).label for i in [12, 1012, 2012]])
+        group.add_category('item0', 'group12')
+        self.assertEqual(sample.labels, labels)
+
+    def test_category(self):
+        sample = ColumnarSample()
+        sample.add_category('OK')
+        sample.add_category('CANCEL')
+        sample.add_xy(1.0, 2.0)
+
+        self.assertTrue(sample.is_categorical())
+        self.assertEqual(sample.get(1).label, 'CANCEL')
+        self.assertEqual(sample.get(2).y, 2.0)
+        self.assertEqual(sample.labels, ['OK', 'CANCEL'])
+
+    def test_same_distribution_as_sample(self):
+        sample = Sample()
+        columnar_sample = ColumnarSample()
+        for i in range(50):
+            x = normal(0.0, 1.0)
+            sample.add_numeric(x)
+            columnar_sample.add_numeric(x)
+
+        expected = MeanSamplingDistribution(sample_distribution=SampleDistribution(sample))
+        actual = MeanSamplingDistribution(sample_distribution=SampleDistribution(columnar_sample))
+        self.assertAlmostEqual(expected.point_estimate, actual.point_estimate)
+        self.assertAlmostEqual(expected.standard_error, actual.standard_error)
+
+        columnar_sample = ColumnarSample()
+        for i in range(100):
+            columnar_sample.add_category('OK' if random() <= 0.6 else 'CANCEL')
+        sampling_distribution = ProportionSamplingDistribution(
+            sample_distribution=SampleDistribution(columnar_sample, categorical_value='OK'))
+        print('confidence interval for 95% confidence level: ' + str(sampling_distribution.confidence_interval(0.95)))
+
+    def test_empty_group(self):
+        for sample in [Sample(), ColumnarSample()]:
+            for i in range(20):
+                sample.add_numeric(float(i), 'group' + str(i % 2))
+            self.assertRaises(ValueError, SampleDistribution, sample, 'group2')
+            self.assertEqual(SampleDistribution(sample, 'group1').sample_size, 10)
+
+    def test_anova_and_chi_square(self):
+        sample = Sample()
+        columnar_sample = ColumnarSample()
+        for i in range(100):
+            for group_id in ['group1', 'group2', 'group3']:
+                x = normal(1.0, 1.0)
+                sample.add_numeric(x, group_id)
+                columnar_sample.add_numeric(x, group_id)
+        self.assertAlmostEqual(Anova(sample=sample).p_value, Anova(sample=columnar_sample).p_value)
+
+        sample = Sample()
+        columnar_sample = ColumnarSample()
+        for i in range(300):
+            label = 'itemA' if random() <= 0.5 else 'itemB'
+            group_id = 'group' + str(i % 3)
+            sample.add_category(label, group_id)
+            columnar_sample.add_category(label, group_id)
+        self.assertAlmostEqual(ChiSquare(sample=sample).p_value, ChiSquare(sample=columnar_sample).p_value)
+
+
+class BulkSampleUnitTest(unittest.TestCase):
+    def test_from_arrays(self):
+        xs = np.array([normal(1.0, 1.0) for i in range(300)])
+        group_ids = np.array(['group' + str(i % 3) for i in range(300)])
+        labels = np.array(['itemA' if random() <= 0.5 else 'itemB' for i in range(300)], dtype=object)
+        labels[7] = None
+
+        sample = Sample.from_arrays(x=xs, group_id=group_ids)
+        self.assertTrue(np.shares_memory(sample.get_x_array(), xs))
+        appended = ColumnarSample()
+        for x, group_id in zip(xs, group_ids):
+            appended.add_numeric(x, group_id)
+        self.assertEqual(sample.group_ids, appended.group_ids)
+        self.assertEqual(sample.get(4).group_id, 'group1')
+        self.assertAlmostEqual(SampleDistribution(sample, group_id='group2').mean,
+                               SampleDistribution(appended, group_id='group2').mean)
+        self.assertAlmostEqual(Anova(sample=sample).p_value, Anova(sample=appended).p_value)
+
+        # appending after a bulk load copies the columns instead of writing into the caller's arrays
+        sample.add_numeric(100.0, 'group4')
+        self.assertEqual(sample.size(), 301)
+        self.assertEqual(len(xs), 300)
+
+        categorical = Sample.from_arrays(label=labels, group_id=group_ids)
+        self.assertTrue(categorical.is_categorical())
+        self.assertIsNone(categorical.get(7).label)
+        self.assertEqual(categorical.count_by_label('itemA') + categorical.count_by_label('itemB'), 299)
+        appended = ColumnarSample()
+        for label, group_id in zip(labels, group_ids):
+            appended.add_category(label, group_id)
+        self.assertAlmostEqual(ChiSquare(sample=categorical).p_value, ChiSquare(sample=appended).p_value)
+
+        self.assertRaises(ValueError, Sample.from_arrays, x=xs, group_id=group_ids[:10])
+
+    def test_missing_first_row(self):
+        xs = np.array([normal(i % 3, 1.0) for i in range(300)])
+        xs[0] = np.nan
+        group_ids = np.array(['group' + str(i % 3) for i in range(300)])
+        labels = np.array(['itemA' if i % 4 == 0 else 'itemB' for i in range(300)], dtype=object)
+        labels[0] = None
+
+        numerical = Sample.from_arrays(x=xs, group_id=group_ids)
+        expected = Sample.from_arrays(x=xs[1:], group_id=group_ids[1:])
+        self.assertTrue(numerical.is_numerical())
+        self.assertFalse(numerical.is_categorical())
+        for group_id in [None, 'group1']:
+            self.assertAlmostEqual(SampleDistribution(numerical, group_id=group_id).sd,
+                                   SampleDistribution(expected, group_id=group_id).sd)
+        self.assertEqual(Anova(sample=numerical).df_total, 298)
+        self.assertAlmostEqual(Anova(sample=numerical).F, Anova(sample=expected).F)
+
+        categorical = Sample.from_arrays(label=labels, group_id=group_ids)
+        self.assertTrue(categorical.is_categorical())
+        self.assertFalse(categorical.is_numerical())
+        self.assertAlmostEqual(SampleDistribution(categorical, categorical_value='itemA').proportion, 74 / 300.0)
+        self.assertAlmostEqual(ChiSquare(sample=categorical).p_value,
+                               ChiSquare(sample=Sample.from_arrays(label=labels[1:], group_id=group_ids[1:])).p_value)
+
+    @unittest.skipIf(pd is None, 'pandas is not installed')
+    def test_from_dataframe(self):
+        data_frame = pd.DataFrame({'x': [1.0, 2.0, np.nan, 4.0], 'y': pd.array([1, None, 3, 4], dtype='Int64'),
+                                   'group_id': ['b', 'a', None, 'b'],
+                                   'label': pd.Categorical(['z', 'y', 'z', None], categories=['w', 'y', 'z'])})
+        sample = Sample.from_dataframe(data_frame, x='x', y='y', label='label', group_id='group_id')
+        self.assertTrue(np.shares_memory(sample.xs, data_frame['x'].to_numpy()))
+        self.assertEqual(sample.group_ids, ['b', 'a'])
+        self.assertEqual(sample.labels, ['z', 'y'])
+        self.assertEqual(sample.get(1).y, None)
+        self.assertEqual(sample.get(3).label, None)
+        self.assertEqual(sample.get(2).group_id, None)
+        self.assertEqual(sample.count_by_label('z'), 2)
+
+    @unittest.skipIf(pa is None, 'pyarrow is not installed')
+    def test_from_arrow(self):
+        table = pa.table({'x': pa.array([1.0, 2.0, 3.0, 4.0]), 'y': pa.array([1, None, 3, 4]),
+                          'group_id': pa.array(['b', 'a', None, 'b']),
+                          'label': pa.array(['z', 'y', 'z', None]).dictionary_encode()})
+        sample = Sample.from_arrow(table, x='x', y='y', label='label', group_id='group_id')
+        self.assertEqual(list(sample.xs), [1.0, 2.0, 3.0, 4.0])
+        self.assertTrue(np.isnan(sample.ys[1]))
+        self.assertEqual(sample.group_ids, ['b', 'a'])
+        self.assertEqual(list(sample.group_codes), [0, 1, -1, 0])
+        self.assertEqual(list(sample.label_codes), [0, 1, 0, -1])
+        self.assertEqual(SampleDistribution(sample, group_id='b').mean, 2.5)
+
+
+class GroupedSampleSummaryUnitTest(unittest.TestCase):
+    def test_numeric(self):
+        for sample in [Sample(), ColumnarSample()]:
+            for i in range(300):
+                sample.add_numeric(normal(i % 3, 1.0), 'group' + str(i % 3))
+            sample.add_numeric(10.0)
+
+            summary = sample.aggregate_by_group_id()
+            self.assertEqual(summary.size(), 3)
+            self.assertEqual(summary.total_count, 301)
+            groups = sample.split_by_group_id()
+            for group_id in groups.keys():
+                expected = SampleDistribution(sample=groups.get(group_id))
+                actual = summary.sample_distribution(group_id)
+                self.assertEqual(actual.sample_size, expected.sample_size)
+                self.assertAlmostEqual(actual.mean, expected.mean)
+                self.assertAlmostEqual(actual.sum_of_squares, expected.sum_of_squares)
+            expected = SampleDistribution(sample=sample)
+            actual = summary.sample_distribution()
+            self.assertAlmostEqual(actual.mean, expected.mean)
+            self.assertAlmostEqual(actual.sd, expected.sd)
+
+    def test_category(self):
+        for sample in [Sample(), ColumnarSample()]:
+            for i in range(300):
+                sample.add_category('OK' if i % 4 == 0 else 'CANCEL', 'group' + str(i % 2))
+
+            summary = sample.aggregate_by_group_id()
+            self.assertEqual(summary.label_counts.sum(), 300)
+            self.assertEqual(summary.sample_distribution('group0', categorical_value='OK').proportion, 0.5)
+            self.assertEqual(summary.sample_distribution('group1', categorical_value='OK').proportion, 0.0)
+            self.assertEqual(summary.sample_distribution(categorical_value='OK').proportion, 0.25)
+
+    def test_merge(self):
+        sample = ColumnarSample()
+        shards = [ColumnarSample(), ColumnarSample(), ColumnarSample()]
+        for i in range(900):
+            x = normal(i % 4, 1.0)
+            group_id = 'group' + str(i % 4 if i < 600 else i % 5)
+            sample.add_numeric(x, group_id)
+            shards[i // 300].add_numeric(x, group_id)
+
+        summaries = [GroupedSampleSummary.from_dict(json.loads(json.dumps(shard.aggregate_by_group_id().to_dict())))
+                     for shard in shards]
+        merged = GroupedSampleSummary().merge(summaries[0]).merge(summaries[1].merge(summaries[2]))
+
+        expected = Anova(sample=sample)
+        actual = Anova(grouped_summary=merged)
+        self.assertEqual(actual.df_group, expected.df_group)
+        self.assertAlmostEqual(actual.F, expected.F)
+        self.assertAlmostEqual(actual.p_value, expected.p_value)
+
+    def test_roll_up(self):
+        for sample in [Sample(), ColumnarSample()]:
+            region_sample = Sample()
+            for i in range(600):
+                region = 'region' + str(i % 3)
+                x = normal(i % 3, 1.0)
+                sample.add_numeric(x, region + '/store' + str(i % 4) + '/day' + str(i % 5))
+                region_sample.add_numeric(x, region)
+
+            expected = Anova(sample=region_sample)
+            actual = Anova(sample=sample, group_level=1)
+            self.assertEqual(actual.df_group, 2)
+            self.assertAlmostEqual(actual.F, expected.F)
+            self.assertEqual(actual.individual_samples.get('region1/').size(), 200)
+            self.assertIs(actual.individual_samples, actual.individual_samples)
+
+            summary = sample.aggregate_by_group_id().roll_up(prefixes=['region0/', 'region1/store1/'])
+            self.assertEqual(summary.group_ids, ['region0/', 'region1/store1/'])
+            self.assertEqual(list(summary.counts), [200, 50])
+            self.assertEqual(summary.total_count, 250)
+            groups = sample.split_by_group_id(prefixes=['region0/', 'region1/store1/'])
+            self.assertAlmostEqual(summary.sample_distribution('region1/store1/').sd,
+                                   SampleDistribution(groups.get('region1/store1/')).sd)
+
+    def test_roll_up_totals(self):
+        for sample in [Sample(), ColumnarSample()]:
+            kept_sample = Sample()
+            for i in range(600):
+                group_id = None if i % 7 == 0 else 'region' + str(i % 3) + '/store' + str(i % 4)
+                x = normal(i % 3, 1.0)
+                sample.add_numeric(x, group_id)
+                if group_id is not None and not group_id.startswith('region2/'):
+                    kept_sample.add_numeric(x, group_id[:len('region0/')])
+
+            prefixes = ['region0/', 'region1/']
+            summary = sample.aggregate_by_group_id().roll_up(prefixes=prefixes)
+            self.assertEqual(summary.total_count, summary.counts.sum())
+            self.assertAlmostEqual(summary.sample_distribution().mean, SampleDistribution(kept_sample).mean)
+            self.assertAlmostEqual(summary.sample_distribution().sd, SampleDistribution(kept_sample).sd)
+
+            expected = Anova(sample=kept_sample)
+            actual = Anova(sample=sample, group_prefixes=prefixes)
+            self.assertEqual(actual.df_total, expected.df_total)
+            self.assertAlmostEqual(actual.F, expected.F)
+            self.assertAlmostEqual(actual.p_value, expected.p_value)
+
+    def test_merge_category(self):
+        sample = Sample()
+        shard1 = Sample()
+        shard2 = Sample()
+        for i in range(600):
+            label = 'item' + str(i % 3 if i < 300 else i % 4)
+            group_id = 'group' + str(i % 2)
+            sample.add_category(label, group_id)
+            (shard1 if i < 300 else shard2).add_category(label, group_id)
+
+        merged = shard1.aggregate_by_group_id().merge(shard2.aggregate_by_group_id())
+        self.assertAlmostEqual(ChiSquare(grouped_summary=merged).p_value, ChiSquare(sample=sample).p_value)
+
+    def test_merge_mismatched_kinds(self):
+        numerical = Sample()
+        categorical = Sample()
+        for i in range(10):
+            numerical.add_numeric(float(i), 'group' + str(i % 2))
+            categorical.add_category('item' + str(i % 3), 'group' + str(i % 2))
+        numerical_summary = numerical.aggregate_by_group_id()
+        categorical_summary = categorical.aggregate_by_group_id()
+        self.assertRaises(ValueError, numerical_summary.merge, categorical_summary)
+        self.assertRaises(ValueError, categorical_summary.merge, numerical_summary)
+        # an empty summary merges with either kind
+        self.assertIs(GroupedSampleSummary().merge(numerical_summary), numerical_summary)
+
+
+class SampleSummaryUnitTest(unittest.TestCase):
+    def test_numeric(self):
+        sample = Sample()
+        summary = SampleSummary()
+        xs = normal(5.0, 2.0, 1000)
+        for x in xs[:500]:
+            sample.add_numeric(x)
+            summary.add_numeric(x)
+        for x in xs[500:]:
+            sample.add_numeric(x)
+        summary.add_numerics(xs[500:])
+
+        self.assertEqual(summary.size(), 1000)
+        self.assertTrue(summary.is_numerical())
+        expected = MeanSamplingDistribution(sample_distribution=SampleDistribution(sample))
+        actual = summary.mean_sampling_distribution()
+        self.assertAlmostEqual(actual.point_estimate, expected.point_estimate)
+        self.assertAlmostEqual(actual.standard_error, expected.standard_error)
+
+    def test_category(self):
+        summary = SampleSummary()
+        summary.add_category('OK')
+        summary.add_category('CANCEL')
+        summary.add_categories(['OK'] * 58 + ['CANCEL'] * 40)
+
+        self.assertEqual(summary.size(), 100)
+        self.assertTrue(summary.is_categorical())
+        sampling_distribution = summary.proportion_sampling_distribution('OK')
+        self.assertAlmostEqual(sampling_distribution.point_estimate, 0.59)
+        print('confidence interval for 95% confidence level: ' + str(sampling_distribution.confidence_interval(0.95)))
+
+    def test_json_int_labels(self):
+        summary = SampleSummary()
+        summary.add_categories([1, 1, 0])
+        restored = SampleSummary.from_dict(json.loads(json.dumps(summary.to_dict())))
+        self.assertAlmostEqual(restored.proportion(1), 2 / 3.0)
+        self.assertEqual(restored.label_counts, {1: 2, 0: 1})
+
+    def test_merge(self):
+        xs = normal(5.0, 2.0, 1000)
+        ys = normal(5.5, 2.0, 800)
+        summaries = []
+        for chunk in [xs[:300], xs[300:700], xs[700:]]:
+            summary = SampleSummary()
+            summary.add_numerics(chunk)
+            summaries.append(SampleSummary.from_dict(json.loads(json.dumps(summary.to_dict()))))
+        grp1_summary = summaries[0].merge(summaries[1]).merge(summaries[2])
+        grp2_summary = SampleSummary()
+        grp2_summary.add_numerics(ys)
+
+        self.assertEqual(grp1_summary.size(), 1000)
+        self.assertAlmostEqual(grp1_summary.mean, xs.mean())
+        self.assertAlmostEqual(grp1_summary.sample_distribution().sd, xs.std(ddof=1))
+        sampling_distribution = MeanDiffSamplingDistribution(
+            grp1_sample_distribution=SampleDistribution(summary=grp1_summary),
+            grp2_sample_distribution=SampleDistribution(summary=grp2_summary))
+        self.assertAlmostEqual(sampling_distribution.point_estimate, xs.mean() - ys.mean())
+
+        summary1 = SampleSummary()
+        summary1.add_categories(['OK', 'CANCEL', 'OK'])
+        summary2 = SampleSummary()
+        summary2.add_categories(['OK'])
+        self.assertEqual(summary1.merge(summary2).proportion('OK'), 0.75)
+
+
+if __name__ == '__main__':
+    unittest.main()
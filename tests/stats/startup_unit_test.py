@@ -0,0 +1,52 @@
+import json
+import subprocess
+import sys
+import unittest
+
+from pysie.dsl.one_group import MeanTesting
+from pysie.stats import critical_values
+from pysie.stats.distributions import MeanSamplingDistribution
+
+STARTUP_SCRIPT = '''
+import json, sys, time
+start = time.time()
+import pysie
+from pysie.dsl.one_group import MeanTesting
+from pysie.dsl.two_groups import MeanDiffTesting
+from pysie.dsl.variable_independence_testing import Anova, ChiSquare
+from pysie.stats.distributions import MeanSamplingDistribution
+testing = MeanTesting(MeanSamplingDistribution(sample_mean=0.1, sample_sd=1.0, sample_size=100), mean_null=0.0)
+interval = testing.sampling_distribution.confidence_interval(0.95)
+print(json.dumps(dict(seconds=time.time() - start, scipy='scipy' in sys.modules, p_value=testing.p_value_two_tail)))
+'''
+# a generous bound, as the NumPy import alone takes from 0.1 to several tenths of a second between machines
+STARTUP_SECONDS = 2.0
+
+
+class StartupUnitTest(unittest.TestCase):
+    def test_z_test_does_not_import_scipy(self):
+        output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT])
+        result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        self.assertFalse(result['scipy'])
+        self.assertLess(result['seconds'], STARTUP_SECONDS)
+        self.assertAlmostEqual(result['p_value'], 0.3173105078629141)
+
+
+class BuiltinBackendUnitTest(unittest.TestCase):
+    def tearDown(self):
+        critical_values.set_backend(critical_values.AUTOMATIC)
+
+    def test_student(self):
+        sampling_distribution = MeanSamplingDistribution(sample_mean=0.4, sample_sd=1.0, sample_size=12)
+        expected = MeanTesting(sampling_distribution=sampling_distribution, mean_null=0.0)
+        critical_values.set_backend(critical_values.BUILTIN)
+        actual = MeanTesting(sampling_distribution=sampling_distribution, mean_null=0.0)
+        self.assertAlmostEqual(actual.p_value_two_tail, expected.p_value_two_tail, places=12)
+        self.assertAlmostEqual(critical_values.compute_ppf(critical_values.STUDENT_T, 0.975, 11.0), 2.200985160082949,
+                               places=10)
+        self.assertAlmostEqual(critical_values.sf(critical_values.FISHER, 3.2, 2, 30), 0.0549918166, places=9)
+        self.assertAlmostEqual(critical_values.sf(critical_values.CHI_SQUARE, 7.8, 3), 0.0503310979, places=9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pysie.dsl.variable_independence_testing import Anova, ChiSquare
+from pysie.stats.samples import Sample, SampleDistribution
+from pysie.stats.storage import SampleWriter, open_sample, write_sample
+
+
+class SampleStorageUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        generator = np.random.default_rng(11)
+        self.xs = generator.normal(10.0, 2.0, size=1000)
+        self.group_ids = np.array(['group' + str(i) for i in generator.integers(0, 4, size=1000)], dtype=object)
+        self.labels = np.array(generator.choice(['itemA', 'itemB', 'itemC'], size=1000), dtype=object)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_numerical_append(self):
+        path = os.path.join(self.directory, 'numerical')
+        write_sample(path, Sample.from_arrays(x=self.xs[:600], group_id=self.group_ids[:600]))
+        write_sample(path, Sample.from_arrays(x=self.xs[600:], group_id=self.group_ids[600:]), append=True)
+
+        sample = open_sample(path)
+        expected = Sample.from_arrays(x=self.xs, group_id=self.group_ids)
+        self.assertEqual(sample.size(), 1000)
+        self.assertIsInstance(sample.xs, np.memmap)
+        self.assertEqual(sample.get(700).group_id, expected.get(700).group_id)
+        self.assertAlmostEqual(Anova(sample=sample).p_value, Anova(sample=expected).p_value)
+        for group_id in [None, 'group2']:
+            self.assertAlmostEqual(SampleDistribution(sample, group_id=group_id).sd,
+                                   SampleDistribution(expected, group_id=group_id).sd)
+
+        # the rows themselves give the same answers as the summaries of the header
+        sample.grouped_summary = None
+        self.assertAlmostEqual(Anova(sample=sample).p_value, Anova(sample=expected).p_value)
+        self.assertEqual(sum(chunk.size() for chunk in sample.iter_chunks(128)), 1000)
+
+    def test_categorical_chunks(self):
+        path = os.path.join(self.directory, 'categorical')
+        with SampleWriter(path) as writer:
+            for start in range(0, 1000, 300):
+                writer.write(Sample.from_arrays(label=self.labels[start:start + 300],
+                                                group_id=self.group_ids[start:start + 300]))
+
+        sample = open_sample(path)
+        expected = Sample.from_arrays(label=self.labels, group_id=self.group_ids)
+        self.assertAlmostEqual(ChiSquare(sample=sample).p_value, ChiSquare(sample=expected).p_value)
+        self.assertAlmostEqual(SampleDistribution(sample, group_id='group1', categorical_value='itemA').proportion,
+                               SampleDistribution(expected, group_id='group1', categorical_value='itemA').proportion)
+        self.assertRaises(ValueError, write_sample, path, Sample.from_arrays(x=self.xs), True)
+
+    def test_interrupted_append(self):
+        path = os.path.join(self.directory, 'interrupted')
+        write_sample(path, Sample.from_arrays(x=self.xs[:10]))
+        with open(os.path.join(path, 'x.bin'), 'ab') as f:
+            f.write(b'\0' * 12)
+        self.assertEqual(open_sample(path).size(), 10)
+
+        write_sample(path, Sample.from_arrays(x=self.xs[10:20]), append=True)
+        np.testing.assert_array_equal(open_sample(path).get_x_array(), self.xs[:20])
+
+    def test_failed_append(self):
+        path = os.path.join(self.directory, 'failed')
+        write_sample(path, Sample.from_arrays(x=self.xs[:10], group_id=self.group_ids[:10]))
+        with self.assertRaises(RuntimeError):
+            with SampleWriter(path, append=True) as writer:
+                writer.write(Sample.from_arrays(x=self.xs[10:20], group_id=self.group_ids[10:20]))
+                raise RuntimeError('interrupted')
+
+        sample = open_sample(path)
+        np.testing.assert_array_equal(sample.get_x_array(), self.xs[:10])
+        self.assertEqual(sample.aggregate_by_group_id().total_count, 10)
+        write_sample(path, Sample.from_arrays(x=self.xs[10:20], group_id=self.group_ids[10:20]), append=True)
+        np.testing.assert_array_equal(open_sample(path).get_x_array(), self.xs[:20])
+
+    def test_empty_writer(self):
+        path = os.path.join(self.directory, 'empty')
+        SampleWriter(path).close()
+        self.assertEqual(open_sample(path).size(), 0)
+        write_sample(path, Sample.from_arrays(x=self.xs[:10]), append=True)
+        np.testing.assert_array_equal(open_sample(path).get_x_array(), self.xs[:10])
+
+    def test_write_arrays(self):
+        path = os.path.join(self.directory, 'arrays')
+        group_ids = ['group0', 'group1', 'group2', 'group3']
+        group_codes = np.array([group_ids.index(group_id) for group_id in self.group_ids], dtype=np.int32)
+        group_codes[5] = -1
+        with SampleWriter(path) as writer:
+            writer.write_arrays(x=self.xs[:500], group_codes=group_codes[:500], group_ids=group_ids)
+            writer.write_arrays(x=self.xs[500:], group_codes=group_codes[500:], group_ids=group_ids)
+
+        sample = open_sample(path)
+        self.assertEqual(sorted(sample.group_ids), group_ids)
+        self.assertIsNone(sample.get(5).group_id)
+        self.assertEqual(sample.get(700).group_id, self.group_ids[700])
+        expected = Sample.from_arrays(x=self.xs, group_id=[None if i == 5 else group_id
+                                                           for i, group_id in enumerate(self.group_ids)])
+        self.assertAlmostEqual(Anova(sample=sample).p_value, Anova(sample=expected).p_value)
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pysie.dsl.one_group import MeanTesting
+from pysie.dsl.variable_independence_testing import Anova, ChiSquare
+from pysie.stats.distributions import MeanSamplingDistribution
+from pysie.stats.samples import Sample, SampleDistribution
+from pysie.stats.storage import SampleWriter, open_sample
+from pysie.stats.streaming import ChunkedReader
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+@unittest.skipIf(pd is None, 'pandas is not installed')
+class ChunkedReaderUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        generator = np.random.default_rng(5)
+        self.data_frame = pd.DataFrame({'latency': generator.normal(5.0, 1.0, size=2500),
+                                        'region': generator.choice(['eu', 'us', 'ap'], size=2500),
+                                        'status': generator.choice(['ok', 'error'], size=2500),
+                                        'ignored': 1})
+        self.data_frame.loc[3, 'latency'] = np.nan
+        self.data_frame.loc[5, 'region'] = None
+        self.paths = [os.path.join(self.directory, 'requests.csv')]
+        self.data_frame.to_csv(self.paths[0], index=False)
+        if pq is not None:
+            self.paths.append(os.path.join(self.directory, 'requests.parquet'))
+            self.data_frame.to_parquet(self.paths[1])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_numerical(self):
+        expected = Sample.from_dataframe(self.data_frame.dropna(subset=['latency']), x='latency', group_id='region')
+        for path in self.paths:
+            reader = ChunkedReader(path, x='latency', group_id='region', chunk_size=300)
+            self.assertAlmostEqual(Anova(grouped_summary=reader.summarize_by_group_id()).p_value,
+                                   Anova(sample=expected).p_value)
+            summary = reader.summarize()
+            self.assertEqual(summary.size(), 2499)
+            self.assertAlmostEqual(MeanTesting(summary.mean_sampling_distribution(), 5.0).p_value_two_tail,
+                                   MeanTesting(MeanSamplingDistribution(SampleDistribution(expected)),
+                                               5.0).p_value_two_tail)
+
+    def test_categorical(self):
+        expected = Sample.from_dataframe(self.data_frame, label='status', group_id='region')
+        for path in self.paths:
+            reader = ChunkedReader(path, label='status', group_id='region', chunk_size=300)
+            self.assertAlmostEqual(ChiSquare(table=reader.contingency_table()).p_value,
+                                   ChiSquare(sample=expected).p_value)
+            self.assertEqual(reader.summarize().label_counts['ok'], expected.count_by_label('ok'))
+
+    def test_write_to(self):
+        path = os.path.join(self.directory, 'requests.sample')
+        with SampleWriter(path) as writer:
+            ChunkedReader(self.paths[0], x='latency', group_id='region', chunk_size=1000).write_to(writer)
+        sample = open_sample(path)
+        self.assertEqual(sample.size(), 2499)
+        self.assertIsNone(sample.get(4).group_id)
+        self.assertEqual(sample.get(5).group_id, self.data_frame['region'][6])